@@ -2,6 +2,7 @@
 import os
 import uuid
 import json
+import hashlib
 import threading
 import traceback
 from pathlib import Path
@@ -9,6 +10,7 @@ from time import time
 from flask import Flask, request, jsonify, Response, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import queue  # use the queue module directly
 import google.generativeai as genai
 from dotenv import load_dotenv
@@ -27,9 +29,10 @@ else:
 
 # Try to import your pipeline function
 try:
-    from text_to_json import run_json_text
+    from text_to_json import run_json_text, process_statement_file
 except Exception as e:
     run_json_text = None
+    process_statement_file = None
     print("Warning: couldn't import run_json_text():", e)
 
 # Try to import find_percentages if available
@@ -43,6 +46,120 @@ try:
 except Exception:
     find_percentages = None
 
+try:
+    from characterRecognition.output_writer import serve_file
+    from characterRecognition.serialization import artifact_path, dumps_json, iter_ndjson
+except Exception:
+    from output_writer import serve_file
+    from serialization import artifact_path, dumps_json, iter_ndjson
+
+try:
+    from characterRecognition.file_cache import hash_file
+    from characterRecognition.dir_scan import flag_file, unflag_file
+    from characterRecognition.image_normalize import is_image, ensure_normalized, remove_normalized
+except Exception:
+    from file_cache import hash_file
+    from dir_scan import flag_file, unflag_file
+    from image_normalize import is_image, ensure_normalized, remove_normalized
+
+try:
+    try:
+        from characterRecognition.chat_context import get_spending_summary, render_summary
+    except Exception:
+        from chat_context import get_spending_summary, render_summary
+except Exception as e:
+    get_spending_summary = None
+    print("Warning: couldn't import chat_context:", e)
+
+try:
+    try:
+        from characterRecognition.transaction_index import get_transaction_index
+    except Exception:
+        from transaction_index import get_transaction_index
+except Exception as e:
+    get_transaction_index = None
+    print("Warning: couldn't import transaction_index:", e)
+
+try:
+    try:
+        from characterRecognition.insights import get_insights
+    except Exception:
+        from insights import get_insights
+except Exception as e:
+    get_insights = None
+    print("Warning: couldn't import insights:", e)
+
+try:
+    try:
+        from characterRecognition.simulator import simulate, MAX_SCENARIOS
+        from characterRecognition.insights import parse_goal_cost
+    except Exception:
+        from simulator import simulate, MAX_SCENARIOS
+        from insights import parse_goal_cost
+except Exception as e:
+    simulate = None
+    print("Warning: couldn't import simulator:", e)
+
+try:
+    try:
+        from characterRecognition.rollups import GRANULARITIES, load_rollups, slice_rollups
+    except Exception:
+        from rollups import GRANULARITIES, load_rollups, slice_rollups
+except Exception as e:
+    load_rollups = None
+    print("Warning: couldn't import rollups:", e)
+
+try:
+    try:
+        from characterRecognition.transaction_store import get_transaction_store
+    except Exception:
+        from transaction_store import get_transaction_store
+except Exception as e:
+    get_transaction_store = None
+    print("Warning: couldn't import transaction_store:", e)
+
+try:
+    try:
+        from characterRecognition.dashboard import get_dashboard
+    except Exception:
+        from dashboard import get_dashboard
+except Exception as e:
+    get_dashboard = None
+    print("Warning: couldn't import dashboard:", e)
+
+try:
+    from characterRecognition.chat_cache import ResponseCache, chat_cache_key, data_snapshot_hash
+except Exception:
+    from chat_cache import ResponseCache, chat_cache_key, data_snapshot_hash
+
+try:
+    try:
+        from characterRecognition.llm_client import get_client, LLMTimeout
+    except Exception:
+        from llm_client import get_client, LLMTimeout
+except Exception as e:
+    get_client = None
+    LLMTimeout = TimeoutError
+    print("Warning: couldn't import llm_client:", e)
+
+try:
+    try:
+        from characterRecognition.watcher import FolderWatcher, ingest_batch
+    except Exception:
+        from watcher import FolderWatcher, ingest_batch
+except Exception as e:
+    FolderWatcher = None
+    print("Warning: couldn't import watcher:", e)
+
+try:
+    try:
+        from characterRecognition.statement_probe import probe_statement
+    except Exception:
+        from statement_probe import probe_statement
+except Exception as e:
+    probe_statement = None
+    print("Warning: couldn't import statement_probe:", e)
+
 BASE_DIR = Path(__file__).resolve().parent
 CREDIT_DIR = BASE_DIR / "credit"
 DEBIT_DIR = BASE_DIR / "debit"
@@ -54,6 +171,13 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".pdf"}
 MAX_FILE_SIZE_BYTES = 100 * 1024 * 1024  # 100MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# What to do with uploads the statement probe says are not statements: reject | flag | off
+# (flag by default: a misclassified statement is kept, but /api/process skips it)
+STATEMENT_PROBE_MODE = os.environ.get("STATEMENT_PROBE_MODE", "flag").lower()
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "1"))
+# Process statements dropped straight into credit/ and debit/ (see watcher.py)
+WATCH_FOLDERS = os.environ.get("WATCH_FOLDERS", "0").lower() in ("1", "true", "yes")
 
 app = Flask(__name__)
 # Allow the Vite dev server origin (adjust if you host frontend elsewhere)
@@ -65,9 +189,12 @@ CORS(app, origins=[
 ])
 
 # In-memory job store
-_jobs = {}  # jobid -> {status, queue (for SSE messages), result, error, started_at, finished_at}
+_jobs = {}  # jobid -> {status, queue (for SSE messages), result, error, started_at, finished_at, progress}
 _jobs_lock = threading.Lock()
 
+# One pipeline run at a time (jobs and watch-folder ingests write the same outputs)
+_pipeline_lock = threading.Lock()
+
 # ------------------------------------------------------------------
 # New: simple in-memory storage for posted "percentages" data
 # ------------------------------------------------------------------
@@ -123,6 +250,109 @@ def get_spending_latest():
         return jsonify(LATEST_PERCENTAGES), 200
 
 
+@app.route("/api/dashboard", methods=["GET"])
+def dashboard():
+    """
+    Everything the dashboard charts need in one response: category percentages, totals,
+    recent monthly/weekly/daily rollups, top merchants and the recurring-charge summary.
+    Served from an in-memory snapshot with a strong ETag; send If-None-Match to get a 304.
+    """
+    if get_dashboard is None:
+        return jsonify({"error": "Dashboard not available on server."}), 500
+    with PERCENTAGES_LOCK:
+        posted = LATEST_PERCENTAGES["percentages"] if LATEST_PERCENTAGES else None
+    body, etag = get_dashboard(str(OUTPUT_DIR), posted)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@app.route("/api/rollups", methods=["GET"])
+def get_rollups():
+    """
+    Spend over time for the dashboard charts, precomputed by the pipeline (output/rollups.json).
+    Query params: granularity=day|week|month (default month), from / to (ISO dates),
+                  category (repeatable), card (repeatable)
+    Returns aligned arrays: { granularity, periods, total, by_category, by_card, by_category_card, count }
+    """
+    if load_rollups is None:
+        return jsonify({"error": "Rollups not available on server."}), 500
+    granularity = request.args.get("granularity", "month")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+    payload = load_rollups(str(OUTPUT_DIR))
+    if payload is None:
+        return jsonify({"error": "No rollups yet. Run /api/process first."}), 404
+    return jsonify(slice_rollups(
+        payload, granularity,
+        date_from=request.args.get("from"),
+        date_to=request.args.get("to"),
+        categories=request.args.getlist("category") or None,
+        cards=request.args.getlist("card") or None,
+    )), 200
+
+
+@app.route("/api/transactions", methods=["GET"])
+def list_transactions():
+    """
+    Paged, filtered transactions from the indexed store (output/transactions.sqlite).
+    Query params: from / to (ISO dates), category (repeatable), card, merchant (name prefix),
+                  min_amount / max_amount, spend_only=1, sort=date|amount|merchant, order=asc|desc,
+                  limit (default 50, max 500), cursor (next_cursor of the previous page), include_total=1
+    Returns: { transactions: [...], next_cursor, count[, total] }
+    """
+    if get_transaction_store is None:
+        return jsonify({"error": "Transaction store not available on server."}), 500
+    args = request.args
+    try:
+        page = get_transaction_store(str(OUTPUT_DIR)).query(
+            date_from=args.get("from"),
+            date_to=args.get("to"),
+            categories=args.getlist("category") or None,
+            card=args.get("card"),
+            merchant=args.get("merchant"),
+            min_amount=args.get("min_amount", type=float),
+            max_amount=args.get("max_amount", type=float),
+            spend_only=args.get("spend_only") in ("1", "true"),
+            sort=args.get("sort", "date"),
+            order=args.get("order", "desc"),
+            limit=args.get("limit", type=int),
+            cursor=args.get("cursor"),
+            include_total=args.get("include_total") in ("1", "true"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page), 200
+
+
+@app.route("/api/transactions.ndjson", methods=["GET"])
+def stream_transactions():
+    """
+    All processed (trimmed) transactions as NDJSON, one per line, streamed from
+    output/all_transactions.ndjson without loading the history into memory.
+    Unfiltered requests are served like /api/output (compressed, ETag, 304).
+    Query params: category (repeatable), card - filter the stream line by line.
+    """
+    path = str(OUTPUT_DIR / "all_transactions.ndjson")
+    if not os.path.exists(path):
+        return jsonify({"error": "No processed transactions yet."}), 404
+    categories = {c.lower() for c in request.args.getlist("category")}
+    card = (request.args.get("card") or "").lower()
+    if not categories and not card:
+        return serve_file(path)
+
+    def generate():
+        for txn in iter_ndjson(path):
+            if categories and (txn.get("company-type") or "").lower() not in categories:
+                continue
+            if card and (txn.get("card-type") or "").lower() != card:
+                continue
+            yield dumps_json(txn, pretty=False) + b"\n"
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
 @app.route("/api/spending/<jobid>", methods=["GET"])
 def get_spending_by_job(jobid):
     with PERCENTAGES_LOCK:
@@ -131,6 +361,61 @@ def get_spending_by_job(jobid):
             return jsonify({"error": "Not found"}), 404
         return jsonify(rec), 200
     
+# Chat profile (not wired to the user's account yet)
+CHAT_PROFILE = {"age": 25, "credit_score": 550, "numerical_level": "medium"}
+
+
+def _build_chat_prompt(msg):
+    """Build the Gemini prompt for a chat message (shared by /api/chat and /api/chat/stream)."""
+    age = CHAT_PROFILE["age"]
+    credit_score = CHAT_PROFILE["credit_score"]
+    numerical_level = CHAT_PROFILE["numerical_level"]
+    # Compact computed summary of the processed statements (bounded size, not raw rows)
+    user_past_data = render_summary(get_spending_summary(str(OUTPUT_DIR))) if get_spending_summary else "{}"
+    # Only the rows that match the question's merchants/categories/time window/amounts
+    relevant = None
+    if get_transaction_index:
+        try:
+            relevant = get_transaction_index(str(OUTPUT_DIR)).search(msg)
+        except Exception as e:
+            # retrieval is an extra; the chat still works from the summary alone
+            print(f"Warning: transaction lookup failed for chat question: {e}")
+    relevant_rows = render_summary(relevant) if relevant else "none needed"
+
+    # Give Gemini some context about the financial app
+    return f"""
+        Do no say Bot: You are an my professional financial assistant you are composed and always speek full sentences integrated into a user's spending dashboard.
+        You help users analyze their spending, categories, and financial goals.
+        
+        The user is {age} years old
+        They have a credit score of {credit_score}
+        They have a numerical_level of {numerical_level}
+
+        Here is a summary of their spending (amounts in GBP, shares in %) {user_past_data}
+
+        Transactions matching this question (count and total_spend cover all matches) {relevant_rows}
+
+        LIMIT TO 5 SENTENCES MAX!!
+
+        User message: {msg}
+        """
+
+
+_chat_cache = ResponseCache(max_entries=int(os.environ.get("CHAT_CACHE_SIZE", "512")),
+                            ttl_seconds=int(os.environ.get("CHAT_CACHE_TTL", "3600")))
+
+
+def _chat_cache_key(msg):
+    return chat_cache_key(data_snapshot_hash(str(OUTPUT_DIR)), CHAT_PROFILE, msg)
+
+
+@app.route("/api/chat/metrics", methods=["GET"])
+def chat_metrics():
+    """Chat response cache statistics (hit rate, size, evictions) and model call counters."""
+    llm = get_client().stats() if get_client is not None else None
+    return jsonify({"cache": _chat_cache.stats(), "llm": llm}), 200
+
+
 @app.route("/api/chat", methods=["POST"])
 def chatbot_reply():
     """
@@ -142,251 +427,191 @@ def chatbot_reply():
         data = request.get_json()
         msg = data.get("message", "").strip()
 
-        user_past_data = """
-{
-  "transactions": [
-    {
-      "date-of-transaction": "",
-      "amount": "2150.00",
-      "company-type": "Opening Balance",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "",
-      "amount": "2150.00",
-      "company-type": "Opening Balance",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "",
-      "amount": "2150.00",
-      "company-type": "Opening Balance",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "",
-      "amount": "3200.00",
-      "company-type": "Opening Balance",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-02-2025",
-      "amount": "245.99",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-02-2025",
-      "amount": "245.99",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-02-2025",
-      "amount": "245.99",
-      "company-type": "Shopping",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-03-2025",
-      "amount": "189.50",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-03-2025",
-      "amount": "189.50",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-03-2025",
-      "amount": "189.50",
-      "company-type": "Shopping",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-03-2025",
-      "amount": "1402.13",
-      "company-type": "Recurring Debts",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-04-2025",
-      "amount": "45.00",
-      "company-type": "Everything Else",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-04-2025",
-      "amount": "45.00",
-      "company-type": "Everything Else",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-04-2025",
-      "amount": "45.00",
-      "company-type": "Everything Else",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-04-2025",
-      "amount": "92.45",
-      "company-type": "Everything Else",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-05-2025",
-      "amount": "67.25",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-05-2025",
-      "amount": "67.25",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-05-2025",
-      "amount": "67.25",
-      "company-type": "Shopping",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-05-2025",
-      "amount": "4.95",
-      "company-type": "Eating Out",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-06-2025",
-      "amount": "8.75",
-      "company-type": "Eating Out",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-06-2025",
-      "amount": "8.75",
-      "company-type": "Eating Out",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-06-2025",
-      "amount": "8.75",
-      "company-type": "Eating Out",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-06-2025",
-      "amount": "60.00",
-      "company-type": "Everything Else",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-07-2025",
-      "amount": "2000.00",
-      "company-type": "Everything Else",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-08-2025",
-      "amount": "132.40",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-08-2025",
-      "amount": "132.40",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-08-2025",
-      "amount": "132.40",
-      "company-type": "Shopping",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-09-2025",
-      "amount": "34.50",
-      "company-type": "Eating Out",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-09-2025",
-      "amount": "34.50",
-      "company-type": "Eating Out",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-09-2025",
-      "amount": "34.50",
-      "company-type": "Eating Out",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-09-2025",
-      "amount": "85.60",
-      "company-type": "Bills",
-      "card-type": "debit"
-    },
-    {
-      "date-of-transaction": "01-10-2025",
-      "amount": "2.99",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-10-2025",
-      "amount": "2.99",
-      "company-type": "Shopping",
-      "card-type": "credit"
-    },
-    {
-      "date-of-transaction": "01-10-2025",
-      "amount": "2.99",
-      "company-type": "Shopping",
-      "card-type": "debit"
-    },]
-"""
-
         if not msg:
             return jsonify({"reply": "Please enter a message."}), 400
 
-        # Initialize Gemini model
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        # Same question on the same data/profile -> cached reply, no model call
+        cache_key = _chat_cache_key(msg)
+        cached = _chat_cache.get(cache_key)
+        if cached is not None:
+            return jsonify({"reply": cached, "cached": True})
 
-        age = 25
-        credit_score = 550
-        numerical_level = "medium"
+        prompt = _build_chat_prompt(msg)
 
-        # Give Gemini some context about the financial app
-        prompt = f"""
-        Do no say Bot: You are an my professional financial assistant you are composed and always speek full sentences integrated into a user's spending dashboard.
-        You help users analyze their spending, categories, and financial goals.
-        
-        The user is {age} years old
-        They have a credit score of {credit_score}
-        They have a numerical_level of {numerical_level}
+        # Generate response (shared client: concurrency limit, deadline, retries, see llm_client)
+        reply_text = get_client().generate(prompt) or "Sorry, I couldn't generate a reply."
+        _chat_cache.set(cache_key, reply_text)
 
-        Here is some past data {user_past_data}
+        return jsonify({"reply": reply_text})
 
-        LIMIT TO 5 SENTENCES MAX!!
+    except LLMTimeout as e:
+        print("Chatbot timeout:", e)
+        return jsonify({"reply": "Gemini is busy right now, please try again in a moment."}), 503
+    except Exception as e:
+        print("Chatbot error:", e)
+        traceback.print_exc()
+        return jsonify({"reply": "Something went wrong connecting to Gemini."}), 500
 
-        User message: {msg}
-        """
 
-        # Generate response
-        response = model.generate_content(prompt)
-        reply_text = response.text.strip() if hasattr(response, "text") else "Sorry, I couldn't generate a reply."
+# Active streaming chats: streamId -> threading.Event (set to cancel)
+_chat_streams = {}
+_chat_streams_lock = threading.Lock()
 
-        return jsonify({"reply": reply_text})
 
+def _sse(msg):
+    """Format a message dict as an SSE frame, using its "event" key as the event name."""
+    return f"event: {msg.get('event', 'message')}\ndata: {json.dumps(msg)}\n\n"
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chatbot_stream():
+    """
+    Streaming variant of /api/chat. Expects JSON: { "message": "user's input" }
+    Responds with SSE (same conventions as /api/stream/<jobid>):
+      started   {"streamId": ...}          - use it with /api/chat/stream/<streamId>/cancel
+      chunk     {"text": "..."}            - model output as it arrives
+      completed {"reply": "full text"}
+      cancelled / error
+    Closing the connection also stops generation.
+    """
+    data = request.get_json(silent=True) or {}
+    msg = (data.get("message") or "").strip()
+    if not msg:
+        return jsonify({"reply": "Please enter a message."}), 400
+    if get_client is None:
+        return jsonify({"error": "Chat backend not available on server."}), 500
+
+    cache_key = _chat_cache_key(msg)
+    cached = _chat_cache.get(cache_key)
+    prompt = _build_chat_prompt(msg) if cached is None else None
+    streamid = uuid.uuid4().hex
+    cancel = threading.Event()
+    with _chat_streams_lock:
+        _chat_streams[streamid] = cancel
+
+    def event_stream():
+        parts = []
+        chunks = None
+        try:
+            yield _sse({"event": "started", "streamId": streamid})
+            if cached is not None:
+                yield _sse({"event": "chunk", "text": cached})
+                yield _sse({"event": "completed", "reply": cached, "cached": True})
+                return
+            chunks = get_client().stream(prompt)
+            for text in chunks:
+                if cancel.is_set():
+                    yield _sse({"event": "cancelled", "reply": "".join(parts).strip()})
+                    return
+                parts.append(text)
+                yield _sse({"event": "chunk", "text": text})
+            reply = "".join(parts).strip()
+            if reply:
+                _chat_cache.set(cache_key, reply)
+            yield _sse({"event": "completed", "reply": reply})
+        except GeneratorExit:
+            # client disconnected - stop pulling from the model
+            pass
+        except LLMTimeout as exc:
+            print("Chatbot stream timeout:", exc)
+            yield _sse({"event": "error", "error": "Gemini is busy right now, please try again in a moment.",
+                        "reply": "".join(parts).strip()})
+        except Exception as exc:
+            print("Chatbot stream error:", exc)
+            traceback.print_exc()
+            yield _sse({"event": "error", "error": "Something went wrong connecting to Gemini."})
+        finally:
+            if chunks is not None and hasattr(chunks, "close"):
+                chunks.close()
+            with _chat_streams_lock:
+                _chat_streams.pop(streamid, None)
+
+    headers = {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }
+    return Response(event_stream(), headers=headers)
+
+
+@app.route("/api/chat/stream/<streamid>/cancel", methods=["POST"])
+def cancel_chat_stream(streamid):
+    with _chat_streams_lock:
+        cancel = _chat_streams.get(streamid)
+    if cancel is None:
+        return jsonify({"error": "Stream not found"}), 404
+    cancel.set()
+    return jsonify({"message": "Cancelled", "streamId": streamid}), 200
+
+
+@app.route("/api/insights", methods=["GET", "POST"])
+def insights():
+    """
+    Precomputed tips numbers (category shares vs goal, suggested £ cuts, months_to_goal, credit flags).
+    Optional JSON body: { "goal_mix": [{"name", "percentage"}...], "goal_cost": 10000 or "a car that costs 10,000",
+                          "profile": {"age", "credit_score", "numerical_level"} }
+    Recomputed only when the processed data or the inputs change.
+    """
+    if get_insights is None:
+        return jsonify({"error": "Insights not available on server."}), 500
+    data = request.get_json(silent=True) or {}
+    profile = {**CHAT_PROFILE, **(data.get("profile") or {})}
+    try:
+        result = get_insights(str(OUTPUT_DIR), data.get("goal_mix"), profile, data.get("goal_cost"))
     except Exception as e:
-        print("Chatbot error:", e)
+        print("Insights error:", e)
         traceback.print_exc()
-        return jsonify({"reply": "Something went wrong connecting to Gemini."}), 500
+        return jsonify({"error": "Could not compute insights", "details": str(e)}), 500
+    return jsonify({"insights": result, "snapshot": data_snapshot_hash(str(OUTPUT_DIR))}), 200
+
+
+@app.route("/api/simulate", methods=["POST"])
+def simulate_goal():
+    """
+    What-if simulator for the savings goal (no model call).
+    Expects JSON: { "goal_cost": 10000 or "a car that costs 10,000",
+                    optional "goal_mix", "levels" ([0, 0.1, ...] or {category: [...]}), "categories",
+                    "deadline_months", "base_saving", "category_spend" ({category: monthly £}) }
+    category_spend defaults to the last 30 days of processed data.
+    Returns the Pareto-best plans (months_to_goal vs closeness to the target mix).
+    """
+    if simulate is None or get_insights is None:
+        return jsonify({"error": "Simulator not available on server."}), 500
+    data = request.get_json(silent=True) or {}
+    raw_cost = data.get("goal_cost")
+    if isinstance(raw_cost, bool) or not isinstance(raw_cost, (int, float, str)):
+        return jsonify({"error": "goal_cost must be a number or a goal description with an amount"}), 400
+    goal_cost = parse_goal_cost(raw_cost)
+    if not goal_cost or goal_cost < 0:
+        return jsonify({"error": "goal_cost is required and must be positive"}), 400
+    max_scenarios = data.get("max_scenarios")
+    if max_scenarios is None:
+        max_scenarios = MAX_SCENARIOS
+    try:
+        if isinstance(max_scenarios, (bool, float)):
+            raise ValueError
+        max_scenarios = int(max_scenarios)
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_scenarios must be a whole number"}), 400
+    if max_scenarios <= 0:
+        return jsonify({"error": "max_scenarios must be positive"}), 400
+    goal_mix = data.get("goal_mix")
+    category_spend = data.get("category_spend")
+    if category_spend is None:
+        by_category = get_insights(str(OUTPUT_DIR), goal_mix, CHAT_PROFILE)["by_category"]
+        category_spend = {c: v["spend"] for c, v in by_category.items()}
+    try:
+        result = simulate(
+            category_spend, goal_cost, goal_mix,
+            levels=data.get("levels"),
+            categories=data.get("categories"),
+            base_saving=float(data.get("base_saving") or 0),
+            deadline_months=data.get("deadline_months"),
+            max_scenarios=min(max_scenarios, MAX_SCENARIOS),
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
 
 
 
@@ -395,18 +620,173 @@ def chatbot_reply():
 # ------------------------------------------------------------------
 
 
+# ------------------------------------------------------------------
+# Upload-time pre-processing: OCR + parse each file as soon as it lands,
+# caching the result by content hash so /api/process only merges.
+# ------------------------------------------------------------------
+_preprocess_queue = queue.Queue()
+_preprocess_status = {}  # "<folder>/<filename>" -> {status, sha256, error, cached, probe, finished_at}
+_preprocess_lock = threading.Lock()
+_preprocess_workers = []
+
+
+def _preprocess_worker():
+    while True:
+        key, path = _preprocess_queue.get()
+        try:
+            with _preprocess_lock:
+                _preprocess_status[key] = {"status": "running"}
+            if not os.path.exists(path):
+                # deleted before we got to it
+                with _preprocess_lock:
+                    _preprocess_status.pop(key, None)
+                continue
+            if is_image(path):
+                # one-off grayscale/rotation/downscale copy that every later OCR run reuses
+                ensure_normalized(path)
+            probe, outcome = _screen_upload(key.split("/", 1)[0], path)
+            if outcome is not None:
+                # rejected / flagged: keep worker capacity for real statements
+                with _preprocess_lock:
+                    _preprocess_status[key] = {"status": outcome, "probe": probe, "finished_at": time()}
+                continue
+            record, cached = process_statement_file(path)
+            with _preprocess_lock:
+                _preprocess_status[key] = {"status": "done", "sha256": record.get("sha256"),
+                                           "cached": cached, "probe": probe, "finished_at": time()}
+        except Exception as exc:
+            print(f"Pre-processing failed for {key}: {exc}")
+            with _preprocess_lock:
+                _preprocess_status[key] = {"status": "error", "error": str(exc), "finished_at": time()}
+        finally:
+            _preprocess_queue.task_done()
+
+
+def _enqueue_preprocess(folder_label, path):
+    """
+    Queue a freshly uploaded file for background normalization, statement probe and OCR.
+    Returns the status string for the response.
+    """
+    if process_statement_file is None:
+        return "unavailable"
+    with _preprocess_lock:
+        if not _preprocess_workers:
+            for _ in range(max(PREPROCESS_WORKERS, 1)):
+                t = threading.Thread(target=_preprocess_worker, daemon=True)
+                t.start()
+                _preprocess_workers.append(t)
+        key = f"{folder_label}/{os.path.basename(path)}"
+        _preprocess_status[key] = {"status": "queued"}
+    _preprocess_queue.put((key, path))
+    return "queued"
+
+
+@app.route("/api/upload/status", methods=["GET"])
+def upload_status():
+    """Pre-processing state of uploaded files (queued / running / done / flagged / rejected / error)."""
+    with _preprocess_lock:
+        return jsonify({"files": dict(_preprocess_status), "pending": _preprocess_queue.unfinished_tasks}), 200
+
+
 def allowed_file(fname: str):
     ext = Path(fname).suffix.lower()
     return ext in ALLOWED_EXTENSIONS
 
 
-def save_file(file_storage, dest_folder: Path):
-    orig = secure_filename(file_storage.filename)
-    uid = f"{int(time() * 1000)}-{uuid.uuid4().hex[:8]}"
-    saved_name = f"{uid}-{orig}"
-    saved_path = dest_folder / saved_name
-    file_storage.save(saved_path)
-    return saved_name, str(saved_path)
+# Content index of saved uploads: folder label -> {sha256: saved filename}.
+# Built lazily from the files already on disk, then kept current by save/delete.
+_content_index = {}
+_content_index_lock = threading.Lock()
+
+_FOLDERS = {"credit": CREDIT_DIR, "debit": DEBIT_DIR}
+
+# Files saved by the upload endpoints (pre-processed there), which the folder watcher leaves alone
+_api_uploads = set()
+_api_uploads_lock = threading.Lock()
+
+
+def _is_api_upload(path):
+    with _api_uploads_lock:
+        return os.path.abspath(str(path)) in _api_uploads
+
+
+def _folder_index(folder_label):
+    """Return the sha256 -> filename index for a folder (caller holds _content_index_lock)."""
+    idx = _content_index.get(folder_label)
+    if idx is None:
+        idx = {}
+        for p in sorted(_FOLDERS[folder_label].iterdir()):
+            if p.is_file() and not p.name.startswith(".") and allowed_file(p.name):
+                try:
+                    idx.setdefault(hash_file(p), p.name)
+                except OSError:
+                    continue
+        _content_index[folder_label] = idx
+    return idx
+
+
+def _forget_content(folder_label, filename):
+    with _content_index_lock:
+        idx = _content_index.get(folder_label)
+        if idx:
+            for digest, name in list(idx.items()):
+                if name == filename:
+                    del idx[digest]
+
+
+def _stream_to_disk(file_storage, dest_folder: Path):
+    """
+    Stream an upload into a hidden temp file in dest_folder, hashing it on the way.
+    Returns (tmp_path, sha256, size). Raises ValueError if the upload exceeds MAX_FILE_SIZE_BYTES.
+    """
+    tmp_path = dest_folder / f".upload-{uuid.uuid4().hex}.part"
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = file_storage.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE_BYTES:
+                    raise ValueError(f"File exceeds max size of {MAX_FILE_SIZE_BYTES} bytes")
+                h.update(chunk)
+                out.write(chunk)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path, h.hexdigest(), size
+
+
+def save_file(file_storage, dest_folder: Path, dedup=False):
+    """
+    Save an upload under a unique timestamped name and register its content hash.
+    With dedup=True, content that already exists in dest_folder is not saved again.
+    Returns (saved_name, saved_path, sha256, duplicate_of) - duplicate_of is None unless skipped.
+    """
+    folder_label = "credit" if dest_folder == CREDIT_DIR else "debit"
+    tmp_path, digest, _ = _stream_to_disk(file_storage, dest_folder)
+
+    with _content_index_lock:
+        idx = _folder_index(folder_label)
+        existing = idx.get(digest)
+        if existing and not (dest_folder / existing).exists():
+            existing = None
+        if dedup and existing:
+            tmp_path.unlink(missing_ok=True)
+            return existing, str(dest_folder / existing), digest, existing
+
+        orig = secure_filename(file_storage.filename)
+        uid = f"{int(time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        saved_name = f"{uid}-{orig}"
+        saved_path = dest_folder / saved_name
+        with _api_uploads_lock:
+            _api_uploads.add(os.path.abspath(str(saved_path)))
+        os.replace(tmp_path, saved_path)
+        if not existing:
+            idx[digest] = saved_name
+    return saved_name, str(saved_path), digest, None
 
 
 def validate_file_storage(file_storage):
@@ -433,6 +813,34 @@ def validate_file_storage(file_storage):
     return None
 
 
+def _screen_upload(folder_label, path):
+    """
+    Run the cheap statement probe on a saved upload (on a pre-processing worker).
+    Returns (probe, outcome): outcome is "rejected" (file deleted again, STATEMENT_PROBE_MODE=reject),
+    "flagged" (kept but marked, so /api/process skips it) or None. An inconclusive probe never rejects.
+    """
+    if probe_statement is None or STATEMENT_PROBE_MODE == "off":
+        return None, None
+    probe = probe_statement(ensure_normalized(path) if is_image(path) else path)
+    if probe.get("is_statement") is not False:
+        return probe, None
+    if STATEMENT_PROBE_MODE == "reject":
+        Path(path).unlink(missing_ok=True)
+        remove_normalized(path)
+        _forget_content(folder_label, os.path.basename(path))
+        return probe, "rejected"
+    flag_file(path, {"probe": probe})
+    return probe, "flagged"
+
+
+def _accept_upload(folder_label, path):
+    """
+    Queue a saved upload for pre-processing (normalize, probe, OCR; see /api/upload/status).
+    Returns the response fields.
+    """
+    return {"size": os.path.getsize(path), "preprocess": _enqueue_preprocess(folder_label, path)}
+
+
 # Upload endpoints
 @app.route("/api/upload/credit", methods=["POST"])
 def upload_credit():
@@ -441,9 +849,10 @@ def upload_credit():
         err = validate_file_storage(f)
         if err:
             return jsonify({"error": err}), 400
-        name, path = save_file(f, CREDIT_DIR)
+        name, path, _, _ = save_file(f, CREDIT_DIR)
+        fields = _accept_upload("credit", path)
         return jsonify({"message": "Credit statement uploaded successfully", "filename": name, "path": path,
-                        "size": os.path.getsize(path)}), 200
+                        **fields}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -455,9 +864,63 @@ def upload_debit():
         err = validate_file_storage(f)
         if err:
             return jsonify({"error": err}), 400
-        name, path = save_file(f, DEBIT_DIR)
+        name, path, _, _ = save_file(f, DEBIT_DIR)
+        fields = _accept_upload("debit", path)
         return jsonify({"message": "Debit statement uploaded successfully", "filename": name, "path": path,
-                        "size": os.path.getsize(path)}), 200
+                        **fields}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/upload/batch", methods=["POST"])
+def upload_batch():
+    """
+    Upload many statements in one multipart request.
+    Form fields: "type" = credit|debit, "files" = one or more files.
+    Files are hashed while they stream to disk; content already present in that folder is skipped
+    and reported under "duplicates" (also when the same file appears twice in one batch).
+    """
+    try:
+        folder_label = (request.form.get("type") or "").lower()
+        if folder_label not in _FOLDERS:
+            return jsonify({"error": "Form field 'type' must be 'credit' or 'debit'"}), 400
+        files = request.files.getlist("files")
+        if not files:
+            return jsonify({"error": "No files provided"}), 400
+
+        uploaded, duplicates, errors = [], [], []
+        for f in files:
+            err = validate_file_storage(f)
+            if err:
+                errors.append({"original": getattr(f, "filename", None), "error": err})
+                continue
+            # every file gets its own outcome: a failure here must not lose the report for the others
+            path = None
+            try:
+                name, path, digest, duplicate_of = save_file(f, _FOLDERS[folder_label], dedup=True)
+                if duplicate_of:
+                    duplicates.append({"original": f.filename, "sha256": digest, "existing": duplicate_of})
+                    continue
+                fields = _accept_upload(folder_label, path)
+            except ValueError as exc:
+                errors.append({"original": f.filename, "error": str(exc)})
+                continue
+            except Exception as exc:
+                print(f"Batch upload of {f.filename} failed: {exc}")
+                if path is not None:
+                    # saved but not queued: remove it again so a retry isn't reported as a duplicate
+                    Path(path).unlink(missing_ok=True)
+                    _forget_content(folder_label, os.path.basename(path))
+                    with _api_uploads_lock:
+                        _api_uploads.discard(os.path.abspath(path))
+                errors.append({"original": f.filename, "error": str(exc)})
+                continue
+            uploaded.append({"original": f.filename, "filename": name, "path": path, "sha256": digest, **fields})
+
+        status = 200 if uploaded or duplicates else 400
+        return jsonify({"message": f"{len(uploaded)} uploaded, {len(duplicates)} duplicate(s) skipped",
+                        "type": folder_label, "uploaded": uploaded, "duplicates": duplicates,
+                        "errors": errors}), status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -471,6 +934,13 @@ def delete_credit(filename):
         if not t.exists():
             return jsonify({"error": "File not found"}), 404
         t.unlink()
+        remove_normalized(t)
+        unflag_file(t)
+        with _api_uploads_lock:
+            _api_uploads.discard(os.path.abspath(str(t)))
+        with _preprocess_lock:
+            _preprocess_status.pop(f"credit/{safe}", None)
+        _forget_content("credit", safe)
         return jsonify({"message": "Credit statement deleted successfully", "filename": safe}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -484,6 +954,13 @@ def delete_debit(filename):
         if not t.exists():
             return jsonify({"error": "File not found"}), 404
         t.unlink()
+        remove_normalized(t)
+        unflag_file(t)
+        with _api_uploads_lock:
+            _api_uploads.discard(os.path.abspath(str(t)))
+        with _preprocess_lock:
+            _preprocess_status.pop(f"debit/{safe}", None)
+        _forget_content("debit", safe)
         return jsonify({"message": "Debit statement deleted successfully", "filename": safe}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -492,7 +969,15 @@ def delete_debit(filename):
 # Serve resulting JSONs (optional)
 @app.route("/api/output/<path:filename>", methods=["GET"])
 def serve_output(filename):
-    return send_from_directory(OUTPUT_DIR, filename, as_attachment=False)
+    """
+    Output files, served from their pre-compressed .br/.gz variants when the client accepts
+    them, with a strong ETag (If-None-Match -> 304) and Cache-Control: no-cache.
+    ?pretty=1 returns an indented copy of a JSON file for reading.
+    """
+    path = safe_join(str(OUTPUT_DIR), filename)
+    if path is None:
+        return jsonify({"error": "Not found"}), 404
+    return serve_file(path, pretty=request.args.get("pretty") in ("1", "true"))
 
 
 def _try_load_percentages_from_files():
@@ -554,21 +1039,36 @@ def _start_processing_job(jobid):
         if run_json_text is None:
             raise RuntimeError("run_json_text is not importable. Ensure text_to_json.py is present and importable.")
 
+        def on_progress(event):
+            # Keep the latest progress on the job (for polling) and stream it as an SSE 'progress' event
+            _jobs[jobid]["progress"] = event
+            q.put(event)
+
         # Run pipeline (synchronously). If this raises, will go to except block.
-        combined = run_json_text()
+        with _pipeline_lock:
+            combined = run_json_text(progress_callback=on_progress)
 
         # Save summary + file paths (attempt to save outputs if run_json_text wrote them)
         summary = combined.get("summary", {}) if isinstance(combined, dict) else {}
         combined_path = str(OUTPUT_DIR / "all_transactions.json")
-        per_file_path = str(OUTPUT_DIR / "per_file_results.json")
+        per_file_path = artifact_path(str(OUTPUT_DIR), "per_file_results")
 
         # Mark job completed for primary pipeline
         _jobs[jobid]["status"] = "completed"
         _jobs[jobid]["finished_at"] = time()
-        _jobs[jobid]["result"] = {"summary": summary, "combined": combined_path, "per_file": per_file_path}
+        recurring = combined.get("recurring", []) if isinstance(combined, dict) else []
+        _jobs[jobid]["result"] = {"summary": summary, "combined": combined_path, "per_file": per_file_path,
+                                  "recurring": recurring}
 
         q.put({"event": "completed", "result": _jobs[jobid]["result"]})
 
+        # Rebuild the transaction store now rather than on the first /api/transactions request
+        if get_transaction_store is not None:
+            try:
+                get_transaction_store(str(OUTPUT_DIR))
+            except Exception as e:
+                print("Transaction store rebuild failed:", e)
+
         # --- NEW: try to compute/find percentages and store them for frontend ---
         percentages_payload = None
 
@@ -679,7 +1179,8 @@ def process_all():
     jobid = uuid.uuid4().hex
     q = queue.Queue()
     with _jobs_lock:
-        _jobs[jobid] = {"status": "pending", "queue": q, "created_at": time(), "result": None, "error": None}
+        _jobs[jobid] = {"status": "pending", "queue": q, "created_at": time(), "result": None, "error": None,
+                        "progress": None}
     # spawn thread
     t = threading.Thread(target=_start_processing_job, args=(jobid,), daemon=True)
     t.start()
@@ -746,11 +1247,104 @@ def result(jobid):
     return jsonify({
         "status": rec.get("status"),
         "result": rec.get("result"),
-        "error": rec.get("error")
+        "error": rec.get("error"),
+        "progress": rec.get("progress")
     }), 200
 
 
+# ------------------------------------------------------------------
+# Watch-folder ingestion + push of updated aggregates to /api/events subscribers
+# ------------------------------------------------------------------
+_subscribers = []  # one queue.Queue per connected /api/events client
+_subscribers_lock = threading.Lock()
+SUBSCRIBER_QUEUE_SIZE = 100
+_watcher = None
+
+
+def _broadcast(msg):
+    """Send an event dict to every /api/events subscriber (slow clients that fall behind are dropped)."""
+    with _subscribers_lock:
+        for q in list(_subscribers):
+            try:
+                q.put_nowait(msg)
+            except queue.Full:
+                _subscribers.remove(q)
+
+
+def _watch_ingest(batch):
+    files = [f"{label}/{os.path.basename(path)}" for label, path in batch]
+    _broadcast({"event": "ingest_started", "files": files})
+    try:
+        combined = ingest_batch(batch, pipeline_lock=_pipeline_lock,
+                                progress_callback=lambda event: _broadcast(event))
+    except Exception as exc:
+        _broadcast({"event": "ingest_error", "files": files, "error": str(exc)})
+        raise
+    if get_transaction_store is not None:
+        try:
+            get_transaction_store(str(OUTPUT_DIR))
+        except Exception as e:
+            print("Transaction store rebuild failed:", e)
+    msg = {"event": "aggregates", "files": files, "summary": combined.get("summary", {})}
+    if get_dashboard is not None:
+        with PERCENTAGES_LOCK:
+            posted = LATEST_PERCENTAGES["percentages"] if LATEST_PERCENTAGES else None
+        body, etag = get_dashboard(str(OUTPUT_DIR), posted)
+        msg.update(dashboard=json.loads(body), etag=etag)
+    _broadcast(msg)
+
+
+def _start_watcher():
+    global _watcher
+    if _watcher is not None or FolderWatcher is None or run_json_text is None:
+        return
+    _watcher = FolderWatcher({"credit": CREDIT_DIR, "debit": DEBIT_DIR}, _watch_ingest,
+                             ignore=_is_api_upload).start()
+
+
+@app.route("/api/events")
+def stream_events():
+    """
+    SSE stream of watch-folder ingests (WATCH_FOLDERS=1): 'ingest_started', the pipeline's
+    'progress' events, then 'aggregates' with the refreshed dashboard payload and its ETag
+    (or 'ingest_error'). A comment line is sent every 15s to keep idle connections open.
+    """
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _subscribers_lock:
+        _subscribers.append(q)
+
+    def event_stream():
+        try:
+            yield f"event: status\ndata: {json.dumps({'watching': _watcher is not None})}\n\n"
+            while True:
+                try:
+                    msg = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {msg.get('event', 'message')}\ndata: {json.dumps(msg)}\n\n"
+        finally:
+            with _subscribers_lock:
+                if q in _subscribers:
+                    _subscribers.remove(q)
+
+    headers = {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }
+    return Response(event_stream(), headers=headers)
+
+
+# Imported by a WSGI server: start watching now. Under `python app.py` only the debug
+# reloader's child process (the one serving requests) starts it, below.
+if WATCH_FOLDERS and __name__ != "__main__":
+    _start_watcher()
+
+
 if __name__ == "__main__":
+    if WATCH_FOLDERS and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        _start_watcher()
     # Run flask on port 3001 (your frontend on 5173 will call it)
     port = int(os.environ.get("PORT", "3001"))
     app.run(host="0.0.0.0", port=port, debug=True)
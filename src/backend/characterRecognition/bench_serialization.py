@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+bench_serialization.py
+
+Usage:
+    python bench_serialization.py --transactions 200000
+
+Times encoding/decoding of a synthetic per_file_results-shaped history with each
+serializer available here (stdlib json indented/compact, orjson, msgpack) and prints
+the raw and gzipped sizes, to pick OUTPUT_PRETTY / INTERNAL_FORMAT for a deployment.
+"""
+
+import gzip
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+MERCHANTS = [("TESCO STORES", "Groceries"), ("AMAZON UK", "Shopping"), ("TFL TRAVEL", "Transport"),
+             ("NETFLIX.COM", "Subscriptions"), ("PRET A MANGER", "Eating Out"), ("SHELL", "Transport"),
+             ("SPOTIFY", "Subscriptions"), ("BOOTS", "Health"), ("SALARY ACME LTD", "Income")]
+
+
+def synthetic_results(n, files=12, seed=0):
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    per_file = []
+    for f in range(files):
+        txns = []
+        for _ in range(n // files):
+            name, category = rng.choice(MERCHANTS)
+            txns.append({
+                "date": (start + timedelta(days=rng.randrange(730))).strftime("%d %b %Y"),
+                "company-name": name,
+                "company-type": category,
+                "amount": f"£{rng.uniform(1, 250):,.2f}",
+                "balance": f"£{rng.uniform(0, 5000):,.2f}",
+                "type": "in" if category == "Income" else "out",
+                "card-type": rng.choice(("credit", "debit")),
+            })
+        per_file.append({"file": f"statement_{f:02d}.pdf", "transactions": txns})
+    return per_file
+
+
+def _timed(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the output serializers on a synthetic history.")
+    parser.add_argument("--transactions", "-n", type=int, default=100000, help="Transactions to generate (default: 100000).")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Runs per serializer, best is reported (default: 3).")
+    args = parser.parse_args()
+
+    data = synthetic_results(args.transactions)
+    codecs = [
+        ("json indent=2", lambda o: json.dumps(o, indent=2).encode("utf-8"), json.loads),
+        ("json compact", lambda o: json.dumps(o, separators=(",", ":")).encode("utf-8"), json.loads),
+    ]
+    if orjson is not None:
+        codecs.append(("orjson", orjson.dumps, orjson.loads))
+    else:
+        print("orjson not installed, skipping")
+    if msgpack is not None:
+        codecs.append(("msgpack", lambda o: msgpack.packb(o, use_bin_type=True),
+                       lambda b: msgpack.unpackb(b, raw=False)))
+    else:
+        print("msgpack not installed, skipping")
+
+    print(f"{args.transactions} transactions")
+    print(f"{'format':<15}{'encode ms':>11}{'decode ms':>11}{'size KB':>10}{'gzip KB':>10}")
+    for name, dumps, loads in codecs:
+        blob, enc = _timed(dumps, data, args.repeat)
+        _, dec = _timed(loads, blob, args.repeat)
+        gz = len(gzip.compress(blob, compresslevel=6))
+        print(f"{name:<15}{enc * 1000:>11.1f}{dec * 1000:>11.1f}{len(blob) / 1024:>10.0f}{gz / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+bulk_process.py
+
+Offline backfill of large statement archives, outside the credit/ + debit/ upload folders.
+
+Usage:
+    python bulk_process.py /archive/2019 /archive/2020 --workers 8
+    python bulk_process.py --manifest statements.txt --checkpoint backfill.jsonl
+    python bulk_process.py /archive --checkpoint backfill.jsonl --retry-failed   # resume
+    python bulk_process.py /archive --output-dir backfill_output
+
+Behavior:
+ - Inputs are directory trees (walked recursively for supported image/PDF files), single
+   files, or manifests (--manifest; one path per line, or JSONL lines {"path", "card_type"}).
+ - Files are OCR'd + parsed in a multiprocessing pool through process_statement_file, so
+   results land in the shared content-hash cache (./cache/results) and a later
+   run_json_text / upload of the same statement is a cache hit.
+ - Every finished file is appended to the checkpoint (JSONL, one line per file with its
+   status, sha256, transaction count and timing). Re-running with the same checkpoint skips
+   files already recorded (unless they changed on disk), so an interrupted run resumes
+   where it stopped; --retry-failed also re-runs the files that errored.
+ - Card type comes from a "credit"/"debit" directory in the file's path, the manifest entry,
+   or --card-type.
+ - When the pool finishes, every statement recorded in the checkpoint (this run and earlier
+   ones) is merged into --output-dir (default bulk_output/) with the same files run_json_text
+   writes to output/: per-file and category JSON, all_transactions.json/.ndjson (deduplicated
+   across statements, card-type set), per_file_results, rollups.json and recurring.json. The
+   records are read back from the content cache, so a resumed run merges everything done so far.
+ - Prints throughput and failure stats at the end (also on Ctrl+C).
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import multiprocessing
+from collections import Counter
+from datetime import datetime
+
+try:
+    from characterRecognition.text_to_json import process_statement_file, write_outputs
+    from characterRecognition.file_cache import load_cached, store_cached
+    from characterRecognition.output_writer import OutputBatch
+except Exception:
+    from text_to_json import process_statement_file, write_outputs
+    from file_cache import load_cached, store_cached
+    from output_writer import OutputBatch
+
+SUPPORTED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".pdf"}
+DEFAULT_CHECKPOINT = "bulk_checkpoint.jsonl"
+DEFAULT_OUTPUT_DIR = "bulk_output"
+# fsync the checkpoint every N lines (each line is flushed as it is written)
+CHECKPOINT_SYNC_EVERY = 50
+
+
+def _card_type_from_path(path):
+    parts = [p.lower() for p in os.path.normpath(path).split(os.sep)]
+    for label in ("credit", "debit"):
+        if label in parts:
+            return label
+    return None
+
+
+def collect_inputs(paths, manifests=(), card_type=None):
+    """[(absolute path, card type or None)] for the given files/directories and manifests, in a stable order."""
+    entries = []
+
+    def add(path, card=None):
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                # skip hidden directories, e.g. the .normalized/ copies made by image_normalize
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                        full = os.path.join(root, name)
+                        entries.append((full, card or card_type or _card_type_from_path(full)))
+        elif os.path.isfile(path):
+            entries.append((path, card or card_type or _card_type_from_path(path)))
+        else:
+            print(f"Warning: skipping missing input {path}")
+
+    for manifest in manifests:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    item = json.loads(line)
+                    add(os.path.join(base, item["path"]), item.get("card_type"))
+                else:
+                    add(os.path.join(base, line))
+    for path in paths:
+        add(path)
+
+    seen, unique = set(), []
+    for path, card in entries:
+        if path not in seen:
+            seen.add(path)
+            unique.append((path, card))
+    return unique
+
+
+def load_checkpoint(path):
+    """path -> last checkpoint entry for it (a truncated last line from a crash is ignored)."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            done[entry["path"]] = entry
+    return done
+
+
+def _needs_run(entry, path, retry_failed):
+    if entry is None:
+        return True
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return True
+    if (entry.get("size"), entry.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+        return True
+    return retry_failed and entry.get("status") == "error"
+
+
+def _init_worker():
+    # Ctrl+C is handled by the parent, which stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _process_one(job):
+    path, card_type, use_cache = job
+    started = time.monotonic()
+    entry = {"path": path, "card_type": card_type}
+    try:
+        st = os.stat(path)
+        entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        record, cached = process_statement_file(path, use_cache=use_cache)
+        if not use_cache and record.get("text"):
+            # re-OCR'd on request: refresh the cache, which the merge reads the results from
+            store_cached(record["sha256"], record)
+        result = record.get("result")
+        entry.update(sha256=record.get("sha256"), cached=cached)
+        if result is None:
+            entry.update(status="empty", transactions=0)
+        else:
+            summary = result.get("summary", {})
+            entry.update(status="ok", transactions=len(result.get("transactions", [])),
+                         money_in=summary.get("money_in"), money_out=summary.get("money_out"))
+    except Exception as e:
+        entry.update(status="error", error=f"{type(e).__name__}: {e}")
+    entry["seconds"] = round(time.monotonic() - started, 3)
+    entry["finished_at"] = datetime.utcnow().isoformat() + "Z"
+    return entry
+
+
+def print_stats(results, skipped, elapsed):
+    statuses = Counter(r["status"] for r in results)
+    done = len(results)
+    size = sum(r.get("size", 0) for r in results)
+    print("\n=== Bulk run summary ===")
+    print(f"Files processed: {done} (ok {statuses['ok']}, empty {statuses['empty']}, "
+          f"failed {statuses['error']}), skipped from checkpoint: {skipped}")
+    print(f"Cache hits: {sum(1 for r in results if r.get('cached'))}, "
+          f"transactions: {sum(r.get('transactions', 0) for r in results)}")
+    if elapsed > 0:
+        print(f"Elapsed: {elapsed:.1f}s, {done / elapsed:.2f} files/s, {size / elapsed / 1e6:.2f} MB/s")
+    if done:
+        times = sorted(r["seconds"] for r in results)
+        print(f"Per file: median {times[done // 2]:.2f}s, p95 {times[min(done - 1, int(done * 0.95))]:.2f}s, "
+              f"max {times[-1]:.2f}s")
+    failures = Counter(r["error"].split("\n")[0][:120] for r in results if r["status"] == "error")
+    if failures:
+        print("Top failures:")
+        for message, count in failures.most_common(5):
+            print(f"  {count} x {message}")
+
+
+def merge_outputs(checkpoint_path, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Merge the results of every file the checkpoint records as done into output_dir
+    (see text_to_json.write_outputs). Returns the number of statements merged.
+    """
+    records = {}
+    for path, entry in sorted(load_checkpoint(checkpoint_path).items()):
+        if entry.get("status") not in ("ok", "empty") or not entry.get("sha256"):
+            continue
+        record = load_cached(entry["sha256"])
+        if record is None:
+            print(f"Warning: no cached result for {path}; re-run it with --no-cache to merge it")
+            continue
+        # the key's folder part is the card type write_outputs applies; names can repeat across archive dirs
+        key = f"{entry.get('card_type') or 'unknown'}/{os.path.basename(path)}"
+        if key in records:
+            key = f"{entry.get('card_type') or 'unknown'}/{entry['sha256'][:12]}_{os.path.basename(path)}"
+        records[key] = record
+    with OutputBatch():
+        combined = write_outputs(records, os.path.abspath(output_dir))
+    print(f"Merged {len(records)} statements ({len(combined['transactions'])} transactions) into {output_dir}")
+    return len(records)
+
+
+def run_bulk(inputs, checkpoint_path=DEFAULT_CHECKPOINT, workers=None, retry_failed=False, use_cache=True,
+             progress_every=25):
+    """
+    Process [(path, card type)] with a process pool, appending each result to the checkpoint.
+    Returns (results of this run, number skipped because the checkpoint already had them).
+    """
+    done = load_checkpoint(checkpoint_path)
+    jobs = [(path, card, use_cache) for path, card in inputs if _needs_run(done.get(path), path, retry_failed)]
+    skipped = len(inputs) - len(jobs)
+    workers = workers or os.cpu_count() or 1
+    print(f"{len(inputs)} files, {skipped} already in {checkpoint_path}, {len(jobs)} to process with {workers} workers")
+
+    results = []
+    started = time.monotonic()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker)
+    try:
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            try:
+                for entry in pool.imap_unordered(_process_one, jobs, chunksize=1):
+                    checkpoint.write(json.dumps(entry) + "\n")
+                    checkpoint.flush()
+                    results.append(entry)
+                    if len(results) % CHECKPOINT_SYNC_EVERY == 0:
+                        os.fsync(checkpoint.fileno())
+                    if entry["status"] == "error":
+                        print(f"Error processing {entry['path']}: {entry['error']}")
+                    if len(results) % progress_every == 0 or len(results) == len(jobs):
+                        rate = len(results) / max(time.monotonic() - started, 1e-9)
+                        print(f"[{len(results)}/{len(jobs)}] {rate:.2f} files/s")
+                pool.close()
+            except KeyboardInterrupt:
+                print("\nInterrupted: stopping workers (finished files are in the checkpoint)")
+                pool.terminate()
+            finally:
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+    finally:
+        pool.join()
+    print_stats(results, skipped, time.monotonic() - started)
+    return results, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR + parse large statement archives with a process pool, resumably.")
+    parser.add_argument("inputs", nargs="*", help="Statement files or directories (walked recursively).")
+    parser.add_argument("--manifest", "-m", action="append", default=[],
+                        help="File listing statements, one path per line or JSONL {\"path\", \"card_type\"} (repeatable).")
+    parser.add_argument("--checkpoint", "-c", default=DEFAULT_CHECKPOINT,
+                        help=f"Checkpoint JSONL to append results to and resume from (default: {DEFAULT_CHECKPOINT}).")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--card-type", choices=("credit", "debit"), default=None,
+                        help="Card type for files whose path doesn't say (default: from a credit/ or debit/ directory).")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run files the checkpoint records as failed.")
+    parser.add_argument("--output-dir", "-o", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Where the merged outputs are written (default: {DEFAULT_OUTPUT_DIR}).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-OCR files even if their result is cached (the cache is refreshed).")
+    args = parser.parse_args()
+
+    if not args.inputs and not args.manifest:
+        parser.error("give at least one input path or --manifest")
+    inputs = collect_inputs(args.inputs, args.manifest, args.card_type)
+    results, skipped = run_bulk(inputs, args.checkpoint, args.workers, args.retry_failed, use_cache=not args.no_cache)
+    if len(results) + skipped == len(inputs):
+        merge_outputs(args.checkpoint, args.output_dir)
+    else:
+        print("Run incomplete: outputs not merged (re-run with the same checkpoint to finish and merge)")
+    sys.exit(1 if any(r["status"] == "error" for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+chat_cache.py
+
+Response cache for the chat endpoints.
+
+A reply is reused when the user's processed data, their profile and the (normalized)
+question are all unchanged:
+
+  key = sha256(data snapshot hash | age | credit score | numerical level | normalized question)
+
+The data snapshot hash is the SHA-256 of the per_file_results artifact, recomputed only when
+the file's mtime/size change, so a cache lookup costs one stat() and a couple of hashes.
+Entries expire after a TTL and the least recently used entry is evicted when full.
+"""
+
+import os
+import re
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from characterRecognition.file_cache import hash_file
+    from characterRecognition.serialization import artifact_path
+except Exception:
+    from file_cache import hash_file
+    from serialization import artifact_path
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache with hit/miss metrics."""
+
+    def __init__(self, max_entries=512, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_PUNCT_RE = re.compile(r"[^\w£%.\s-]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Case/whitespace/punctuation-insensitive form of a question ("How much on Coffee??" == "how much on coffee")."""
+    q = _PUNCT_RE.sub(" ", (question or "").lower())
+    return _SPACE_RE.sub(" ", q).strip(" .-")
+
+
+_snapshot_memo = {}  # path -> ((mtime_ns, size), sha256)
+_snapshot_lock = threading.Lock()
+
+
+def data_snapshot_hash(output_dir):
+    """Hash identifying the current processed data ("empty" if nothing processed yet)."""
+    path = artifact_path(output_dir, "per_file_results")
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "empty"
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _snapshot_lock:
+        memo = _snapshot_memo.get(path)
+        if memo and memo[0] == stamp:
+            return memo[1]
+    digest = hash_file(path)
+    with _snapshot_lock:
+        _snapshot_memo[path] = (stamp, digest)
+    return digest
+
+
+def chat_cache_key(snapshot, profile, question):
+    parts = [
+        snapshot,
+        str(profile.get("age")),
+        str(profile.get("credit_score")),
+        str(profile.get("numerical_level")),
+        normalize_question(question),
+    ]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,134 @@
+"""
+chat_context.py
+
+Builds the compact spending summary that is injected into chat/tips prompts instead of
+raw transaction rows. Its size depends on the number of categories and the top-N limits,
+not on how many transactions the user has.
+
+Summary shape:
+  {
+    "period": {"from": "2025-01-02", "to": "2025-03-28"},
+    "transactions": 412,
+    "total_spend": 2345.67,
+    "by_category": {"Shopping": {"spend": 512.3, "share": 21.8, "count": 40}, ...},
+    "by_card_type": {"credit": {"spend": ..., "share": ...}, "debit": {...}},
+    "top_merchants": [{"name": "Tesco", "spend": 210.5, "count": 12}, ...],
+    "recurring": [{"merchant": "Netflix", "amount": 10.99, "months": 3}, ...],
+    "vs_goal": [{"name": "Eating Out", "target": 2, "actual": 9.1, "delta": 7.1}, ...]   # biggest overspend first
+  }
+"""
+
+import os
+import json
+import threading
+from collections import defaultdict
+
+try:
+    from characterRecognition.spending import (
+        CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, OUTPUT_DIR,
+        canonical_category, is_spend, txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+    from characterRecognition.recurring import detect_recurring
+except Exception:
+    from spending import (
+        CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, OUTPUT_DIR,
+        canonical_category, is_spend, txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+    from recurring import detect_recurring
+
+TOP_MERCHANTS = 5
+MAX_RECURRING = 10
+
+
+def _pct(part, total):
+    return round(part / total * 100, 1) if total else 0.0
+
+
+def _recurring_charges(transactions, limit=MAX_RECURRING):
+    """Active monthly charges from the recurring detector, in compact form."""
+    return [
+        {"merchant": r["merchant"], "amount": r["amount"], "months": r["months"]}
+        for r in detect_recurring(transactions) if r["active"]
+    ][:limit]
+
+
+def build_spending_summary(transactions, goal_mix=None, top_n=TOP_MERCHANTS):
+    """Compute the compact summary (see module docstring) from full transaction records."""
+    goal_mix = DEFAULT_GOAL_MIX if goal_mix is None else goal_mix
+
+    spend_rows = [(t, txn_amount(t), txn_date(t)) for t in transactions if is_spend(t)]
+
+    total = 0.0
+    by_category = {c: {"spend": 0.0, "count": 0} for c in CANONICAL_CATEGORIES}
+    by_card = defaultdict(float)
+    merchants = defaultdict(lambda: {"spend": 0.0, "count": 0})
+    dates = []
+
+    for txn, amount, d in spend_rows:
+        total += amount
+        cat = by_category[canonical_category(txn.get("company-type"))]
+        cat["spend"] += amount
+        cat["count"] += 1
+        by_card[(txn.get("card-type") or "unknown").lower()] += amount
+        name = (txn.get("company-name") or "").strip()
+        if name:
+            merchants[name]["spend"] += amount
+            merchants[name]["count"] += 1
+        if d is not None:
+            dates.append(d)
+
+    for cat in by_category.values():
+        cat["share"] = _pct(cat["spend"], total)
+        cat["spend"] = round(cat["spend"], 2)
+
+    top_merchants = sorted(merchants.items(), key=lambda kv: kv[1]["spend"], reverse=True)[:top_n]
+
+    vs_goal = []
+    for goal in goal_mix:
+        name = canonical_category(goal.get("name"))
+        actual = by_category[name]["share"]
+        target = goal.get("percentage", 0)
+        vs_goal.append({"name": name, "target": target, "actual": actual, "delta": round(actual - target, 1)})
+    vs_goal.sort(key=lambda g: g["delta"], reverse=True)
+
+    return {
+        "period": {"from": min(dates).isoformat(), "to": max(dates).isoformat()} if dates else None,
+        "transactions": len(spend_rows),
+        "total_spend": round(total, 2),
+        "by_category": by_category,
+        "by_card_type": {k: {"spend": round(v, 2), "share": _pct(v, total)} for k, v in by_card.items()},
+        "top_merchants": [{"name": k, "spend": round(v["spend"], 2), "count": v["count"]} for k, v in top_merchants],
+        "recurring": _recurring_charges(transactions),
+        "vs_goal": vs_goal,
+    }
+
+
+def render_summary(summary):
+    """Compact JSON for prompts (no indentation/whitespace)."""
+    return json.dumps(summary, separators=(",", ":"), ensure_ascii=False)
+
+
+_summary_cache = {}  # (output_dir, goal key) -> (per_file_results stat, summary)
+_summary_lock = threading.Lock()
+
+
+def get_spending_summary(output_dir=OUTPUT_DIR, goal_mix=None):
+    """
+    Summary of the user's processed data in output_dir, recomputed only when
+    per_file_results.json changes.
+    """
+    path = per_file_results_path(output_dir)
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+    key = (output_dir, json.dumps(goal_mix, sort_keys=True))
+    with _summary_lock:
+        hit = _summary_cache.get(key)
+        if hit and hit[0] == stamp:
+            return hit[1]
+    summary = build_spending_summary(load_full_transactions(output_dir) if stamp else [], goal_mix)
+    with _summary_lock:
+        _summary_cache[key] = (stamp, summary)
+    return summary
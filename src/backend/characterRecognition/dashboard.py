@@ -0,0 +1,117 @@
+"""
+dashboard.py
+
+One precomputed payload with everything the dashboard charts need, instead of separate
+fetches of /api/spending/latest, the output JSON files and the job result:
+
+  {
+    "percentages": [{"name", "percentage"}...],   # pie chart
+    "totals": {"period", "transactions", "total_spend", "by_category", "by_card_type"},
+    "rollups": {"month": {...last 12}, "week": {...last 12}, "day": {...last 31}},   # line / column charts
+    "top_merchants": [...],
+    "recurring": {"count", "active", "monthly_total"}
+  }
+
+The payload is serialized once per data version (stats of per_file_results.json,
+rollups.json, recurring.json and category_percentages.json, plus any posted percentages)
+and kept in memory with a strong ETag, so a request costs a few stat() calls and
+revalidations are answered with 304.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+try:
+    from characterRecognition.spending import OUTPUT_DIR, per_file_results_path
+    from characterRecognition.serialization import dumps_json, load_json
+    from characterRecognition.chat_context import get_spending_summary
+    from characterRecognition.rollups import GRANULARITIES, load_rollups, slice_rollups
+    from characterRecognition.recurring import load_recurring
+except Exception:
+    from spending import OUTPUT_DIR, per_file_results_path
+    from serialization import dumps_json, load_json
+    from chat_context import get_spending_summary
+    from rollups import GRANULARITIES, load_rollups, slice_rollups
+    from recurring import load_recurring
+
+RECENT_PERIODS = {"month": 12, "week": 12, "day": 31}
+_SOURCES = ("rollups.json", "recurring.json", "category_percentages.json")
+
+
+def _stamp(output_dir):
+    stamp = []
+    for path in [per_file_results_path(output_dir)] + [os.path.join(output_dir, n) for n in _SOURCES]:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return stamp
+
+
+def _recent(series, n):
+    """Last n periods of a sliced rollup series."""
+    def tail(values):
+        return values[-n:]
+    return {
+        "granularity": series["granularity"],
+        "periods": tail(series["periods"]),
+        "total": tail(series["total"]),
+        "by_category": {k: tail(v) for k, v in series["by_category"].items()},
+        "by_card": {k: tail(v) for k, v in series["by_card"].items()},
+        "count": tail(series["count"]),
+    }
+
+
+def build_dashboard(output_dir=OUTPUT_DIR, percentages=None):
+    """
+    Assemble the dashboard payload (see module docstring). percentages defaults to
+    category_percentages.json, then to the category shares of the spending summary.
+    """
+    summary = get_spending_summary(output_dir)
+    if percentages is None:
+        path = os.path.join(output_dir, "category_percentages.json")
+        if os.path.exists(path):
+            percentages = load_json(path)
+    if percentages is None:
+        # no posted/computed percentages yet: derive them from the spending summary
+        percentages = [{"name": name, "percentage": round(v["share"])}
+                       for name, v in summary["by_category"].items() if v["spend"]]
+    rollups = load_rollups(output_dir)
+    recurring = load_recurring(output_dir)
+    return {
+        "percentages": percentages,
+        "totals": {
+            "period": summary["period"],
+            "transactions": summary["transactions"],
+            "total_spend": summary["total_spend"],
+            "by_category": {k: {"spend": v["spend"], "share": v["share"]} for k, v in summary["by_category"].items()},
+            "by_card_type": summary["by_card_type"],
+        },
+        "rollups": {g: _recent(slice_rollups(rollups, g), RECENT_PERIODS[g]) for g in GRANULARITIES}
+        if rollups else None,
+        "top_merchants": summary["top_merchants"],
+        "recurring": recurring.get("summary") if recurring else None,
+    }
+
+
+_snapshot = {"key": None, "body": None, "etag": None}
+_snapshot_lock = threading.Lock()
+
+
+def get_dashboard(output_dir=OUTPUT_DIR, percentages=None):
+    """
+    (body bytes, etag) for the current data, rebuilt only when a source file or the
+    percentages change.
+    """
+    key = json.dumps([output_dir, _stamp(output_dir), percentages], sort_keys=True, default=str)
+    with _snapshot_lock:
+        if _snapshot["key"] == key:
+            return _snapshot["body"], _snapshot["etag"]
+    body = dumps_json(build_dashboard(output_dir, percentages), pretty=False)
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    with _snapshot_lock:
+        _snapshot.update(key=key, body=body, etag=etag)
+    return body, etag
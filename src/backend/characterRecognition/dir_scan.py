@@ -0,0 +1,138 @@
+"""
+dir_scan.py
+
+Listing statement files in the upload folders.
+
+Each folder is read in one os.scandir pass, matching extensions case-insensitively, into
+a manifest {name: (size, mtime_ns)}. The manifest is kept per folder together with the
+folder's own mtime: adding, removing or renaming a file changes the folder mtime, so while it
+is unchanged the cached list of names is reused without reading the directory again. (A
+listing taken within FS_TIMESTAMP_SLACK of the folder's last change is not trusted, since a
+change in the same timestamp tick would not move the mtime.) Rewriting a file in place does
+not touch the folder mtime, so folder_manifest() re-stats the cached names for their current
+size/mtime.
+
+Files the upload probe judged not to be statements are flagged with a marker in the hidden
+<folder>/.flagged/ subfolder (flag_file); flagged_names() lists them so the pipeline can skip
+them. A marker only counts while the file still has the size/mtime it was flagged with.
+"""
+
+import os
+import json
+import time
+import threading
+
+SUPPORTED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".pdf"}
+FLAGGED_DIRNAME = ".flagged"
+# coarsest mtime granularity we expect (FAT/SMB shares: 2s)
+FS_TIMESTAMP_SLACK_NS = 2 * 10**9
+
+
+def is_statement_name(name):
+    """Supported statement file name (hidden names like upload temp files are skipped)."""
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def scan_dir(directory):
+    """{name: (size, mtime_ns)} of the statement files directly in directory ({} if missing)."""
+    manifest = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if is_statement_name(entry.name) and entry.is_file():
+                    st = entry.stat()
+                    manifest[entry.name] = (st.st_size, st.st_mtime_ns)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return manifest
+
+
+_manifests = {}  # directory -> (dir mtime_ns, scanned at ns, manifest, sorted paths)
+_manifests_lock = threading.Lock()
+
+
+def _listing(directory):
+    """(manifest, sorted paths, from cache?) for directory."""
+    directory = os.path.abspath(directory)
+    try:
+        dir_mtime = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return {}, [], False
+    with _manifests_lock:
+        cached = _manifests.get(directory)
+    if cached and cached[0] == dir_mtime and cached[1] - dir_mtime >= FS_TIMESTAMP_SLACK_NS:
+        return cached[2], cached[3], True
+    scanned_at = time.time_ns()
+    manifest = scan_dir(directory)
+    paths = [os.path.join(directory, name) for name in sorted(manifest)]
+    with _manifests_lock:
+        _manifests[directory] = (dir_mtime, scanned_at, manifest, paths)
+    return manifest, paths, False
+
+
+def folder_manifest(directory):
+    """
+    Manifest of directory (see scan_dir). The directory is re-read only when the folder's
+    mtime changed; otherwise the cached names are re-stat'ed, so files rewritten in place
+    report their current size/mtime.
+    """
+    manifest, paths, from_cache = _listing(directory)
+    if not from_cache:
+        return manifest
+    current = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        current[os.path.basename(path)] = (st.st_size, st.st_mtime_ns)
+    return current
+
+
+def list_statement_files(directory):
+    """Sorted full paths of the statement files in directory."""
+    # names only: an in-place rewrite doesn't change them, so the cached list is enough
+    return list(_listing(directory)[1])
+
+
+def _flag_path(path):
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, FLAGGED_DIRNAME, name + ".json")
+
+
+def flag_file(path, info=None):
+    """Mark path as not a statement (info, e.g. the probe result, is stored with the marker)."""
+    st = os.stat(path)
+    marker = _flag_path(path)
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    tmp = f"{marker}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns, **(info or {})}, f)
+    os.replace(tmp, marker)
+
+
+def unflag_file(path):
+    try:
+        os.remove(_flag_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def flagged_names(directory):
+    """Names of the files in directory flagged by flag_file() and unchanged since."""
+    names = set()
+    try:
+        markers = [n for n in os.listdir(os.path.join(directory, FLAGGED_DIRNAME)) if n.endswith(".json")]
+    except (FileNotFoundError, NotADirectoryError):
+        return names
+    for marker in markers:
+        name = marker[:-len(".json")]
+        try:
+            with open(os.path.join(directory, FLAGGED_DIRNAME, marker), "r", encoding="utf-8") as f:
+                info = json.load(f)
+            st = os.stat(os.path.join(directory, name))
+        except (OSError, ValueError):
+            continue
+        if (info.get("size"), info.get("mtime_ns")) == (st.st_size, st.st_mtime_ns):
+            names.add(name)
+    return names
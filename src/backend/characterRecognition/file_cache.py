@@ -0,0 +1,90 @@
+"""
+file_cache.py
+
+Content-addressed cache for per-file OCR/parse results.
+
+Each uploaded statement is identified by the SHA-256 of its bytes, so the same PDF
+uploaded twice (or renamed) is only OCR'd once. Records are stored as
+./cache/results/<sha256>.json next to this module (or under $FILE_CACHE_DIR, e.g. a
+directory shared with task_queue workers on other hosts):
+
+  {
+    "sha256": "...",
+    "source": "adultDebit2.pdf",      # name of the file the record was built from
+    "created_at": "2025-10-19T07:08:31Z",
+    "text": "...",                     # extracted transaction text (the expensive OCR step)
+    "parser_version": 1,
+    "result": {"transactions": [...], "summary": {...}}   # process_transactions() output
+  }
+"""
+
+import os
+import hashlib
+import threading
+from datetime import datetime
+
+try:
+    from characterRecognition.serialization import dumps_json, load_json
+except Exception:
+    from serialization import dumps_json, load_json
+
+CACHE_DIR = os.environ.get("FILE_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "results")
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Return the hex SHA-256 of a file, reading it in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_hash_memo = {}  # path -> ((size, mtime_ns), sha256)
+_hash_memo_lock = threading.Lock()
+
+
+def hash_file_cached(path):
+    """hash_file(path), re-reading the file only when its size or mtime changed since the last call."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _hash_memo_lock:
+        memo = _hash_memo.get(path)
+    if memo and memo[0] == stamp:
+        return memo[1]
+    digest = hash_file(path)
+    with _hash_memo_lock:
+        _hash_memo[path] = (stamp, digest)
+    return digest
+
+
+def cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.json")
+
+
+def load_cached(digest):
+    """Return the cached record for a content hash, or None if missing/unreadable."""
+    path = cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        return load_json(path)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable cache record {path}: {e}")
+        return None
+
+
+def store_cached(digest, record):
+    """Write a cache record (via a temp file so concurrent readers never see partial JSON)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    record = dict(record)
+    record["sha256"] = digest
+    record.setdefault("created_at", datetime.utcnow().isoformat() + "Z")
+    path = cache_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(dumps_json(record, pretty=False))
+    os.replace(tmp_path, path)
+    return record
@@ -5,9 +5,12 @@ find_percentages.py
 Usage:
     python find_percentages.py
     python find_percentages.py --all_transactions /path/to/all_transactions.json --categories_dir ./output/categories --out ./output/category_percentages.json
+    python find_percentages.py --all_transactions ./output/all_transactions.ndjson
 
 Behavior:
  - Reads all_transactions.json (tries backend/characterRecognition/output/all_transactions.json then ./output/all_transactions.json).
+   An .ndjson path given with --all_transactions is streamed one transaction at a time instead, so the full
+   history is never loaded (the total is then always computed from the rows).
  - Uses summary.money_in if present; otherwise computes total money_in from transactions (card-type == 'debit', excluding Opening Balance).
  - Reads each JSON file in categories_dir, uses summary.money_in (or computes from transactions) to produce a percentage share.
  - Outputs a JSON list of {"name": <category name>, "percentage": <int>} (rounded and adjusted to sum to 100).
@@ -37,9 +40,12 @@ def money_to_decimal(money_str):
         except Exception:
             return Decimal("0.00")
 
-def load_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+try:
+    from characterRecognition.serialization import load_json, iter_ndjson
+    from characterRecognition.output_writer import write_json
+except ImportError:
+    from serialization import load_json, iter_ndjson
+    from output_writer import write_json
 
 def compute_total_from_all_transactions(all_txn_obj):
     """
@@ -57,9 +63,12 @@ def compute_total_from_all_transactions(all_txn_obj):
         except Exception:
             pass
 
-    # fallback compute
+    return compute_total_from_transactions(all_txn_obj.get("transactions", []))
+
+def compute_total_from_transactions(transactions):
+    """Debit money_in over any iterable of transactions (a list or an NDJSON stream), excluding Opening Balance."""
     total = Decimal("0.00")
-    for txn in all_txn_obj.get("transactions", []):
+    for txn in transactions:
         try:
             company_type = txn.get("company-type", "") or ""
             if company_type.lower().strip().startswith("opening"):
@@ -99,20 +108,23 @@ def compute_category_money_in(cat_obj):
     return total
 
 def find_percentages(all_transactions_paths, categories_dir, out_path):
-    all_txn_obj = None
+    total_money_in = None
     for p in all_transactions_paths:
         if p and os.path.exists(p):
             try:
-                all_txn_obj = load_json(p)
-                print(f"Loaded all-transactions from: {p}")
+                if p.endswith(".ndjson"):
+                    total_money_in = compute_total_from_transactions(iter_ndjson(p))
+                    print(f"Streamed all-transactions from: {p}")
+                else:
+                    total_money_in = compute_total_from_all_transactions(load_json(p))
+                    print(f"Loaded all-transactions from: {p}")
                 break
             except Exception as e:
                 print(f"Warning: couldn't load {p}: {e}")
 
-    if all_txn_obj is None:
+    if total_money_in is None:
         raise FileNotFoundError("Could not find or load any all_transactions.json in the provided paths.")
 
-    total_money_in = compute_total_from_all_transactions(all_txn_obj)
     print(f"Total money_in (denominator): {total_money_in}")
 
     # collect category files
@@ -141,8 +153,7 @@ def find_percentages(all_transactions_paths, categories_dir, out_path):
     # If total is zero (avoid division by zero), output zero percentages
     if total_money_in == Decimal("0.00"):
         output = [{"name": c["name"], "percentage": 0} for c in categories]
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2)
+        write_json(out_path, output)
         print(f"Wrote percentages (all zeros) to {out_path}")
         print(json.dumps(output, indent=2))
         return output
@@ -171,8 +182,7 @@ def find_percentages(all_transactions_paths, categories_dir, out_path):
 
     # save and print
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(final, f, indent=2)
+    write_json(out_path, final)
 
     print(f"Wrote percentages to {out_path}")
     print(json.dumps(final, indent=2))
@@ -181,7 +191,7 @@ def find_percentages(all_transactions_paths, categories_dir, out_path):
 def main():
     parser = argparse.ArgumentParser(description="Compute category percentages of money_in using all_transactions.json and category summaries.")
     parser.add_argument("--all_transactions", "-a",
-                        help="Path to all_transactions.json (first one found will be used).",
+                        help="Path to all_transactions.json or all_transactions.ndjson (first one found will be used).",
                         default=None)
     parser.add_argument("--categories_dir", "-c",
                         help="Directory containing category JSON files (default: ./output/categories).",
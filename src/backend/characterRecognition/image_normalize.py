@@ -0,0 +1,84 @@
+"""
+image_normalize.py
+
+One-off normalization of uploaded statement photos/scans for OCR.
+
+Phone photos are typically 12MP colour JPEGs with the orientation stored in EXIF.
+Tesseract does best on upright grayscale text at roughly 300 DPI, so on ingest we:
+  - apply the EXIF rotation
+  - convert to grayscale (optionally binarize with OCR_BINARIZE=1)
+  - downscale so the long edge matches an A4 page at TARGET_DPI
+
+The normalized copy is stored next to the original as
+  <folder>/.normalized/<original file name>.png
+(a hidden subfolder, so folder scans never mistake it for another statement) and is
+reused by every later OCR run via ensure_normalized(). The copy is keyed by the full file
+name, so a.jpg and a.png in the same folder never share one.
+"""
+
+import os
+
+from PIL import Image, ImageOps
+
+NORMALIZED_DIRNAME = ".normalized"
+TARGET_DPI = 300
+PAGE_LONG_EDGE_INCHES = 11.69  # A4
+TARGET_LONG_EDGE = int(TARGET_DPI * PAGE_LONG_EDGE_INCHES)  # 3508px
+BINARIZE = os.environ.get("OCR_BINARIZE", "0") == "1"
+BINARIZE_THRESHOLD = 160
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif'}
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def normalized_path_for(image_path):
+    folder, name = os.path.split(os.path.abspath(image_path))
+    return os.path.join(folder, NORMALIZED_DIRNAME, name + ".png")
+
+
+def normalize_image(image_path):
+    """Write the normalized OCR copy of image_path and return its path."""
+    out_path = normalized_path_for(image_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    with Image.open(image_path) as img:
+        # Large JPEGs can be decoded at a reduced scale directly (never below the target size)
+        img.draft("L", (TARGET_LONG_EDGE, TARGET_LONG_EDGE))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("L")
+        if max(img.size) > TARGET_LONG_EDGE:
+            img.thumbnail((TARGET_LONG_EDGE, TARGET_LONG_EDGE), Image.LANCZOS)
+        img = ImageOps.autocontrast(img)
+        if BINARIZE:
+            img = img.point(lambda v: 255 if v > BINARIZE_THRESHOLD else 0)
+
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, format="PNG", dpi=(TARGET_DPI, TARGET_DPI))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def ensure_normalized(image_path):
+    """
+    Return the path OCR should read for image_path: the normalized copy, created on first use
+    (or refreshed if the original is newer). Falls back to the original if normalization fails.
+    """
+    out_path = normalized_path_for(image_path)
+    try:
+        if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(image_path):
+            return out_path
+        return normalize_image(image_path)
+    except Exception as e:
+        print(f"Warning: couldn't normalize {image_path}, using original: {e}")
+        return image_path
+
+
+def remove_normalized(image_path):
+    """Delete the normalized copy of image_path, if any."""
+    try:
+        os.remove(normalized_path_for(image_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,189 @@
+"""
+insights.py
+
+Deterministic tips math, computed locally so the model only has to phrase the results.
+
+From the processed transactions, the target spending mix and the user's profile it computes
+(in one vectorized pass over the spend rows):
+  - total spend, spend and share per category, spend by card type and the credit spend share
+  - actual vs target share per category (delta in percentage points, overspend in £)
+  - the top 1-2 overspending categories with a suggested monthly cut:
+      min(20% of the category spend, £50), or the overspend if smaller, rounded to the nearest £5
+  - new_monthly_saving (sum of the cuts, a cautious £25 if there are none) and
+    months_to_goal = ceil(goal_cost / new_monthly_saving)
+  - credit flags: reduce_card_balances (credit share > 60% or score < 600),
+    zero_percent_card_ok (score >= 800), no_products (age < 18)
+
+If the data spans more than one month only the most recent 30 days are used.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+try:
+    from characterRecognition.spending import (
+        CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, OUTPUT_DIR,
+        canonical_category, is_spend, txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+except Exception:
+    from spending import (
+        CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, OUTPUT_DIR,
+        canonical_category, is_spend, txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+
+WINDOW_DAYS = 30
+MAX_CUTS = 2
+CUT_SHARE = 0.20
+CUT_CAP = 50.0
+CUT_STEP = 5.0
+DEFAULT_SAVING = 25.0
+HIGH_CREDIT_SHARE = 60.0
+LOW_SCORE = 600
+HIGH_SCORE = 800
+
+_CATEGORY_INDEX = {c: i for i, c in enumerate(CANONICAL_CATEGORIES)}
+_COST_RE = re.compile(r"£?\s*((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{1,2})?)\s*(k\b)?", re.IGNORECASE)
+
+
+def parse_goal_cost(goal):
+    """Cost in £ from a goal description ("I want to buy a car that costs 10,000" -> 10000.0), or None."""
+    if isinstance(goal, (int, float)):
+        return float(goal)
+    amounts = [float(m.group(1).replace(",", "")) * (1000 if m.group(2) else 1)
+               for m in _COST_RE.finditer(goal or "")]
+    return max(amounts) if amounts else None
+
+
+def round_to_step(amount, step=CUT_STEP):
+    """Nearest multiple of step (at least one step for any positive amount)."""
+    if amount <= 0:
+        return 0.0
+    return max(step, step * round(amount / step))
+
+
+def _recent_window(spend_rows, window_days=WINDOW_DAYS):
+    """Rows from the most recent window_days when the data spans several months, else all rows."""
+    dates = [d for _, _, d in spend_rows if d is not None]
+    if not dates:
+        return spend_rows, None
+    first, last = min(dates), max(dates)
+    if (first.year, first.month) == (last.year, last.month):
+        return spend_rows, (first, last)
+    start = last - timedelta(days=window_days - 1)
+    return [r for r in spend_rows if r[2] is not None and r[2] >= start], (start, last)
+
+
+def compute_insights(transactions, goal_mix=None, profile=None, goal_cost=None, window_days=WINDOW_DAYS):
+    """
+    Compute the tips numbers (see module docstring).
+    profile: {"age", "credit_score", "numerical_level"} - missing keys disable the matching flags.
+    goal_cost: £ cost of the saving goal (a number or a goal description), optional.
+    """
+    goal_mix = DEFAULT_GOAL_MIX if goal_mix is None else goal_mix
+    profile = profile or {}
+    if goal_cost is not None and not isinstance(goal_cost, (int, float)):
+        goal_cost = parse_goal_cost(goal_cost)
+
+    rows, period = _recent_window([(t, txn_amount(t), txn_date(t)) for t in transactions if is_spend(t)],
+                                  window_days)
+    n_cat = len(CANONICAL_CATEGORIES)
+    amounts = np.fromiter((a for _, a, _ in rows), dtype=np.float64, count=len(rows))
+    cat_idx = np.fromiter((_CATEGORY_INDEX[canonical_category(t.get("company-type"))] for t, _, _ in rows),
+                          dtype=np.int64, count=len(rows))
+    is_credit = np.fromiter(((t.get("card-type") or "").lower() == "credit" for t, _, _ in rows),
+                            dtype=bool, count=len(rows))
+
+    cat_spend = np.bincount(cat_idx, weights=amounts, minlength=n_cat)
+    total = float(amounts.sum())
+    credit_spend = float(amounts[is_credit].sum())
+    shares = cat_spend / total * 100 if total else np.zeros(n_cat)
+
+    targets = np.zeros(n_cat)
+    for goal in goal_mix:
+        targets[_CATEGORY_INDEX[canonical_category(goal.get("name"))]] = float(goal.get("percentage", 0) or 0)
+    deltas = shares - targets
+    overspend = np.clip(deltas, 0, None) / 100 * total
+
+    # Suggested cuts for the largest positive deltas
+    cut = np.minimum(cat_spend * CUT_SHARE, CUT_CAP)
+    cut = np.where(overspend < cut, overspend, cut)
+    order = [int(i) for i in np.argsort(-deltas, kind="stable") if deltas[i] > 0][:MAX_CUTS]
+    cuts = [{
+        "category": CANONICAL_CATEGORIES[i],
+        "spend": round(float(cat_spend[i]), 2),
+        "actual": round(float(shares[i]), 1),
+        "target": round(float(targets[i]), 1),
+        "delta": round(float(deltas[i]), 1),
+        "overspend": round(float(overspend[i]), 2),
+        "monthly_cut": round_to_step(float(cut[i])),
+    } for i in order]
+    cuts = [c for c in cuts if c["monthly_cut"] > 0]
+
+    saving = sum(c["monthly_cut"] for c in cuts) or DEFAULT_SAVING
+    credit_share = round(credit_spend / total * 100, 1) if total else 0.0
+    score = profile.get("credit_score")
+    age = profile.get("age")
+
+    return {
+        "period": {"from": period[0].isoformat(), "to": period[1].isoformat()} if period else None,
+        "transactions": len(rows),
+        "total_spend": round(total, 2),
+        "by_category": {
+            c: {"spend": round(float(cat_spend[i]), 2), "share": round(float(shares[i]), 1),
+                "target": round(float(targets[i]), 1), "delta": round(float(deltas[i]), 1)}
+            for i, c in enumerate(CANONICAL_CATEGORIES)
+        },
+        "by_card_type": {"credit": round(credit_spend, 2), "debit": round(total - credit_spend, 2)},
+        "credit_share": credit_share,
+        "cuts": cuts,
+        "new_monthly_saving": saving,
+        "goal_cost": goal_cost,
+        "months_to_goal": math.ceil(goal_cost / saving) if goal_cost else None,
+        "flags": {
+            "reduce_card_balances": credit_share > HIGH_CREDIT_SHARE or (score is not None and score < LOW_SCORE),
+            "zero_percent_card_ok": score is not None and score >= HIGH_SCORE,
+            "no_products": age is not None and age < 18,
+            "sparse_data": len(rows) < 5,
+        },
+        "numerical_level": profile.get("numerical_level"),
+    }
+
+
+def render_insights(insights):
+    """Compact JSON for prompts (no indentation/whitespace)."""
+    return json.dumps(insights, separators=(",", ":"), ensure_ascii=False)
+
+
+MAX_CACHED = 64
+_insights_cache = {}  # (output_dir, params key) -> (per_file_results stat, insights)
+_insights_lock = threading.Lock()
+
+
+def get_insights(output_dir=OUTPUT_DIR, goal_mix=None, profile=None, goal_cost=None):
+    """
+    Insights for the processed data in output_dir, recomputed only when
+    per_file_results.json (or the goal/profile arguments) change.
+    """
+    path = per_file_results_path(output_dir)
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+    key = (output_dir, json.dumps([goal_mix, profile, goal_cost], sort_keys=True))
+    with _insights_lock:
+        hit = _insights_cache.get(key)
+        if hit and hit[0] == stamp:
+            return hit[1]
+    insights = compute_insights(load_full_transactions(output_dir) if stamp else [], goal_mix, profile, goal_cost)
+    with _insights_lock:
+        if len(_insights_cache) >= MAX_CACHED:
+            _insights_cache.clear()
+        _insights_cache[key] = (stamp, insights)
+    return insights
@@ -0,0 +1,124 @@
+"""
+llm_backend.py
+
+Model backends behind the chat endpoints.
+
+  LLM_BACKEND=gemini  (default) google.generativeai GenerativeModel (GEMINI_MODEL, default gemini-2.5-flash)
+  LLM_BACKEND=fake    deterministic local model, no network - for tests and offline load tests
+
+Every backend exposes:
+  generate(prompt, system_instruction=None) -> str             whole reply
+  stream(prompt, system_instruction=None)   -> iterator[str]   reply chunks as they arrive
+
+Callers normally go through llm_client.get_client(), which adds concurrency limits,
+deadlines, retries and request coalescing on top of the backend.
+"""
+
+import os
+import re
+import time
+import random
+import threading
+
+MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, model_name=MODEL_NAME):
+        import google.generativeai as genai
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._models = {}  # system_instruction -> GenerativeModel
+        self._models_lock = threading.Lock()
+
+    def _model_for(self, system_instruction):
+        if not system_instruction:
+            return self.model
+        with self._models_lock:
+            model = self._models.get(system_instruction)
+            if model is None:
+                model = self._models[system_instruction] = self._genai.GenerativeModel(
+                    self.model_name, system_instruction=system_instruction)
+            return model
+
+    def generate(self, prompt, system_instruction=None):
+        response = self._model_for(system_instruction).generate_content(prompt)
+        return response.text.strip() if hasattr(response, "text") else ""
+
+    def stream(self, prompt, system_instruction=None):
+        for chunk in self._model_for(system_instruction).generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except Exception:
+                # chunks without text parts (e.g. safety/finish metadata) raise on .text
+                continue
+            if text:
+                yield text
+
+
+class FakeBackendError(RuntimeError):
+    """Injected transient failure (FAKE_LLM_FAILURE_RATE), retryable like a 503 from the real API."""
+
+
+class FakeBackend:
+    """
+    Offline stand-in for Gemini. Replies "Local test reply to: <user message>" word by word,
+    sleeping FAKE_LLM_DELAY seconds between chunks to mimic generation latency.
+    FAKE_LLM_FAILURE_RATE (0..1) makes that share of calls fail, to exercise retries under load.
+    """
+    name = "fake"
+
+    def __init__(self, delay=None, failure_rate=None):
+        self.delay = float(os.environ.get("FAKE_LLM_DELAY", "0.05")) if delay is None else delay
+        self.failure_rate = float(os.environ.get("FAKE_LLM_FAILURE_RATE", "0")) if failure_rate is None \
+            else failure_rate
+        self.calls = 0
+
+    def _reply(self, prompt):
+        match = re.search(r"User message:\s*(.*)", prompt, flags=re.DOTALL)
+        question = (match.group(1) if match else prompt).strip()
+        return f"Local test reply to: {question}"
+
+    def generate(self, prompt, system_instruction=None):
+        return "".join(self.stream(prompt, system_instruction)).strip()
+
+    def stream(self, prompt, system_instruction=None):
+        self.calls += 1
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise FakeBackendError("fake backend: injected transient failure")
+        words = self._reply(prompt).split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+_BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend selected by LLM_BACKEND (created once, then reused)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.environ.get("LLM_BACKEND", "gemini").lower()
+                if kind not in _BACKENDS:
+                    raise ValueError(f"Unknown LLM_BACKEND '{kind}'. Choose one of: {', '.join(_BACKENDS)}")
+                _backend = _BACKENDS[kind]()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the process-wide backend (e.g. a FakeBackend in tests)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
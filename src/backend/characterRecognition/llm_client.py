@@ -0,0 +1,290 @@
+"""
+llm_client.py
+
+Outbound LLM call layer used by the chat endpoints and the tips flow.
+
+On top of an llm_backend backend it adds:
+  - a concurrency limit (LLM_MAX_CONCURRENCY in-flight model calls per process)
+  - a per-call deadline (LLM_TIMEOUT seconds, covering queueing, retries and the call itself);
+    streams instead bound the wait for each chunk (LLM_STREAM_IDLE_TIMEOUT seconds)
+  - retry of transient failures with exponential backoff and full jitter (LLM_RETRIES)
+  - request coalescing: identical simultaneous requests share one in-flight call
+
+Usage:
+    from llm_client import get_client
+    reply = get_client().generate(prompt, system_instruction=...)
+
+Offline load test against the stub backend:
+    LLM_BACKEND=fake FAKE_LLM_DELAY=0.02 python llm_client.py --requests 200 --distinct 20
+"""
+
+import os
+import time
+import queue
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    from characterRecognition.llm_backend import get_backend
+except Exception:
+    from llm_backend import get_backend
+
+# Error class names treated as transient (rate limits, overload, network hiccups)
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "ConnectionError", "ConnectTimeout", "ReadTimeout",
+    "RemoteDisconnected", "TimeoutError", "FakeBackendError",
+}
+
+
+class LLMTimeout(Exception):
+    """The call did not finish within its deadline (including time spent queued for a slot)."""
+
+
+def _is_retryable(exc):
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+class LLMClient:
+    def __init__(self, backend=None, max_concurrency=4, timeout=30.0, retries=2, backoff=0.5, max_backoff=8.0,
+                 stream_idle_timeout=30.0):
+        self._backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Worker threads run the blocking backend calls so callers can stop waiting at the deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._inflight = {}  # request key -> Future shared by coalesced callers
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0, "retries": 0, "timeouts": 0, "errors": 0}
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._inflight), "max_concurrency": self.max_concurrency,
+                    "backend": getattr(self.backend, "name", type(self.backend).__name__)}
+
+    @staticmethod
+    def _key(prompt, system_instruction):
+        return hashlib.sha256(f"{system_instruction or ''}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    # ---------------- single calls ----------------
+
+    def generate(self, prompt, system_instruction=None, timeout=None):
+        """Whole reply for prompt. Raises LLMTimeout, or the backend's last error once retries are spent."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        key = self._key(prompt, system_instruction)
+
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                shared = self._inflight[key] = Future()
+                leader = True
+            else:
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            try:
+                return shared.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                self._count("timeouts")
+                raise LLMTimeout("LLM call timed out waiting for a coalesced request")
+
+        try:
+            result = self._call_with_retry(prompt, system_instruction, deadline)
+            shared.set_result(result)
+            return result
+        except BaseException as exc:
+            shared.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _call_with_retry(self, prompt, system_instruction, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+                self._count("timeouts")
+                raise LLMTimeout("LLM call timed out waiting for a free slot")
+            self._count("calls")
+            future = self._executor.submit(self.backend.generate, prompt, system_instruction)
+            # The slot is released when the backend call really ends, even if we stop waiting,
+            # so abandoned slow calls still count against the concurrency limit
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                self._count("timeouts")
+                raise LLMTimeout("LLM call exceeded its deadline")
+            except Exception as exc:
+                if attempt >= self.retries or not _is_retryable(exc):
+                    self._count("errors")
+                    raise
+                # exponential backoff with full jitter, never sleeping past the deadline
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+                if time.monotonic() + delay >= deadline:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def _pump(self, prompt, system_instruction, out, stop):
+        """Stream reader thread: backend chunks into out as ("chunk", text) ... ("done" | "error", ...)."""
+        chunks = None
+        try:
+            chunks = self.backend.stream(prompt, system_instruction)
+            for text in chunks:
+                if stop.is_set():
+                    break
+                out.put(("chunk", text))
+            out.put(("done", None))
+        except Exception as exc:
+            out.put(("error", exc))
+        finally:
+            # runs as soon as a stalled backend yields again after the caller gave up
+            if chunks is not None and hasattr(chunks, "close"):
+                chunks.close()
+
+    def stream(self, prompt, system_instruction=None, timeout=None, idle_timeout=None):
+        """
+        Yield reply chunks, holding one concurrency slot while the caller reads them.
+        timeout bounds the wait for a slot (and retries); idle_timeout bounds the wait for each
+        chunk, so a long but steady reply is never cut off while a stalled backend raises
+        LLMTimeout. The backend is read on its own thread: when the caller stops (timeout,
+        error, or closing the generator to cancel) the slot is released at once and the
+        reader closes the backend iterator as soon as it returns control.
+        Connection errors before the first chunk are retried like generate(); nothing is
+        retried once output started.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        idle_timeout = idle_timeout or self.stream_idle_timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+                self._count("timeouts")
+                raise LLMTimeout("LLM stream timed out waiting for a free slot")
+            self._count("calls")
+            started = False
+            out = queue.Queue()
+            stop = threading.Event()
+            # a plain daemon thread, not the executor: a reader stuck in a stalled backend must not
+            # take a pool worker from later calls once its slot has been released
+            threading.Thread(target=self._pump, args=(prompt, system_instruction, out, stop),
+                             name="llm-stream", daemon=True).start()
+            try:
+                while True:
+                    try:
+                        kind, value = out.get(timeout=idle_timeout)
+                    except queue.Empty:
+                        self._count("timeouts")
+                        raise LLMTimeout(f"LLM stream sent nothing for {idle_timeout:.0f}s")
+                    if kind == "done":
+                        return
+                    if kind == "error":
+                        raise value
+                    started = True
+                    yield value
+            except LLMTimeout:
+                raise
+            except Exception as exc:
+                if started or attempt >= self.retries or not _is_retryable(exc):
+                    self._count("errors")
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+                if time.monotonic() + delay >= deadline:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                attempt += 1
+            finally:
+                # tells the reader to stop and close the backend iterator (done, cancelled, timed out or failed)
+                stop.set()
+                self._slots.release()
+            time.sleep(delay)
+
+    # ---------------- batches ----------------
+
+    def generate_many(self, prompts, system_instruction=None, timeout=None):
+        """
+        Generate replies for a batch of prompts (e.g. insights for several users) under the same
+        concurrency limit. Duplicate prompts are coalesced into one call. Returns a list aligned with
+        prompts, holding either the reply text or the exception raised for that prompt.
+        """
+        prompts = list(prompts)
+        results = [None] * len(prompts)
+        threads = []
+
+        def run(i, p):
+            try:
+                results[i] = self.generate(p, system_instruction, timeout)
+            except Exception as exc:
+                results[i] = exc
+
+        for i, p in enumerate(prompts):
+            t = threading.Thread(target=run, args=(i, p), daemon=True)
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide client configured from LLM_MAX_CONCURRENCY / LLM_TIMEOUT / LLM_STREAM_IDLE_TIMEOUT /
+    LLM_RETRIES.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "4")),
+                    timeout=float(os.environ.get("LLM_TIMEOUT", "30")),
+                    stream_idle_timeout=float(os.environ.get("LLM_STREAM_IDLE_TIMEOUT", "30")),
+                    retries=int(os.environ.get("LLM_RETRIES", "2")),
+                )
+    return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fire concurrent chat-sized requests through the LLM client.")
+    parser.add_argument("--requests", "-n", type=int, default=100, help="Total requests (default: 100).")
+    parser.add_argument("--distinct", "-d", type=int, default=10, help="Distinct prompts (default: 10).")
+    args = parser.parse_args()
+
+    client = get_client()
+    prompts = [f"User message: load test question {i % args.distinct}" for i in range(args.requests)]
+    started = time.monotonic()
+    results = client.generate_many(prompts)
+    elapsed = time.monotonic() - started
+    failures = sum(1 for r in results if isinstance(r, Exception))
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s), {failures} failed")
+    print(client.stats())
+
+
+if __name__ == "__main__":
+    main()
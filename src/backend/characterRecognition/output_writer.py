@@ -0,0 +1,377 @@
+"""
+output_writer.py
+
+Writing and serving the pipeline's output files.
+
+Every JSON output is written (compact unless pretty output is requested, see
+serialization.py) together with pre-compressed variants next to it (<file>.gz always,
+<file>.br when the optional `brotli` package is installed), so /api/output/<file> can
+send compressed bytes without compressing per request. Internal artifacts that only the
+backend reads go through write_internal() in the configured INTERNAL_FORMAT. NDJSON
+outputs are streamed record by record by write_ndjson(), compressed as they are written.
+
+Writes are atomic and change-aware: bytes go to a temp file that is renamed over the
+target, so a reader never sees a half-written file, and a file whose content hash is
+unchanged is left alone (mtime, ETag and variants included). Inside `with OutputBatch():`
+the renames are deferred to the end of the block, fsynced together (one pass over the temp
+files, then one fsync per directory) and published as a set; anything that must only happen
+once the files are visible (progress events, removing superseded files) goes through
+after_publish().
+
+serve_file() picks the best encoding the client accepts (br > gzip > identity), sets a
+strong ETag per representation (content hash + encoding), Cache-Control: no-cache and
+Vary: Accept-Encoding, and answers a matching If-None-Match with 304. Files written by
+other code (e.g. find_percentages) get their variants created on first request, and stale
+variants (older than their source) are regenerated.
+"""
+
+import os
+import gzip
+import zlib
+import hashlib
+import mimetypes
+import threading
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+try:
+    from characterRecognition.serialization import INTERNAL_FORMAT, dumps_internal, dumps_json, load_json
+except Exception:
+    from serialization import INTERNAL_FORMAT, dumps_internal, dumps_json, load_json
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# only bother compressing files above this size
+MIN_COMPRESS_SIZE = 256
+
+mimetypes.add_type("application/x-ndjson", ".ndjson")
+
+
+_local = threading.local()
+
+
+class OutputBatch:
+    """
+    Group the writes made by this thread: temp files are fsynced and renamed into place
+    together when the block exits (discarded if it raises). Nested batches join the outer one.
+    """
+
+    def __init__(self):
+        self.pending = []  # (temp path, final path), in write order
+        self.callbacks = []  # (fn, args, kwargs) to run once pending files are published
+        self.written = 0
+        self.unchanged = 0
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = getattr(_local, "batch", None)
+        if self._outer is None:
+            _local.batch = self
+        return self._outer or self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._outer is not None:
+            return False
+        _local.batch = None
+        if exc_type is not None:
+            for tmp, _ in self.pending:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            return False
+        self.commit()
+        return False
+
+    def commit(self):
+        for tmp, _ in self.pending:
+            _fsync_path(tmp)
+        directories = set()
+        for tmp, path in self.pending:
+            os.replace(tmp, path)
+            directories.add(os.path.dirname(path) or ".")
+        for d in directories:
+            _fsync_path(d)
+        self.pending = []
+        print(f"Outputs: {self.written} written, {self.unchanged} unchanged")
+        callbacks, self.callbacks = self.callbacks, []
+        for fn, args, kwargs in callbacks:
+            fn(*args, **kwargs)
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _publish(tmp, path):
+    """Move a finished temp file over path: now (fsynced), or at the end of the current batch."""
+    batch = getattr(_local, "batch", None)
+    if batch is not None:
+        batch.pending.append((tmp, path))
+        return
+    _fsync_path(tmp)
+    os.replace(tmp, path)
+
+
+def after_publish(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs) once the current batch's files are published (now if no batch is open)."""
+    batch = getattr(_local, "batch", None)
+    if batch is None:
+        fn(*args, **kwargs)
+    else:
+        batch.callbacks.append((fn, args, kwargs))
+
+
+def _count(written):
+    batch = getattr(_local, "batch", None)
+    if batch is not None:
+        if written:
+            batch.written += 1
+        else:
+            batch.unchanged += 1
+
+
+def _unchanged(path, size, digest):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return st.st_size == size and _content_hash(path, st) == digest
+
+
+def _write_bytes(path, data):
+    """Atomically replace path with data, unless it already holds these exact bytes. Returns True if written."""
+    if _unchanged(path, len(data), hashlib.sha256(data).hexdigest()[:32]):
+        return False
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    _publish(tmp, path)
+    return True
+
+
+def _compressors():
+    encoders = [("gzip", ".gz", lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        encoders.insert(0, ("br", ".br", lambda data: brotli.compress(data, quality=BROTLI_QUALITY)))
+    return encoders
+
+
+def compress_variants(path, data=None):
+    """(Re)write the compressed variants of path. data: the file's bytes if already in memory."""
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        for _, suffix, _ in _compressors():
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return
+    for _, suffix, compress in _compressors():
+        _write_bytes(path + suffix, compress(data))
+
+
+def _write_with_variants(path, data):
+    written = _write_bytes(path, data)
+    if written or any(not os.path.exists(path + suffix) for _, suffix, _ in _compressors()):
+        compress_variants(path, data)
+    _count(written)
+    return written
+
+
+def _same_except(path, obj, ignore_keys):
+    """True if the JSON file at path equals the dict obj apart from its top-level ignore_keys."""
+    try:
+        current = load_json(path)
+    except Exception:
+        return False
+    if not isinstance(current, dict) or not isinstance(obj, dict):
+        return False
+    return ({k: v for k, v in current.items() if k not in ignore_keys}
+            == {k: v for k, v in obj.items() if k not in ignore_keys})
+
+
+def write_json(path, obj, pretty=None, ignore_keys=()):
+    """
+    Write obj as JSON to path, plus its .gz/.br variants, unless the file already holds the
+    same content. ignore_keys: top-level keys (e.g. "created_at") that alone don't count as
+    a change. Returns path.
+    """
+    if ignore_keys and _same_except(path, obj, ignore_keys):
+        _count(False)
+        return path
+    _write_with_variants(path, dumps_json(obj, pretty))
+    return path
+
+
+class _StreamCompressor:
+    """Incremental gzip/brotli encoder writing to a file (same output as _compressors())."""
+
+    def __init__(self, fileobj, suffix):
+        self.fileobj = fileobj
+        if suffix == ".br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._br = None
+            # wbits 31 = gzip container; header mtime is 0 like gzip.compress(mtime=0)
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def write(self, data):
+        self.fileobj.write(self._br.process(data) if self._br else self._gz.compress(data))
+
+    def close(self):
+        self.fileobj.write(self._br.finish() if self._br else self._gz.flush())
+        self.fileobj.close()
+
+
+def write_ndjson(path, records):
+    """
+    Stream records (any iterable) to path as NDJSON, one compact JSON value per line, writing
+    the .gz/.br variants alongside in the same pass. Memory use does not grow with the number
+    of records. The files are replaced atomically, and left alone if the content is unchanged.
+    Returns the number of records written.
+    """
+    tmp = {"": _tmp_path(path)}
+    outputs = {"": open(tmp[""], "wb")}
+    for _, suffix, _ in _compressors():
+        tmp[suffix] = _tmp_path(path + suffix)
+        outputs[suffix] = _StreamCompressor(open(tmp[suffix], "wb"), suffix)
+    count = size = 0
+    digest = hashlib.sha256()
+    try:
+        for record in records:
+            line = dumps_json(record, pretty=False) + b"\n"
+            for out in outputs.values():
+                out.write(line)
+            digest.update(line)
+            size += len(line)
+            count += 1
+    except BaseException:
+        for suffix, out in outputs.items():
+            out.close()
+            os.remove(tmp[suffix])
+        raise
+    # the plain file is closed first so the variants are never older than it (see _fresh_variant)
+    for out in outputs.values():
+        out.close()
+    unchanged = _unchanged(path, size, digest.hexdigest()[:32]) and all(
+        os.path.exists(path + suffix) for suffix in outputs if suffix)
+    for suffix in outputs:
+        if unchanged:
+            os.remove(tmp[suffix])
+        else:
+            _publish(tmp[suffix], path + suffix)
+    _count(not unchanged)
+    return count
+
+
+def write_internal(output_dir, stem, obj):
+    """
+    Write a backend-only artifact (e.g. "per_file_results") in INTERNAL_FORMAT and remove a
+    copy left in the other format, so readers using artifact_path() never see stale data.
+    Returns the path written.
+    """
+    path = os.path.join(output_dir, stem + (".msgpack" if INTERNAL_FORMAT == "msgpack" else ".json"))
+    if INTERNAL_FORMAT == "json":
+        write_json(path, obj, pretty=False)
+    else:
+        _count(_write_bytes(path, dumps_internal(obj)))
+    # only once the new file is in place, so one of the two always exists
+    after_publish(_remove_other_formats, output_dir, stem, path)
+    return path
+
+
+def _remove_other_formats(output_dir, stem, keep):
+    for ext in (".json", ".msgpack"):
+        stale = os.path.join(output_dir, stem + ext)
+        if stale == keep:
+            continue
+        for p in (stale, stale + ".gz", stale + ".br"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+
+_etag_memo = {}  # path -> ((mtime_ns, size), sha256 prefix)
+_etag_lock = threading.Lock()
+
+
+def _content_hash(path, st):
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _etag_lock:
+        memo = _etag_memo.get(path)
+        if memo and memo[0] == stamp:
+            return memo[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()[:32]
+    with _etag_lock:
+        _etag_memo[path] = (stamp, digest)
+    return digest
+
+
+def _fresh_variant(path, suffix, st):
+    """Path of an up-to-date variant, creating/refreshing the variants if needed; None if not compressed."""
+    variant = path + suffix
+    try:
+        if os.stat(variant).st_mtime_ns >= st.st_mtime_ns:
+            return variant
+    except FileNotFoundError:
+        pass
+    if st.st_size < MIN_COMPRESS_SIZE:
+        return None
+    compress_variants(path)
+    return variant if os.path.exists(variant) else None
+
+
+def serve_file(path, pretty=False):
+    """
+    Flask response for path with content negotiation, strong ETag and conditional GET (404 if missing).
+    pretty: re-indent a JSON file for reading (sent uncompressed and uncached).
+    """
+    from flask import Response, request, send_file
+
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        st = None
+    if st is None or not os.path.isfile(path):
+        return Response('{"error": "Not found"}', status=404, mimetype="application/json")
+
+    if pretty and path.endswith(".json"):
+        return Response(dumps_json(load_json(path), pretty=True), mimetype="application/json",
+                        headers={"Cache-Control": "no-store"})
+
+    digest = _content_hash(path, st)
+    accepted = request.accept_encodings
+    encoding, body_path = None, path
+    for name, suffix, _ in _compressors():
+        if accepted[name] > 0:
+            variant = _fresh_variant(path, suffix, st)
+            if variant:
+                encoding, body_path = name, variant
+                break
+
+    etag = f"{digest}-{encoding}" if encoding else digest
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = send_file(body_path, mimetype=mimetype, etag=False, conditional=False, max_age=None)
+    response.headers.update(headers)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,161 @@
+"""
+recurring.py
+
+Local recurring-charge detection over the merged transactions (subscriptions, direct
+debits, memberships), so the model no longer has to spot them in the raw history.
+
+Near-linear, with no pairwise comparisons:
+  1. hash-group spend transactions by normalized merchant ("NETFLIX.COM 1234" -> "netflix")
+  2. inside each merchant, sort by amount and sweep them into amount buckets (amounts within
+     AMOUNT_TOLERANCE of the bucket's first amount, so £10.99 and £11.49 share a bucket)
+  3. per bucket, sort by date and check the gaps for a monthly cadence
+
+Each detected charge:
+  {"merchant", "normalized", "category", "card_type", "amount", "min_amount", "max_amount",
+   "occurrences", "months", "first", "last", "cadence_days", "next_expected", "active"}
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+from statistics import median
+
+try:
+    from characterRecognition.spending import (
+        OUTPUT_DIR, canonical_category, is_spend, txn_amount, txn_date,
+    )
+    from characterRecognition.output_writer import write_json
+    from characterRecognition.serialization import load_json
+except Exception:
+    from spending import (
+        OUTPUT_DIR, canonical_category, is_spend, txn_amount, txn_date,
+    )
+    from output_writer import write_json
+    from serialization import load_json
+
+RECURRING_FILENAME = "recurring.json"
+
+AMOUNT_TOLERANCE = 0.10   # relative spread allowed inside an amount bucket
+MIN_TOLERANCE = 1.00      # ... but at least £1 for small charges
+MIN_OCCURRENCES = 3       # charges needed to call something monthly
+MONTHLY_GAP = (25, 35)    # days between charges that count as "monthly"
+MIN_MONTHLY_SHARE = 0.75  # share of gaps that must be monthly
+
+_NOISE_RE = re.compile(
+    r"\b(?:www|com|co|uk|ltd|limited|plc|inc|llc|gb|payment|pymt|dd|direct debit|card|purchase|pos|ref|"
+    r"recurring|subscription|online|intl)\b"
+)
+_NON_ALPHA_RE = re.compile(r"[^a-z& ]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_merchant(name):
+    """Stable merchant key: lowercase, no digits/references/punctuation or boilerplate words."""
+    s = _NON_ALPHA_RE.sub(" ", (name or "").lower())
+    s = _NOISE_RE.sub(" ", s)
+    s = _SPACE_RE.sub(" ", s).strip()
+    return " ".join(s.split(" ")[:3])
+
+
+def _amount_buckets(items):
+    """Split (amount, date, txn) items of one merchant into buckets of similar amounts (one sorted sweep)."""
+    items.sort(key=lambda it: it[0])
+    buckets = []
+    current, base = [], None
+    for it in items:
+        if base is None or it[0] - base > max(MIN_TOLERANCE, base * AMOUNT_TOLERANCE):
+            if current:
+                buckets.append(current)
+            current, base = [], it[0]
+        current.append(it)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def _most_common(values):
+    counts = {}
+    for v in values:
+        if v:
+            counts[v] = counts.get(v, 0) + 1
+    return max(counts, key=counts.get) if counts else ""
+
+
+def detect_recurring(transactions, today=None):
+    """Recurring monthly charges in transactions, most expensive first (see module docstring)."""
+    by_merchant = {}
+    latest = None
+    for txn in transactions:
+        if not is_spend(txn):
+            continue
+        d = txn_date(txn)
+        key = normalize_merchant(txn.get("company-name"))
+        if d is None or not key:
+            continue
+        by_merchant.setdefault(key, []).append((txn_amount(txn), d, txn))
+        if latest is None or d > latest:
+            latest = d
+    today = today or latest
+
+    found = []
+    for key, items in by_merchant.items():
+        if len(items) < MIN_OCCURRENCES:
+            continue
+        for bucket in _amount_buckets(items):
+            # one charge per day (OCR of overlapping statements can repeat a line)
+            by_day = {}
+            for amount, d, txn in bucket:
+                by_day.setdefault(d, (amount, txn))
+            if len(by_day) < MIN_OCCURRENCES:
+                continue
+            days = sorted(by_day)
+            gaps = [(b - a).days for a, b in zip(days, days[1:])]
+            monthly = sum(1 for g in gaps if MONTHLY_GAP[0] <= g <= MONTHLY_GAP[1])
+            if monthly / len(gaps) < MIN_MONTHLY_SHARE:
+                continue
+            amounts = [by_day[d][0] for d in days]
+            txns = [by_day[d][1] for d in days]
+            cadence = median(gaps)
+            next_expected = days[-1] + timedelta(days=round(cadence))
+            found.append({
+                "merchant": _most_common((t.get("company-name") or "").strip() for t in txns),
+                "normalized": key,
+                "category": canonical_category(_most_common(t.get("company-type") for t in txns)),
+                "card_type": _most_common((t.get("card-type") or "").lower() for t in txns),
+                "amount": round(amounts[-1], 2),  # latest charge, so price rises show up
+                "min_amount": round(min(amounts), 2),
+                "max_amount": round(max(amounts), 2),
+                "occurrences": len(days),
+                "months": len({(d.year, d.month) for d in days}),
+                "first": days[0].isoformat(),
+                "last": days[-1].isoformat(),
+                "cadence_days": cadence,
+                "next_expected": next_expected.isoformat(),
+                "active": bool(today and (today - days[-1]).days <= cadence * 1.5),
+            })
+
+    found.sort(key=lambda r: (not r["active"], -r["amount"]))
+    return found
+
+
+def write_recurring(recurring, output_dir=OUTPUT_DIR):
+    """Write the recurring.json artifact and return its path."""
+    active = [r for r in recurring if r["active"]]
+    payload = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "summary": {
+            "count": len(recurring),
+            "active": len(active),
+            "monthly_total": round(sum(r["amount"] for r in active), 2),
+        },
+        "recurring": recurring,
+    }
+    return write_json(os.path.join(output_dir, RECURRING_FILENAME), payload, ignore_keys=("created_at",))
+
+
+def load_recurring(output_dir=OUTPUT_DIR):
+    """The recurring.json artifact, or None if the pipeline hasn't written one yet."""
+    path = os.path.join(output_dir, RECURRING_FILENAME)
+    if not os.path.exists(path):
+        return None
+    return load_json(path)
@@ -0,0 +1,169 @@
+"""
+rollups.py
+
+Daily, weekly and monthly spending rollups per category and card type, precomputed by the
+pipeline so the dashboard charts load a few aligned arrays instead of every transaction.
+
+RollupAccumulator is fed one transaction at a time: run_json_text adds each merged
+(deduplicated) transaction while it splits categories, so the rollups are rebuilt on every
+run in the pass that already walks the merged rows.
+
+rollups.json / /api/rollups shape, per granularity ("day" | "week" | "month"):
+  {"periods": ["2025-01", "2025-02", ...],        # week periods are the Monday's date
+   "total": [812.4, 790.1, ...],
+   "by_category": {"Shopping": [...], ...},
+   "by_card": {"credit": [...], "debit": [...]},
+   "by_category_card": {"Shopping|credit": [...], ...},
+   "count": [41, 38, ...]}
+Amounts are spend in £ (spending.is_spend rules), aligned with "periods".
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+try:
+    from characterRecognition.spending import (
+        CANONICAL_CATEGORIES, OUTPUT_DIR, canonical_category, is_spend, txn_amount, txn_date,
+    )
+    from characterRecognition.output_writer import write_json
+    from characterRecognition.serialization import load_json
+except Exception:
+    from spending import (
+        CANONICAL_CATEGORIES, OUTPUT_DIR, canonical_category, is_spend, txn_amount, txn_date,
+    )
+    from output_writer import write_json
+    from serialization import load_json
+
+ROLLUPS_FILENAME = "rollups.json"
+GRANULARITIES = ("day", "week", "month")
+
+
+def period_key(d, granularity):
+    if granularity == "day":
+        return d.isoformat()
+    if granularity == "week":
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+class RollupAccumulator:
+    def __init__(self):
+        # granularity -> period -> (category, card) -> [spend, count]
+        self._cells = {g: {} for g in GRANULARITIES}
+
+    def add(self, txn):
+        """Count one transaction (ignored unless it's dated spend)."""
+        if not is_spend(txn):
+            return
+        d = txn_date(txn)
+        if d is None:
+            return
+        amount = txn_amount(txn)
+        cell_key = (canonical_category(txn.get("company-type")), (txn.get("card-type") or "unknown").lower())
+        for g in GRANULARITIES:
+            cell = self._cells[g].setdefault(period_key(d, g), {}).setdefault(cell_key, [0.0, 0])
+            cell[0] += amount
+            cell[1] += 1
+
+    def add_many(self, transactions):
+        for txn in transactions:
+            self.add(txn)
+        return self
+
+    def _series(self, granularity):
+        periods = sorted(self._cells[granularity])
+        cards = sorted({card for p in periods for _, card in self._cells[granularity][p]})
+        total, count = [], []
+        by_category = {c: [] for c in CANONICAL_CATEGORIES}
+        by_card = {c: [] for c in cards}
+        by_category_card = {f"{cat}|{card}": [] for cat in CANONICAL_CATEGORIES for card in cards}
+        for p in periods:
+            cells = self._cells[granularity][p]
+            cat_sums = dict.fromkeys(CANONICAL_CATEGORIES, 0.0)
+            card_sums = dict.fromkeys(cards, 0.0)
+            n = 0
+            for (cat, card), (spend, k) in cells.items():
+                cat_sums[cat] += spend
+                card_sums[card] += spend
+                n += k
+            for cat in CANONICAL_CATEGORIES:
+                by_category[cat].append(round(cat_sums[cat], 2))
+                for card in cards:
+                    by_category_card[f"{cat}|{card}"].append(round(cells.get((cat, card), (0.0, 0))[0], 2))
+            for card in cards:
+                by_card[card].append(round(card_sums[card], 2))
+            total.append(round(sum(cat_sums.values()), 2))
+            count.append(n)
+        return {
+            "periods": periods,
+            "total": total,
+            "by_category": by_category,
+            "by_card": by_card,
+            # drop all-zero combinations to keep the payload small
+            "by_category_card": {k: v for k, v in by_category_card.items() if any(v)},
+            "count": count,
+        }
+
+    def to_dict(self):
+        return {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            **{g: self._series(g) for g in GRANULARITIES},
+        }
+
+    def write(self, output_dir=OUTPUT_DIR):
+        return write_json(os.path.join(output_dir, ROLLUPS_FILENAME), self.to_dict(), ignore_keys=("created_at",))
+
+
+_rollups_cache = {}  # output_dir -> (rollups.json stat, payload)
+_rollups_lock = threading.Lock()
+
+
+def load_rollups(output_dir=OUTPUT_DIR):
+    """The rollups.json payload, re-read only when the file changes. None if not written yet."""
+    path = os.path.join(output_dir, ROLLUPS_FILENAME)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _rollups_lock:
+        hit = _rollups_cache.get(output_dir)
+        if hit and hit[0] == stamp:
+            return hit[1]
+    payload = load_json(path)
+    with _rollups_lock:
+        _rollups_cache[output_dir] = (stamp, payload)
+    return payload
+
+
+def slice_rollups(payload, granularity="month", date_from=None, date_to=None, categories=None, cards=None):
+    """
+    One granularity of a rollups payload, optionally restricted to periods in [date_from, date_to]
+    (ISO strings, compared by prefix) and to some categories / card types.
+    """
+    series = payload.get(granularity) or {"periods": [], "total": [], "by_category": {}, "by_card": {},
+                                          "by_category_card": {}, "count": []}
+    periods = series["periods"]
+    lo = date_from[:len(periods[0])] if date_from and periods else None
+    hi = date_to[:len(periods[0])] if date_to and periods else None
+    keep = [i for i, p in enumerate(periods) if (lo is None or p >= lo) and (hi is None or p <= hi)]
+
+    def pick(values):
+        return [values[i] for i in keep]
+
+    by_category = {c: pick(v) for c, v in series["by_category"].items()
+                   if not categories or c in categories}
+    by_card = {c: pick(v) for c, v in series["by_card"].items() if not cards or c in cards}
+    by_category_card = {k: pick(v) for k, v in series["by_category_card"].items()
+                        if (not categories or k.partition("|")[0] in categories)
+                        and (not cards or k.partition("|")[2] in cards)}
+    return {
+        "granularity": granularity,
+        "periods": pick(periods),
+        "total": pick(series["total"]),
+        "by_category": by_category,
+        "by_card": by_card,
+        "by_category_card": by_category_card,
+        "count": pick(series["count"]),
+    }
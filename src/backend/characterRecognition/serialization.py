@@ -0,0 +1,107 @@
+"""
+serialization.py
+
+Pluggable encoders for the pipeline's artifacts.
+
+  JSON (files the frontend or other tools read):
+    compact by default, indented only on request (OUTPUT_PRETTY=1, or ?pretty=1 on /api/output).
+    Uses orjson when installed (several times faster than the stdlib), else json.
+
+  NDJSON (one JSON value per line, e.g. all_transactions.ndjson):
+    written and read one record at a time (output_writer.write_ndjson / iter_ndjson), so
+    neither side ever holds the whole history in memory.
+
+  Internal artifacts (only the backend reads them, e.g. per_file_results):
+    INTERNAL_FORMAT=json (default) or msgpack. msgpack needs the optional `msgpack`
+    package; without it we fall back to JSON. Readers go through artifact_path()/
+    load_artifact(), which find whichever format is on disk.
+
+Benchmark on a synthetic history: python bench_serialization.py --transactions 200000
+"""
+
+import os
+import json
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+PRETTY_OUTPUT = os.environ.get("OUTPUT_PRETTY", "0").lower() in ("1", "true", "yes")
+
+INTERNAL_FORMAT = os.environ.get("INTERNAL_FORMAT", "json").lower()
+if INTERNAL_FORMAT == "msgpack" and msgpack is None:
+    print("Warning: INTERNAL_FORMAT=msgpack but msgpack is not installed; using json")
+    INTERNAL_FORMAT = "json"
+if INTERNAL_FORMAT not in ("json", "msgpack"):
+    print(f"Warning: unknown INTERNAL_FORMAT '{INTERNAL_FORMAT}'; using json")
+    INTERNAL_FORMAT = "json"
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+_EXTENSIONS = {"json": ".json", "msgpack": ".msgpack"}
+
+
+def dumps_json(obj, pretty=None):
+    """obj as UTF-8 JSON bytes: compact, or indented by 2 when pretty (default: PRETTY_OUTPUT)."""
+    pretty = PRETTY_OUTPUT if pretty is None else pretty
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json(path):
+    with open(path, "rb") as f:
+        return loads_json(f.read())
+
+
+def iter_ndjson(path):
+    """Yield the records of an NDJSON file one at a time (blank lines are skipped)."""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads_json(line)
+
+
+def dumps_internal(obj, fmt=None):
+    if (fmt or INTERNAL_FORMAT) == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps_json(obj, pretty=False)
+
+
+def artifact_path(output_dir, stem, fmt=None):
+    """
+    Path of an internal artifact ("per_file_results" -> per_file_results.json / .msgpack).
+    Prefers the configured format; falls back to the other one if only that exists on disk.
+    """
+    fmt = fmt or INTERNAL_FORMAT
+    preferred = os.path.join(output_dir, stem + _EXTENSIONS[fmt])
+    if os.path.exists(preferred):
+        return preferred
+    for other, ext in _EXTENSIONS.items():
+        candidate = os.path.join(output_dir, stem + ext)
+        if other != fmt and os.path.exists(candidate):
+            return candidate
+    return preferred
+
+
+def load_artifact(path):
+    """Load an internal artifact written in either format (by extension)."""
+    if path.endswith(".msgpack"):
+        if msgpack is None:
+            raise RuntimeError(f"{path} is msgpack but the msgpack package is not installed")
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read(), raw=False)
+    return load_json(path)
@@ -0,0 +1,125 @@
+"""
+simulator.py
+
+Local what-if simulator for the savings goal, so tweaking the goal, the deadline or the
+target mix doesn't need another model round trip.
+
+Given monthly spend per category and a grid of candidate cut levels (fractions of each
+category's spend), every combination is evaluated in one vectorized pass:
+  monthly_saving = base_saving + sum of the cuts
+  months_to_goal = ceil(goal_cost / monthly_saving)
+  mix            = spend after the cuts, as % shares
+  deviation      = how far that mix is from the target mix (half the L1 distance, in % points)
+
+The Pareto front trades months_to_goal against deviation: a plan is kept only if no other
+plan reaches the goal at least as fast with a mix at least as close to the target (ties go
+to the smaller total cut). 5 levels over 7 categories (78,125 plans) take a few tens of ms.
+"""
+
+import time
+
+import numpy as np
+
+try:
+    from characterRecognition.spending import CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, canonical_category
+except Exception:
+    from spending import CANONICAL_CATEGORIES, DEFAULT_GOAL_MIX, canonical_category
+
+DEFAULT_LEVELS = [0.0, 0.1, 0.2, 0.3, 0.5]
+MAX_SCENARIOS = 200_000
+MAX_FRONT = 25
+
+
+def _targets(goal_mix):
+    targets = np.zeros(len(CANONICAL_CATEGORIES))
+    for goal in goal_mix:
+        targets[CANONICAL_CATEGORIES.index(canonical_category(goal.get("name")))] = float(goal.get("percentage", 0) or 0)
+    return targets
+
+
+def _levels_for(levels, category):
+    """Cut levels for a category: one list for all categories, or a {category: [levels]} dict."""
+    if isinstance(levels, dict):
+        levels = levels.get(category, [0.0])
+    out = sorted({min(max(float(x), 0.0), 1.0) for x in levels} | {0.0})
+    return np.asarray(out)
+
+
+def simulate(category_spend, goal_cost, goal_mix=None, levels=None, categories=None, base_saving=0.0,
+             deadline_months=None, max_scenarios=MAX_SCENARIOS, limit=MAX_FRONT):
+    """
+    Evaluate every cut combination and return the Pareto-best plans.
+
+    category_spend: {category: monthly spend £} (e.g. insights["by_category"][c]["spend"])
+    levels: cut fractions, a list for every category or a {category: [levels]} dict (0 is always included)
+    categories: categories allowed to change (default: every category with spend)
+    deadline_months: only keep plans reaching the goal within this many months
+    Raises ValueError if the grid would exceed max_scenarios.
+    """
+    started = time.perf_counter()
+    goal_mix = DEFAULT_GOAL_MIX if goal_mix is None else goal_mix
+    levels = DEFAULT_LEVELS if levels is None else levels
+    goal_cost = float(goal_cost)
+    if goal_cost <= 0:
+        raise ValueError("goal_cost must be positive")
+
+    spend = np.zeros(len(CANONICAL_CATEGORIES))
+    for name, value in (category_spend or {}).items():
+        spend[CANONICAL_CATEGORIES.index(canonical_category(name))] += float(value or 0)
+    targets = _targets(goal_mix)
+
+    allowed = {canonical_category(c) for c in categories} if categories else set(CANONICAL_CATEGORIES)
+    varied = [i for i, c in enumerate(CANONICAL_CATEGORIES) if c in allowed and spend[i] > 0]
+    grids = [_levels_for(levels, CANONICAL_CATEGORIES[i]) for i in varied]
+    n_scenarios = int(np.prod([len(g) for g in grids])) if grids else 1
+    if n_scenarios > max_scenarios:
+        raise ValueError(f"{n_scenarios} scenarios exceeds the limit of {max_scenarios}; "
+                         "use fewer levels or categories")
+
+    # (scenarios x categories) matrix of cut fractions, zero for the categories not varied
+    fractions = np.zeros((n_scenarios, len(CANONICAL_CATEGORIES)))
+    if grids:
+        mesh = np.meshgrid(*grids, indexing="ij")
+        fractions[:, varied] = np.stack([m.ravel() for m in mesh], axis=1)
+
+    cuts = fractions * spend
+    total_cut = cuts.sum(axis=1)
+    saving = total_cut + float(base_saving)
+    with np.errstate(divide="ignore"):
+        months = np.where(saving > 0, np.ceil(goal_cost / np.where(saving > 0, saving, 1)), np.inf)
+    remaining = spend - cuts
+    remaining_total = remaining.sum(axis=1, keepdims=True)
+    mix = np.divide(remaining * 100, remaining_total, out=np.zeros_like(remaining), where=remaining_total > 0)
+    deviation = np.abs(mix - targets).sum(axis=1) / 2
+
+    feasible = np.isfinite(months)
+    if deadline_months:
+        feasible &= months <= float(deadline_months)
+    ids = np.flatnonzero(feasible)
+
+    # Pareto front on (months asc, deviation asc), ties broken by the smaller total cut
+    order = ids[np.lexsort((total_cut[ids], deviation[ids], months[ids]))]
+    dev_sorted = deviation[order]
+    best_before = np.concatenate(([np.inf], np.minimum.accumulate(dev_sorted)[:-1]))
+    front = order[dev_sorted < best_before - 1e-9]
+
+    def plan(i):
+        return {
+            "cuts": {CANONICAL_CATEGORIES[c]: round(float(cuts[i, c]), 2) for c in varied if cuts[i, c] > 0},
+            "monthly_saving": round(float(saving[i]), 2),
+            "months_to_goal": int(months[i]),
+            "mix": {c: round(float(mix[i, j]), 1) for j, c in enumerate(CANONICAL_CATEGORIES)},
+            "deviation": round(float(deviation[i]), 1),
+        }
+
+    return {
+        "scenarios": n_scenarios,
+        "feasible": int(ids.size),
+        "categories": [CANONICAL_CATEGORIES[i] for i in varied],
+        "baseline_deviation": round(float(np.abs(spend / spend.sum() * 100 - targets).sum() / 2), 1)
+        if spend.sum() else None,
+        "front": [plan(int(i)) for i in front[:limit]],
+        "fastest": plan(int(front[0])) if front.size else None,
+        "closest_mix": plan(int(front[-1])) if front.size else None,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
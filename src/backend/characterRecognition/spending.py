@@ -0,0 +1,102 @@
+"""
+spending.py
+
+Shared helpers for turning processed transactions into spending figures.
+
+The pipeline's full transaction records (output/per_file_results.json, or .msgpack with
+INTERNAL_FORMAT=msgpack - see per_file_results_path()) look like:
+  {"date-processed", "date-of-transaction", "company-name", "amount": "£12.50",
+   "balance", "type": deposit|withdrawal|no_change|opening_balance, "company-type", "card-type"}
+
+Spend rules (used by the chat context, insights and rollups so the numbers agree):
+  - opening balances are never spend
+  - debit card: a deposit is money coming in (salary, transfers) - not spend
+  - credit card: a withdrawal lowers the card balance (a repayment) - not spend
+  - everything else counts as spend of abs(amount)
+"""
+
+import os
+
+try:
+    from characterRecognition.text_to_json import money_to_float, parse_date_safe, dedupe_transactions
+    from characterRecognition.serialization import artifact_path, load_artifact
+except Exception:
+    from text_to_json import money_to_float, parse_date_safe, dedupe_transactions
+    from serialization import artifact_path, load_artifact
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+
+CANONICAL_CATEGORIES = [
+    "Recurring Debts",
+    "Shopping",
+    "Travel",
+    "Entertainment",
+    "Bills",
+    "Eating Out",
+    "Everything Else",
+]
+_CATEGORY_LOOKUP = {c.lower(): c for c in CANONICAL_CATEGORIES}
+
+# Default target spending mix (percentages), as used by the tips/context prompts
+DEFAULT_GOAL_MIX = [
+    {"name": "Recurring Debts", "percentage": 20},
+    {"name": "Travel", "percentage": 15},
+    {"name": "Entertainment", "percentage": 10},
+    {"name": "Shopping", "percentage": 15},
+    {"name": "Bills", "percentage": 18},
+    {"name": "Eating Out", "percentage": 2},
+    {"name": "Everything Else", "percentage": 20},
+]
+
+
+def canonical_category(company_type):
+    """Map a company-type value ('shopping', 'Recurring debts', ...) to one of CANONICAL_CATEGORIES."""
+    return _CATEGORY_LOOKUP.get((company_type or "").strip().lower(), "Everything Else")
+
+
+def is_opening_balance(txn):
+    return txn.get("type") == "opening_balance" or \
+        (txn.get("company-name") or "").strip().lower() == "opening balance"
+
+
+def is_spend(txn):
+    """True if the transaction is money spent (see module docstring)."""
+    if is_opening_balance(txn):
+        return False
+    card_type = (txn.get("card-type") or "").lower()
+    ttype = txn.get("type", "")
+    if card_type == "debit" and ttype == "deposit":
+        return False
+    if card_type == "credit" and ttype == "withdrawal":
+        return False
+    return True
+
+
+def txn_amount(txn):
+    return abs(money_to_float(txn.get("amount", "")))
+
+
+def txn_date(txn):
+    """Date of the transaction (falls back to the processed date), or None."""
+    return parse_date_safe(txn.get("date-of-transaction", "")) or parse_date_safe(txn.get("date-processed", ""))
+
+
+def per_file_results_path(output_dir=OUTPUT_DIR):
+    """Path of the per-file results artifact in whichever internal format is on disk."""
+    return artifact_path(output_dir, "per_file_results")
+
+
+def load_full_transactions(output_dir=OUTPUT_DIR):
+    """
+    Load the full (untrimmed) transaction records written by run_json_text(), with lines
+    repeated across overlapping statements removed (same dedup as the pipeline).
+    Returns [] when nothing has been processed yet.
+    """
+    path = per_file_results_path(output_dir)
+    if not os.path.exists(path):
+        return []
+    per_file = load_artifact(path)
+    transactions, _ = dedupe_transactions(
+        result.get("transactions", []) for result in per_file.values() if isinstance(result, dict)
+    )
+    return transactions
@@ -0,0 +1,123 @@
+"""
+statement_probe.py
+
+Cheap "does this look like a bank statement?" check, run at upload time so that
+photos and unrelated PDFs don't get the full rasterize-and-OCR treatment.
+
+Strategy (first one that yields text wins):
+  1. PDF text layer of the first PROBE_MAX_PAGES pages (pdfplumber, no OCR at all)
+  2. Low-resolution OCR of those pages, one at a time, stopping as soon as the text read so
+     far looks like a statement / a downscaled copy of the image
+Several pages are looked at because many statements open with a cover or summary page.
+
+The text is then scored with the same date/amount patterns parse_transactions() uses.
+probe_statement() returns:
+  {
+    "is_statement": True | False | None,   # None = probe could not run (never reject on that)
+    "method": "text_layer" | "ocr_lowres" | "unavailable",
+    "date_lines": int,        # lines starting with DD-MM-YYYY
+    "amounts": int,           # £x.xx matches
+    "pages": int,             # pages looked at (1 for images)
+    "seconds": float
+  }
+"""
+
+import os
+import re
+import time
+
+import pytesseract as tess
+from PIL import Image
+from pdf2image import convert_from_path
+
+try:
+    from characterRecognition.text_to_json import DATE_PATTERN, MONEY_PATTERN
+except Exception:
+    from text_to_json import DATE_PATTERN, MONEY_PATTERN
+
+try:
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
+PROBE_DPI = 150             # enough for statement-sized text, ~4x fewer pixels than the 300dpi OCR pass
+PROBE_MAX_EDGE = 1600       # images are downscaled to this long edge before the probe OCR
+MIN_TEXT_LAYER_CHARS = 20   # below this a PDF text layer is treated as missing (scanned PDF)
+PROBE_MAX_PAGES = 3
+MIN_DATE_LINES = 1
+MIN_AMOUNTS = 2
+
+_DATE_LINE_RE = re.compile(rf'^\s*{DATE_PATTERN}', flags=re.MULTILINE)
+_MONEY_RE = re.compile(MONEY_PATTERN)
+
+
+def score_text(text):
+    """Count statement-like features in text."""
+    return {
+        "date_lines": len(_DATE_LINE_RE.findall(text or "")),
+        "amounts": len(_MONEY_RE.findall(text or "")),
+    }
+
+
+def _looks_like_statement(scores):
+    return scores["date_lines"] >= MIN_DATE_LINES and scores["amounts"] >= MIN_AMOUNTS
+
+
+def _pdf_text_layer(path):
+    """(text of the first PROBE_MAX_PAGES pages, pages read)."""
+    if pdfplumber is None:
+        return "", 0
+    with pdfplumber.open(path) as pdf:
+        pages = pdf.pages[:PROBE_MAX_PAGES]
+        return "\n".join(page.extract_text() or "" for page in pages), len(pages)
+
+
+def _pdf_lowres_ocr(path):
+    """(OCR text of up to PROBE_MAX_PAGES pages, pages read), stopping at the first statement-like page."""
+    texts = []
+    for page_no in range(1, PROBE_MAX_PAGES + 1):
+        pages = convert_from_path(path, dpi=PROBE_DPI, first_page=page_no, last_page=page_no, grayscale=True)
+        if not pages:
+            break
+        texts.append(tess.image_to_string(pages[0]))
+        if _looks_like_statement(score_text(texts[-1])):
+            break
+    return "\n".join(texts), len(texts)
+
+
+def _image_lowres_ocr(path):
+    with Image.open(path) as img:
+        # JPEG draft mode decodes straight to a reduced size, which is much cheaper than a full decode
+        img.draft("L", (PROBE_MAX_EDGE, PROBE_MAX_EDGE))
+        img = img.convert("L")
+        img.thumbnail((PROBE_MAX_EDGE, PROBE_MAX_EDGE))
+        return tess.image_to_string(img), 1
+
+
+def probe_statement(path):
+    """Classify a file as statement / non-statement as cheaply as possible (see module docstring)."""
+    started = time.monotonic()
+    ext = os.path.splitext(path)[1].lower()
+    text, method, pages = "", "unavailable", 0
+
+    try:
+        if ext == ".pdf":
+            try:
+                text, pages = _pdf_text_layer(path)
+            except Exception as e:
+                print(f"Warning: couldn't read text layer of {path}: {e}")
+                text = ""
+            if len(text.strip()) >= MIN_TEXT_LAYER_CHARS:
+                method = "text_layer"
+            else:
+                (text, pages), method = _pdf_lowres_ocr(path), "ocr_lowres"
+        else:
+            (text, pages), method = _image_lowres_ocr(path), "ocr_lowres"
+    except Exception as e:
+        print(f"Warning: statement probe failed for {path}: {e}")
+        return {"is_statement": None, "method": "unavailable", "date_lines": 0, "amounts": 0, "pages": 0,
+                "error": str(e), "seconds": round(time.monotonic() - started, 3)}
+
+    scores = score_text(text)
+    return {"is_statement": _looks_like_statement(scores), "method": method, **scores, "pages": pages,
+            "seconds": round(time.monotonic() - started, 3)}
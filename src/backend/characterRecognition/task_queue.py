@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+task_queue.py
+
+Durable SQLite queue of per-file OCR/parse tasks, so OCR can run in worker processes on
+other hosts instead of inside the Flask process.
+
+Usage:
+    TASK_QUEUE_PATH=/shared/ocr_tasks.sqlite python app.py            # API enqueues + merges
+    TASK_QUEUE_PATH=/shared/ocr_tasks.sqlite python task_queue.py worker --processes 4
+    TASK_QUEUE_PATH=/shared/ocr_tasks.sqlite python task_queue.py stats
+
+Behavior:
+ - With TASK_QUEUE_PATH set, run_json_text enqueues every statement that isn't already in the
+   content-hash cache and waits; workers claim tasks, run process_statement_file (which
+   stores the record in the shared cache, see FILE_CACHE_DIR in file_cache.py) and mark them done;
+   the API then loads the records from the cache and merges them as usual.
+ - A claimed task is leased to one worker for LEASE_SECONDS and the worker heartbeats to
+   extend it. A lease that runs out (worker crashed or lost its host) is reaped by the next
+   claim and the task is retried, up to MAX_ATTEMPTS in total, then marked failed.
+ - Identical content is queued once (tasks are keyed by SHA-256).
+ - If no worker holds a lease for TASK_QUEUE_GRACE seconds (none running) or the tasks aren't
+   finished within TASK_QUEUE_TIMEOUT seconds, the API processes the remaining files itself.
+
+Statement paths, the queue database and the cache directory must be visible at the same
+paths on every host (shared filesystem), and host clocks should be roughly in sync.
+"""
+
+import os
+import time
+import signal
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+try:
+    from characterRecognition.file_cache import hash_file, hash_file_cached, load_cached
+except Exception:
+    from file_cache import hash_file, hash_file_cached, load_cached
+
+TASK_QUEUE_PATH = os.environ.get("TASK_QUEUE_PATH")
+LEASE_SECONDS = float(os.environ.get("TASK_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "3"))
+TASK_QUEUE_TIMEOUT = float(os.environ.get("TASK_QUEUE_TIMEOUT", "600"))
+TASK_QUEUE_GRACE = float(os.environ.get("TASK_QUEUE_GRACE", "15"))
+POLL_SECONDS = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,              -- queued | leased | done | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks (status, id);
+"""
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TaskQueue:
+    def __init__(self, path=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path or TASK_QUEUE_PATH
+        if not self.path:
+            raise ValueError("No task queue path (set TASK_QUEUE_PATH)")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # autocommit mode; writes that must be atomic use BEGIN IMMEDIATE explicitly.
+        # No WAL: it needs shared memory, which doesn't work across hosts.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, path, digest=None):
+        """Queue path (keyed by content hash) and return the task id. Finished or failed tasks for the same content are re-queued."""
+        digest = digest or hash_file(path)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, status FROM tasks WHERE sha256 = ?", (digest,)).fetchone()
+            if row is None:
+                task_id = conn.execute(
+                    "INSERT INTO tasks (sha256, path, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                    (digest, path, now, now)).lastrowid
+            else:
+                task_id = row["id"]
+                if row["status"] in ("done", "failed"):
+                    conn.execute("UPDATE tasks SET path = ?, status = 'queued', attempts = 0, error = NULL, "
+                                 "lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                                 (path, now, task_id))
+            conn.execute("COMMIT")
+            return task_id
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _reap(self, conn, now):
+        """Give expired leases back to the queue (or fail tasks that used up their attempts)."""
+        conn.execute("UPDATE tasks SET status = 'failed', error = 'lease expired too many times', lease_owner = NULL, "
+                     "updated_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                     (now, now, self.max_attempts))
+        conn.execute("UPDATE tasks SET status = 'queued', lease_owner = NULL, updated_at = ? "
+                     "WHERE status = 'leased' AND lease_expires < ?", (now, now))
+
+    def claim(self, owner):
+        """Lease the oldest queued task to owner. Returns {"id", "path", "sha256", "attempts"} or None."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reap(conn, now)
+            row = conn.execute("SELECT id, path, sha256, attempts FROM tasks WHERE status = 'queued' "
+                               "ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                             "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                             (owner, now + self.lease_seconds, now, row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"id": row["id"], "path": row["path"], "sha256": row["sha256"], "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, task_id, owner):
+        """Extend owner's lease on the task. False if the lease was lost (expired and re-claimed)."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.execute("UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                               "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                               (now + self.lease_seconds, now, task_id, owner))
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, task_id, owner):
+        return self._finish(task_id, owner, "done", None)
+
+    def fail(self, task_id, owner, error):
+        """Record a failed attempt: the task is re-queued until it reaches max_attempts."""
+        return self._finish(task_id, owner, "failed", str(error)[:1000])
+
+    def _finish(self, task_id, owner, status, error):
+        now = time.time()
+        conn = self._connect()
+        try:
+            if status == "failed":
+                sql = ("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                       "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                       "WHERE id = ? AND status = 'leased' AND lease_owner = ?")
+                params = (self.max_attempts, error, now, task_id, owner)
+            else:
+                sql = ("UPDATE tasks SET status = 'done', error = NULL, lease_owner = NULL, lease_expires = NULL, "
+                       "updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?")
+                params = (now, task_id, owner)
+            return conn.execute(sql, params).rowcount == 1
+        finally:
+            conn.close()
+
+    def statuses(self, task_ids):
+        """task id -> {"status", "sha256", "error", "attempts"}"""
+        if not task_ids:
+            return {}
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT id, status, sha256, error, attempts FROM tasks "
+                                f"WHERE id IN ({', '.join('?' * len(task_ids))})", list(task_ids)).fetchall()
+        finally:
+            conn.close()
+        return {r["id"]: {"status": r["status"], "sha256": r["sha256"], "error": r["error"],
+                          "attempts": r["attempts"]} for r in rows}
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            owners = conn.execute("SELECT COUNT(DISTINCT lease_owner) FROM tasks WHERE status = 'leased'").fetchone()[0]
+        finally:
+            conn.close()
+        return {"queued": counts.get("queued", 0), "leased": counts.get("leased", 0), "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0), "active_workers": owners}
+
+
+# ----------------------------
+# Worker side
+# ----------------------------
+
+def _heartbeat_loop(queue, task_id, owner, stop):
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(task_id, owner):
+            print(f"Worker {owner}: lost the lease on task {task_id}")
+            return
+
+
+def run_worker(queue_path=None, idle_exit=None):
+    """
+    Claim and process tasks until interrupted (or idle for idle_exit seconds).
+    Returns the number of tasks processed.
+    """
+    try:
+        from characterRecognition.text_to_json import process_statement_file
+    except Exception:
+        from text_to_json import process_statement_file
+
+    queue = TaskQueue(queue_path)
+    owner = worker_id()
+    processed = 0
+    idle_since = time.monotonic()
+    print(f"Worker {owner} polling {queue.path}")
+    while True:
+        task = queue.claim(owner)
+        if task is None:
+            if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                return processed
+            time.sleep(POLL_SECONDS)
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat_loop, args=(queue, task["id"], owner, stop), daemon=True)
+        beat.start()
+        started = time.monotonic()
+        try:
+            if not os.path.exists(task["path"]):
+                raise FileNotFoundError(task["path"])
+            process_statement_file(task["path"])
+            queue.complete(task["id"], owner)
+            print(f"Worker {owner}: task {task['id']} {os.path.basename(task['path'])} "
+                  f"done in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"Worker {owner}: task {task['id']} failed (attempt {task['attempts']}): {e}")
+            queue.fail(task["id"], owner, e)
+        finally:
+            stop.set()
+            beat.join()
+        processed += 1
+        idle_since = time.monotonic()
+
+
+# ----------------------------
+# API side
+# ----------------------------
+
+def recognize_with_queue(sources, process_local, progress_callback=None, emit=None, timeout=TASK_QUEUE_TIMEOUT,
+                         grace=TASK_QUEUE_GRACE):
+    """
+    Distributed version of text_to_json._recognize_sources: [(folder_label, path)] ->
+    {"<folder>/<filename>": record or None}. Files already in the content cache are loaded
+    locally; the rest are queued for the workers and their records read back from the cache.
+    process_local(path) -> (record, cached) handles cache hits and the fallback when no worker
+    picks the tasks up within grace seconds or they aren't all done within timeout.
+    """
+    def _emit(stage, **fields):
+        if emit is not None:
+            emit(progress_callback, stage, **fields)
+
+    queue = TaskQueue()
+    records, waiting = {}, {}  # waiting: task id -> (key, path, file index)
+    _emit("scan", files_total=len(sources))
+    for index, (folder_label, path) in enumerate(sources):
+        key = f"{folder_label}/{os.path.basename(path)}"
+        digest = hash_file_cached(path)
+        if load_cached(digest) is not None:
+            records[key], cached = process_local(path)
+            _emit("file_done", file=key, file_index=index + 1, cached=cached,
+                  chars=len(records[key]["text"]) if records[key] else 0)
+            continue
+        task_id = queue.enqueue(path, digest)
+        waiting[task_id] = (key, path, index + 1)
+        _emit("file_started", file=key, file_index=index + 1, queued=True)
+    print(f"Queued {len(waiting)} files for OCR workers ({len(records)} already cached)")
+
+    deadline = time.monotonic() + timeout
+    idle_since = time.monotonic()  # last time a worker was seen holding a lease or finishing a task
+    no_workers = False
+    while waiting and time.monotonic() < deadline:
+        for task_id, info in queue.statuses(list(waiting)).items():
+            if info["status"] not in ("done", "failed"):
+                continue
+            idle_since = time.monotonic()
+            key, path, file_index = waiting.pop(task_id)
+            record = load_cached(info["sha256"]) if info["status"] == "done" else None
+            if info["status"] == "failed":
+                print(f"Error processing {path}: {info['error']}")
+            records[key] = record
+            _emit("file_done", file=key, file_index=file_index, cached=False,
+                  chars=len(record["text"]) if record else 0)
+        if not waiting:
+            break
+        if queue.stats()["active_workers"]:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= grace:
+            no_workers = True
+            break
+        time.sleep(POLL_SECONDS)
+
+    if waiting and no_workers:
+        print(f"Warning: no OCR worker picked up tasks in {grace:.0f}s; processing {len(waiting)} files here")
+    elif waiting:
+        print(f"Warning: {len(waiting)} queued files not finished by workers in {timeout:.0f}s; processing them here")
+    for task_id, (key, path, file_index) in waiting.items():
+        try:
+            records[key], cached = process_local(path)
+        except Exception as e:
+            print(f"Error processing {path}: {e}")
+            records[key], cached = None, False
+        _emit("file_done", file=key, file_index=file_index, cached=cached,
+              chars=len(records[key]["text"]) if records[key] else 0)
+    return records
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def _worker_process(queue_path):
+    # SIGTERM stops the worker like Ctrl+C; its task is retried elsewhere once the lease runs out
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        run_worker(queue_path)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR task queue: run workers or show queue stats.")
+    parser.add_argument("command", choices=("worker", "stats"))
+    parser.add_argument("--queue", "-q", default=TASK_QUEUE_PATH, help="Queue database (default: $TASK_QUEUE_PATH).")
+    parser.add_argument("--processes", "-p", type=int, default=1, help="Worker processes on this host (default: 1).")
+    args = parser.parse_args()
+    if not args.queue:
+        parser.error("set TASK_QUEUE_PATH or pass --queue")
+
+    if args.command == "stats":
+        print(TaskQueue(args.queue).stats())
+        return
+    if args.processes <= 1:
+        _worker_process(args.queue)
+        return
+    procs = [multiprocessing.Process(target=_worker_process, args=(args.queue,)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
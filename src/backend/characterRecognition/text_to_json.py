@@ -12,13 +12,17 @@ This variant trims the final saved JSON so each transaction object contains only
 Outputs:
   - Per-file JSON results in ./output/ (each file contains only trimmed transactions)
   - Combined results in ./output/all_transactions.json (only trimmed transactions)
+  - The same transactions as NDJSON in ./output/all_transactions.ndjson (one per line, for streaming)
   - Category files in ./output/categories/ (trimmed transactions only)
 """
 
 import os
 import re
-import glob
 import json
+import time
+import threading
+from collections import deque
+from functools import lru_cache
 from datetime import datetime
 
 # OCR + image/pdf handling
@@ -26,6 +30,17 @@ import pytesseract as tess
 from PIL import Image
 from pdf2image import convert_from_path
 
+try:
+    from characterRecognition.file_cache import hash_file_cached, load_cached, store_cached
+    from characterRecognition.dir_scan import flagged_names, list_statement_files
+    from characterRecognition.image_normalize import ensure_normalized
+    from characterRecognition.output_writer import OutputBatch, after_publish, write_json, write_internal, write_ndjson
+except Exception:
+    from file_cache import hash_file_cached, load_cached, store_cached
+    from dir_scan import flagged_names, list_statement_files
+    from image_normalize import ensure_normalized
+    from output_writer import OutputBatch, after_publish, write_json, write_internal, write_ndjson
+
 # ---------------------------
 # Company mapping (user provided)
 # ---------------------------
@@ -106,11 +121,104 @@ companies_normalized = {k.lower(): v for k, v in companies.items()}
 # Character recognition utils
 # ----------------------------
 
-SUPPORTED_PATTERNS = [
-    "*.png", "*.PNG", "*.jpg", "*.JPG", "*.jpeg", "*.JPEG",
-    "*.bmp", "*.BMP", "*.tiff", "*.TIFF", "*.tif", "*.TIF",
-    "*.pdf", "*.PDF"
-]
+# Regex fragments shared by the transaction parser and statement_probe.py
+DATE_PATTERN = r'\d{2}-\d{2}-\d{4}'
+MONEY_PATTERN = r'\£\d{1,3}(?:,\d{3})*\.\d{2}|\£\d+\.\d{2}'
+
+
+# ----------------------------
+# Progress reporting
+# ----------------------------
+
+class ProgressTracker:
+    """
+    Wraps a progress callback and enriches raw pipeline milestones with timing info.
+
+    Pipeline functions emit plain dicts such as {"stage": "page", "file": ..., "page": 2, "pages": 5}.
+    The tracker adds elapsed seconds, overall pages/sec, a recent-throughput pages/sec and an ETA,
+    then forwards the event (with "event": "progress") to the wrapped callback.
+    Stages: scan, file_started, rasterize, page, file_done, parse, write, done.
+    """
+
+    def __init__(self, callback, window=8):
+        self.callback = callback
+        self.started_at = time.monotonic()
+        self.files_total = 0
+        self.files_done = 0
+        self.pages_done = 0
+        self.current_file_pages = 0
+        self.current_file_pages_done = 0
+        self._recent = deque(maxlen=window)  # (timestamp, pages_done) samples
+        self._stage_started = {}
+
+    def _pages_per_sec(self):
+        if len(self._recent) >= 2:
+            (t0, p0), (t1, p1) = self._recent[0], self._recent[-1]
+            if t1 > t0:
+                return (p1 - p0) / (t1 - t0)
+        elapsed = time.monotonic() - self.started_at
+        return self.pages_done / elapsed if elapsed > 0 and self.pages_done else None
+
+    def _eta_seconds(self, rate):
+        if not rate:
+            return None
+        remaining_in_file = max(self.current_file_pages - self.current_file_pages_done, 0)
+        remaining_files = max(self.files_total - self.files_done - (1 if self.current_file_pages else 0), 0)
+        avg_pages = (self.pages_done / self.files_done) if self.files_done else (self.current_file_pages or 1)
+        return round((remaining_in_file + remaining_files * avg_pages) / rate, 2)
+
+    def __call__(self, event):
+        now = time.monotonic()
+        stage = event.get("stage")
+
+        if stage == "scan":
+            self.files_total = event.get("files_total", 0)
+        elif stage == "file_started":
+            self.current_file_pages = 0
+            self.current_file_pages_done = 0
+            self._stage_started["file"] = now
+        elif stage == "rasterize":
+            self.current_file_pages = event.get("pages", 0)
+        elif stage == "page":
+            self.pages_done += 1
+            self.current_file_pages = event.get("pages", self.current_file_pages)
+            self.current_file_pages_done = event.get("page", self.current_file_pages_done)
+            self._recent.append((now, self.pages_done))
+        elif stage == "file_done":
+            self.files_done += 1
+            self.current_file_pages = 0
+            self.current_file_pages_done = 0
+            if "file" in self._stage_started:
+                event.setdefault("file_seconds", round(now - self._stage_started.pop("file"), 3))
+
+        rate = self._pages_per_sec()
+        payload = {
+            "event": "progress",
+            **event,
+            "elapsed": round(now - self.started_at, 3),
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "pages_done": self.pages_done,
+            "pages_per_sec": round(rate, 3) if rate else None,
+            "eta_seconds": 0 if stage == "done" else self._eta_seconds(rate),
+        }
+        try:
+            self.callback(payload)
+        except Exception as e:
+            # Progress reporting must never break the pipeline
+            print(f"Warning: progress callback failed: {e}")
+
+
+def _as_tracker(progress_callback):
+    """Wrap a plain callable in a ProgressTracker (None and existing trackers pass through)."""
+    if progress_callback is None or isinstance(progress_callback, ProgressTracker):
+        return progress_callback
+    return ProgressTracker(progress_callback)
+
+
+def _emit(progress_callback, stage, **fields):
+    if progress_callback is not None:
+        progress_callback({"stage": stage, **fields})
 
 
 def _extract_transactions(text):
@@ -142,25 +250,34 @@ def _extract_transactions(text):
     return '\n'.join(transactions)
 
 
-def process_image_file(image_path):
-    """Process a single image file and return extracted text."""
+def process_image_file(image_path, progress_callback=None):
+    """Process a single image file and return extracted text (OCR runs on the normalized copy)."""
     try:
-        img = Image.open(image_path)
+        started = time.monotonic()
+        img = Image.open(ensure_normalized(image_path))
         text = tess.image_to_string(img)
+        _emit(progress_callback, "page", file=os.path.basename(image_path), page=1, pages=1,
+              page_seconds=round(time.monotonic() - started, 3))
         return _extract_transactions(text)
     except Exception as e:
         print(f"Error processing image {image_path}: {str(e)}")
         return ""
 
 
-def process_pdf_file(pdf_path):
+def process_pdf_file(pdf_path, progress_callback=None):
     """Process a single PDF file and return extracted text from all pages."""
     try:
+        started = time.monotonic()
         images = convert_from_path(pdf_path)
+        _emit(progress_callback, "rasterize", file=os.path.basename(pdf_path), pages=len(images),
+              rasterize_seconds=round(time.monotonic() - started, 3))
         all_text = ""
 
         for i, image in enumerate(images):
+            page_started = time.monotonic()
             text = tess.image_to_string(image)
+            _emit(progress_callback, "page", file=os.path.basename(pdf_path), page=i + 1, pages=len(images),
+                  page_seconds=round(time.monotonic() - page_started, 3))
             extracted = _extract_transactions(text)
             if extracted:
                 all_text += f"--- Page {i+1} ---\n{extracted}\n\n"
@@ -172,20 +289,31 @@ def process_pdf_file(pdf_path):
 
 
 def _collect_files_from_dir(directory):
-    """Collect supported image/pdf files from the directory (case-insensitive)."""
-    if not os.path.isdir(directory):
-        return []
-    files = []
-    for pat in SUPPORTED_PATTERNS:
-        files.extend(glob.glob(os.path.join(directory, pat)))
-    files.sort()
-    return files
+    """Collect supported image/pdf files from the directory (case-insensitive, see dir_scan.py)."""
+    return list_statement_files(directory)
+
+
+_candidate_dirs = {}  # (script_directory, target_folder) -> resolved path
+_reported_missing = set()
 
 
 def _find_candidate_dir(script_directory, target_folder):
     """
     Look for target_folder in a few likely locations and return the first existing path or None.
+    A found folder is remembered (and reported once) until it disappears.
     """
+    key = (script_directory, target_folder)
+    resolved = _candidate_dirs.get(key)
+    if resolved and os.path.isdir(resolved):
+        return resolved
+    resolved = _resolve_candidate_dir(script_directory, target_folder)
+    if resolved:
+        _candidate_dirs[key] = resolved
+        print(f"Debug: resolved {target_folder} dir -> {resolved}")
+    return resolved
+
+
+def _resolve_candidate_dir(script_directory, target_folder):
     script_directory = os.path.abspath(script_directory)
 
     candidates = []
@@ -206,69 +334,93 @@ def _find_candidate_dir(script_directory, target_folder):
         if os.path.isdir(norm):
             return norm
 
-    # Debug info for why we didn't find it
-    print(f"Debug: _find_candidate_dir tried these locations for '{target_folder}':")
-    for t in tried:
-        print(f"  - {t}")
+    # Debug info for why we didn't find it (once per folder name)
+    if target_folder not in _reported_missing:
+        _reported_missing.add(target_folder)
+        print(f"Debug: _find_candidate_dir tried these locations for '{target_folder}':")
+        for t in tried:
+            print(f"  - {t}")
 
     return None
 
 
-def character_recognition():
+def _collect_sources():
     """
-    Main function to process files in the credit/ and debit/ folders (searching likely locations).
-    Returns a dict mapping keys "<folder>/<filename>" -> extracted_text
+    Return [(folder_label, fullpath)] for every supported file in the credit/ and debit/ folders,
+    leaving out uploads the statement probe flagged as non-statements (see dir_scan.flag_file).
     """
     script_directory = os.path.dirname(os.path.abspath(__file__))
 
     credit_dir = _find_candidate_dir(script_directory, "credit")
     debit_dir = _find_candidate_dir(script_directory, "debit")
 
-    print(f"Debug: resolved credit_dir -> {credit_dir}")
-    print(f"Debug: resolved debit_dir  -> {debit_dir}")
-
     sources = []  # list of (folder_label, fullpath)
-    if credit_dir:
-        credit_files = _collect_files_from_dir(credit_dir)
-        for f in credit_files:
-            sources.append(("credit", f))
-    else:
-        print("Warning: credit directory not found in searched locations.")
+    for label, directory in (("credit", credit_dir), ("debit", debit_dir)):
+        if not directory:
+            print(f"Warning: {label} directory not found in searched locations.")
+            continue
+        flagged = flagged_names(directory)
+        for f in _collect_files_from_dir(directory):
+            if os.path.basename(f) in flagged:
+                print(f"Skipping {label}/{os.path.basename(f)}: flagged as not a statement")
+                continue
+            sources.append((label, f))
 
-    if debit_dir:
-        debit_files = _collect_files_from_dir(debit_dir)
-        for f in debit_files:
-            sources.append(("debit", f))
-    else:
-        print("Warning: debit directory not found in searched locations.")
+    return sources
+
+
+def _recognize_sources(progress_callback=None):
+    """
+    OCR + parse every file in the credit/ and debit/ folders (using the content-hash cache).
+    Returns a dict mapping keys "<folder>/<filename>" -> cache record (or None on failure).
+    With TASK_QUEUE_PATH set, uncached files are OCR'd by task_queue workers instead.
+    """
+    sources = _collect_sources()
 
     if not sources:
         print("No image or PDF files found in the credit/ or debit/ folders (after checking likely locations).")
+        _emit(progress_callback, "scan", files_total=0)
         return {}
 
-    results = {}
-    for folder_label, file_path in sources:
+    if os.environ.get("TASK_QUEUE_PATH"):
+        # imported here: task_queue's worker imports this module
+        try:
+            from characterRecognition.task_queue import recognize_with_queue
+        except Exception:
+            from task_queue import recognize_with_queue
+        return recognize_with_queue(sources, lambda path: process_statement_file(path, progress_callback),
+                                    progress_callback, _emit)
+
+    _emit(progress_callback, "scan", files_total=len(sources))
+
+    records = {}
+    for index, (folder_label, file_path) in enumerate(sources):
         filename = os.path.basename(file_path)
         key = f"{folder_label}/{filename}"
         print(f"Processing: {key}")
+        _emit(progress_callback, "file_started", file=key, file_index=index + 1)
 
-        file_ext = os.path.splitext(file_path)[1].lower()
-        raw_text = ""
+        cached = False
         try:
-            if file_ext in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif']:
-                raw_text = process_image_file(file_path)
-            elif file_ext == '.pdf':
-                raw_text = process_pdf_file(file_path)
-            else:
-                print(f"Unsupported file type: {file_path}")
-                raw_text = ""
-
-            results[key] = raw_text if raw_text else ""
+            records[key], cached = process_statement_file(file_path, progress_callback)
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
-            results[key] = ""
+            records[key] = None
+        chars = len(records[key]["text"]) if records[key] else 0
+        _emit(progress_callback, "file_done", file=key, file_index=index + 1, chars=chars, cached=cached)
+
+    return records
 
-    return results
+
+def character_recognition(progress_callback=None):
+    """
+    Main function to process files in the credit/ and debit/ folders (searching likely locations).
+    Returns a dict mapping keys "<folder>/<filename>" -> extracted_text
+    If progress_callback is given it receives per-file and per-page progress events.
+    """
+    progress_callback = _as_tracker(progress_callback)
+    records = _recognize_sources(progress_callback)
+    return {key: (rec.get("text") or "") if rec else "" for key, rec in records.items()}
 
 
 def character_recognition_single(image_name="image.png", folder="credit"):
@@ -299,17 +451,93 @@ def character_recognition_single(image_name="image.png", folder="credit"):
         return ""
 
 
+# ----------------------------
+# Per-file processing with the content-hash cache
+# ----------------------------
+
+# Bump when process_transactions() or the company mapping changes so cached text gets re-parsed
+PARSER_VERSION = 1
+
+_inflight = {}  # sha256 -> threading.Event for files currently being OCR'd
+_inflight_lock = threading.Lock()
+
+
+def ocr_file(file_path, progress_callback=None):
+    """OCR a single image or PDF file and return the extracted transaction text."""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif']:
+        return process_image_file(file_path, progress_callback)
+    elif file_ext == '.pdf':
+        return process_pdf_file(file_path, progress_callback)
+    print(f"Unsupported file type: {file_path}")
+    return ""
+
+
+def process_statement_file(file_path, progress_callback=None, use_cache=True):
+    """
+    OCR + parse a single statement file, reusing the result cached under its content hash.
+    Returns (record, cached) where record is {"sha256", "source", "text", "result", ...}
+    and result is the process_transactions() output (None when no text was extracted).
+    Concurrent calls for the same content wait for the first one instead of OCR'ing twice.
+    """
+    name = os.path.basename(file_path)
+    digest = hash_file_cached(file_path)
+
+    while True:
+        if use_cache:
+            record = load_cached(digest)
+            if record is not None:
+                if record.get("parser_version") != PARSER_VERSION:
+                    text = record.get("text") or ""
+                    record["result"] = process_transactions(text, name, progress_callback) if text else None
+                    record["parser_version"] = PARSER_VERSION
+                    record = store_cached(digest, record)
+                return record, True
+
+        with _inflight_lock:
+            event = _inflight.get(digest)
+            owner = event is None
+            if owner:
+                event = _inflight[digest] = threading.Event()
+
+        if owner:
+            break
+        # Someone else (e.g. the upload pre-processor) is OCR'ing this content: wait and re-check the cache
+        event.wait()
+
+    try:
+        text = ocr_file(file_path, progress_callback)
+        record = {
+            "sha256": digest,
+            "source": name,
+            "text": text,
+            "parser_version": PARSER_VERSION,
+            "result": process_transactions(text, name, progress_callback) if text else None,
+        }
+        # Empty text usually means OCR failed (e.g. tesseract missing), so don't pin that in the cache
+        if text and use_cache:
+            record = store_cached(digest, record)
+        return record, False
+    finally:
+        with _inflight_lock:
+            _inflight.pop(digest, None)
+        event.set()
+
+
 # ----------------------------
 # Transaction parsing / JSON conversion
 # ----------------------------
 
+_MONEY_STRIP_RE = re.compile(r'[^\d\.\-]')
+
+
 def money_to_float(money_str):
     """Convert a money string like '£4,500.25' or '4,500.25' to float 4500.25"""
     if not money_str:
         return 0.0
     try:
         # strip currency symbol, whitespace, and commas
-        cleaned = re.sub(r'[^\d\.\-]', '', str(money_str))
+        cleaned = _MONEY_STRIP_RE.sub('', str(money_str))
         # handle empty or just '-' gracefully
         if cleaned in ("", "-", ".", "-."):
             return 0.0
@@ -332,8 +560,8 @@ def parse_transactions(transaction_list):
         r'(\d{2}-\d{2}-\d{4})\s+'            # date of transaction
         r'(\d+\.?)\s+'                       # card id (digits, optionally trailing dot)
         r'(.+?)\s+'                          # transaction details (non-greedy)
-        r'(\£\d{1,3}(?:,\d{3})*\.\d{2}|\£\d+\.\d{2})\s+'  # amount
-        r'(\£\d{1,3}(?:,\d{3})*\.\d{2}|\£\d+\.\d{2})',    # balance
+        rf'({MONEY_PATTERN})\s+'            # amount
+        rf'({MONEY_PATTERN})',               # balance
         flags=re.UNICODE
     )
 
@@ -380,10 +608,11 @@ def convert_to_json(transaction_data):
     return json_list
 
 
+@lru_cache(maxsize=8192)
 def parse_date_safe(date_str):
     """
     Try to parse a date string which can be either MM-DD-YYYY or DD-MM-YYYY.
-    Returns a datetime.date or None.
+    Returns a datetime.date or None. Memoized: statements repeat the same few hundred dates.
     """
     if not date_str:
         return None
@@ -395,8 +624,9 @@ def parse_date_safe(date_str):
     return None
 
 
-def process_transactions(raw_text, filename=""):
+def process_transactions(raw_text, filename="", progress_callback=None):
     """Process transaction text and return JSON result with money totals"""
+    started = time.monotonic()
     lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
 
     # Optional: if the first line is a header that doesn't start with a date, drop it
@@ -481,6 +711,9 @@ def process_transactions(raw_text, filename=""):
                 company_type = companies_normalized[lookup]
         dictionary["company-type"] = company_type
 
+    _emit(progress_callback, "parse", file=filename, transactions=len(json_result),
+          parse_seconds=round(time.monotonic() - started, 3))
+
     return {
         "transactions": json_result,
         "summary": {
@@ -517,30 +750,99 @@ def trim_transaction(txn):
     }
 
 
+# ----------------------------
+# Helper: dropping transactions repeated across overlapping / re-uploaded statements
+# ----------------------------
+_MERCHANT_KEY_RE = re.compile(r'[^a-z0-9]+')
+
+
+def transaction_key(txn):
+    """Identity of a statement line: (date, normalized merchant, amount, running balance, card-type)."""
+    raw_date = txn.get("date-of-transaction", "") or txn.get("date-processed", "")
+    d = parse_date_safe(raw_date)
+    balance = txn.get("balance", "")
+    return (
+        d.toordinal() if d else raw_date,
+        _MERCHANT_KEY_RE.sub('', (txn.get("company-name") or "").lower()),
+        round(money_to_float(txn.get("amount", "")), 2),
+        round(money_to_float(balance), 2) if balance else None,
+        (txn.get("card-type") or "").lower(),
+    )
+
+
+def dedupe_transactions(groups):
+    """
+    Merge per-file transaction lists, dropping lines already seen in another file.
+    One hashed pass: a key is kept as many times as it occurs in the single file that
+    has it most often, so identical purchases within one statement survive while a
+    re-uploaded or overlapping statement adds nothing twice.
+    Returns (merged transactions, duplicates removed).
+    """
+    kept = {}
+    merged = []
+    removed = 0
+    for transactions in groups:
+        seen_here = {}
+        for txn in transactions:
+            key = transaction_key(txn)
+            n = seen_here[key] = seen_here.get(key, 0) + 1
+            if n > kept.get(key, 0):
+                kept[key] = n
+                merged.append(txn)
+            else:
+                removed += 1
+    return merged, removed
+
+
 # ----------------------------
 # Main runner which replaces the old separate script
 # ----------------------------
 
-def run_json_text():
-    # Process all files in the credit/ and debit/ folders
-    all_results = character_recognition()
+def run_json_text(progress_callback=None):
+    """
+    Run OCR + parsing over the credit/ and debit/ folders and write all output JSON files.
+    progress_callback (optional) receives "progress" event dicts for every file, page,
+    parse step and output write (see ProgressTracker).
+    The outputs are published together when the run finishes (see output_writer.OutputBatch);
+    files whose content didn't change are not rewritten. The "write" and "done" events are
+    sent once the files are published, so a client reacting to them reads the new outputs.
+    """
+    with OutputBatch():
+        return _run_json_text(progress_callback)
+
+
+def _run_json_text(progress_callback=None):
+    progress_callback = _as_tracker(progress_callback)
+
+    # Process all files in the credit/ and debit/ folders (cached per content hash,
+    # so files pre-processed at upload time are only merged here)
+    all_records = _recognize_sources(progress_callback)
 
-    # Create output directory
     script_directory = os.path.dirname(os.path.abspath(__file__))
-    output_directory = os.path.join(script_directory, "output")
+    return write_outputs(all_records, os.path.join(script_directory, "output"), progress_callback)
+
+
+def write_outputs(all_records, output_directory, progress_callback=None):
+    """
+    Merge {"<credit|debit>/<filename>": cache record or None} into output_directory: the
+    per-file, category, combined, per_file_results, rollups and recurring outputs.
+    The folder part of each key sets the transactions' card-type.
+    Returns the combined output plus the recurring charges.
+    """
+    progress_callback = _as_tracker(progress_callback)
     os.makedirs(output_directory, exist_ok=True)
 
     final_results = {}
-    merged_transactions = []
+    file_groups = []
     total_money_in = 0.0
     total_money_out = 0.0
 
-    for filename_key, raw_text in all_results.items():
+    for filename_key, record in all_records.items():
         print(f"\n{'='*50}")
         print(f"PROCESSING: {filename_key}")
         print(f"{'='*50}")
 
-        if not raw_text:
+        if not record or not record.get("text") or record.get("result") is None:
             print(f"No text extracted from {filename_key}")
             final_results[filename_key] = {"error": "No text extracted", "transactions": []}
             continue
@@ -555,7 +857,7 @@ def run_json_text():
             else:
                 card_type = None
 
-            result = process_transactions(raw_text, filename_key)
+            result = record["result"]
 
             # Ensure every transaction from this file gets the card-type
             if card_type:
@@ -564,7 +866,7 @@ def run_json_text():
 
             final_results[filename_key] = result
 
-            print(json.dumps(result["transactions"], indent=2))
+            print(f"Parsed {len(result.get('transactions', []))} transactions")
             print(f"\nSummary for {filename_key}:")
             print(f"Money in: £{result['summary']['money_in']}")
             print(f"Money out: £{result['summary']['money_out']}")
@@ -578,13 +880,13 @@ def run_json_text():
                 "transactions": [trim_transaction(t) for t in result.get("transactions", [])]
             }
 
-            with open(output_path, 'w') as f:
-                json.dump(trimmed_for_file, f, indent=2)
+            write_json(output_path, trimmed_for_file)
 
             print(f"Saved trimmed results to {output_path}")
+            after_publish(_emit, progress_callback, "write", file=filename_key, path=output_filename)
 
-            # Merge transactions (keep the full txn objects for category/summary computation)
-            merged_transactions.extend(result.get("transactions", []))
+            # Collect per-file transactions (full txn objects) for the dedup + merge below
+            file_groups.append(result.get("transactions", []))
             total_money_in += result.get("summary", {}).get("money_in", 0.0)
             total_money_out += result.get("summary", {}).get("money_out", 0.0)
 
@@ -592,6 +894,20 @@ def run_json_text():
             print(f"Error processing {filename_key}: {str(e)}")
             final_results[filename_key] = {"error": str(e), "transactions": []}
 
+    # Merge, dropping lines repeated across re-uploaded / overlapping statements
+    merged_transactions, duplicates_removed = dedupe_transactions(file_groups)
+    if duplicates_removed:
+        print(f"Removed {duplicates_removed} duplicate transactions across statements")
+
+    # imported here: recurring/rollups -> spending -> text_to_json would be circular at module load
+    try:
+        from characterRecognition.recurring import detect_recurring, write_recurring
+        from characterRecognition.rollups import RollupAccumulator
+    except Exception:
+        from recurring import detect_recurring, write_recurring
+        from rollups import RollupAccumulator
+    rollups = RollupAccumulator()
+
     # Sorting merged transactions
     def sort_key(txn):
         dp = parse_date_safe(txn.get("date-processed", ""))
@@ -637,6 +953,9 @@ def run_json_text():
         # append trimmed transaction to category list
         categories[cat].append(trim_transaction(txn))
 
+        # daily/weekly/monthly spend per category and card type for the charts
+        rollups.add(txn)
+
     categories_dir = os.path.join(output_directory, "categories")
     os.makedirs(categories_dir, exist_ok=True)
 
@@ -652,39 +971,59 @@ def run_json_text():
         }
         cat_filename = f"{cat.replace(' ', '_')}.json"
         cat_path = os.path.join(categories_dir, cat_filename)
-        with open(cat_path, 'w') as f:
-            json.dump(file_obj, f, indent=2)
+        write_json(cat_path, file_obj)
         print(f"Saved category '{cat}' -> {cat_path}")
+        after_publish(_emit, progress_callback, "write", path=os.path.join("categories", cat_filename))
 
     index_obj = {
         "created_at": datetime.utcnow().isoformat() + "Z",
         "files": {cat: os.path.join("categories", f"{cat.replace(' ', '_')}.json") for cat in desired_categories}
     }
     index_path = os.path.join(output_directory, "categories_index.json")
-    with open(index_path, 'w') as f:
-        json.dump(index_obj, f, indent=2)
+    write_json(index_path, index_obj, ignore_keys=("created_at",))
     print(f"Saved categories index -> {index_path}")
+    after_publish(_emit, progress_callback, "write", path="categories_index.json")
 
     # ----------------- Create the final combined trimmed output -----------------
     trimmed_merged = [trim_transaction(t) for t in merged_transactions]
 
     combined_output = {
-        "transactions": trimmed_merged
+        "transactions": trimmed_merged,
+        "summary": {
+            "transactions": len(trimmed_merged),
+            "duplicates_removed": duplicates_removed
+        }
     }
 
     combined_output_path = os.path.join(output_directory, "all_transactions.json")
-    with open(combined_output_path, 'w') as f:
-        json.dump(combined_output, f, indent=2)
+    write_json(combined_output_path, combined_output)
 
     print(f"\nCombined trimmed results saved to {combined_output_path}")
+    after_publish(_emit, progress_callback, "write", path="all_transactions.json")
+
+    # Streamed one transaction at a time, for consumers that shouldn't parse one huge document
+    ndjson_path = os.path.join(output_directory, "all_transactions.ndjson")
+    write_ndjson(ndjson_path, (trim_transaction(t) for t in merged_transactions))
+    print(f"Combined trimmed results streamed to {ndjson_path}")
+    after_publish(_emit, progress_callback, "write", path="all_transactions.ndjson")
 
-    # Also save the per_file_results (keeps previous structure for debugging)
-    per_file_output_path = os.path.join(output_directory, "per_file_results.json")
-    with open(per_file_output_path, 'w') as f:
-        json.dump(final_results, f, indent=2)
+    # Also save the per_file_results (full records; internal artifact read by the chat/insights/store modules)
+    per_file_output_path = write_internal(output_directory, "per_file_results", final_results)
     print(f"Per-file raw results saved to {per_file_output_path}")
+    after_publish(_emit, progress_callback, "write", path=os.path.basename(per_file_output_path))
+
+    rollups_path = rollups.write(output_directory)
+    print(f"Saved spending rollups -> {rollups_path}")
+    after_publish(_emit, progress_callback, "write", path="rollups.json")
+
+    # ----------------- Recurring charges (subscriptions, direct debits) -----------------
+    recurring = detect_recurring(merged_transactions)
+    recurring_path = write_recurring(recurring, output_directory)
+    print(f"Found {len(recurring)} recurring charges -> {recurring_path}")
+    after_publish(_emit, progress_callback, "write", path="recurring.json")
+    after_publish(_emit, progress_callback, "done", transactions=len(trimmed_merged))
 
-    return combined_output
+    return {**combined_output, "recurring": recurring}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+"""
+transaction_index.py
+
+Lightweight in-memory index over the user's transactions, used to pick only the rows a
+chat question is about ("what did I spend at Starbucks in March?") instead of sending
+the whole history to the model.
+
+Index structures:
+  - inverted index: merchant/category token -> set of row ids
+  - rows sorted by date (bisect for date windows)
+  - rows sorted by amount (bisect for "over £50" / "under £20" / "between £10 and £20")
+
+search() parses merchant tokens, categories, a time window and an amount range out of the
+question, intersects the matching id sets (smallest first) and returns the newest matches
+plus the count/total over all matches.
+"""
+
+import os
+import re
+import threading
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+try:
+    from characterRecognition.spending import (
+        CANONICAL_CATEGORIES, OUTPUT_DIR, canonical_category, is_opening_balance, is_spend,
+        txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+except Exception:
+    from spending import (
+        CANONICAL_CATEGORIES, OUTPUT_DIR, canonical_category, is_opening_balance, is_spend,
+        txn_amount, txn_date, load_full_transactions, per_file_results_path,
+    )
+
+MAX_ROWS = 25
+
+_TOKEN_RE = re.compile(r"[a-z0-9&']+")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "on", "in", "at", "to", "for", "from", "by", "with", "my", "me",
+    "i", "we", "you", "it", "is", "was", "were", "are", "be", "do", "did", "does", "how", "much", "many",
+    "what", "when", "where", "which", "who", "spend", "spent", "spending", "pay", "paid", "buy", "bought",
+    "cost", "money", "total", "all", "any", "this", "that", "last", "month", "months", "year", "week",
+    "days", "day", "than", "more", "less", "over", "under", "between", "above", "below", "payment",
+    "can", "should", "could", "would", "your", "our", "their", "there", "about", "so", "far", "ago", "s",
+}
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_CATEGORY_SYNONYMS = {
+    "eating out": "Eating Out", "restaurant": "Eating Out", "restaurants": "Eating Out", "takeaway": "Eating Out",
+    "takeaways": "Eating Out", "food": "Eating Out",
+    "travel": "Travel", "transport": "Travel",
+    "bills": "Bills", "utilities": "Bills",
+    "shopping": "Shopping", "groceries": "Shopping",
+    "entertainment": "Entertainment", "subscriptions": "Entertainment",
+    "recurring debts": "Recurring Debts", "debts": "Recurring Debts", "loans": "Recurring Debts",
+    "everything else": "Everything Else",
+}
+_AMOUNT = r"£?\s*(\d+(?:,\d{3})*(?:\.\d{1,2})?)"
+_BETWEEN_RE = re.compile(rf"between\s+{_AMOUNT}\s+and\s+{_AMOUNT}")
+_OVER_RE = re.compile(rf"(?:over|more than|above|at least|greater than)\s+{_AMOUNT}")
+_UNDER_RE = re.compile(rf"(?:under|less than|below|at most|cheaper than)\s+{_AMOUNT}")
+_LAST_N_RE = re.compile(r"(?:last|past)\s+(\d+)\s+(day|week|month)s?")
+# a year is a bare 20xx, not an amount like "£2000" or "2000.50"
+_YEAR_RE = re.compile(r"(?<![£$\d.,])\b(20\d{2})\b(?![.,]\d)")
+# "last N days": longer windows than this are clamped (and would overflow date arithmetic)
+_MAX_LAST_N = {"day": 36500, "week": 5200, "month": 1200}
+_DATE_RE = re.compile(r"\b(\d{2})-(\d{2})-(\d{4})\b")
+_MAY_MONTH_RE = re.compile(r"\b(?:in|during|of|since|until|for)\s+may\b|\bmay\s+20\d{2}\b")  # "may" is usually a verb
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _num(s):
+    return float(s.replace(",", ""))
+
+
+def _month_end(year, month):
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _shift_month(d, months):
+    idx = d.year * 12 + d.month - 1 + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+class TransactionIndex:
+    def __init__(self, transactions):
+        self.rows = []
+        self.tokens = {}
+        self.merchant_vocab = set()
+        dated = []
+        for txn in transactions:
+            if is_opening_balance(txn):
+                continue
+            d = txn_date(txn)
+            row = {
+                "date": d.isoformat() if d else "",
+                "merchant": (txn.get("company-name") or "").strip(),
+                "amount": round(txn_amount(txn), 2),
+                "category": canonical_category(txn.get("company-type")),
+                "card": (txn.get("card-type") or "").lower(),
+                "spend": is_spend(txn),
+            }
+            rid = len(self.rows)
+            self.rows.append(row)
+            for tok in set(_tokens(row["merchant"])):
+                if tok not in _STOPWORDS:
+                    self.tokens.setdefault(tok, set()).add(rid)
+                    self.merchant_vocab.add(tok)
+            self.tokens.setdefault("category:" + row["category"], set()).add(rid)
+            if d is not None:
+                dated.append((d.toordinal(), rid))
+
+        dated.sort()
+        self._date_keys = [k for k, _ in dated]
+        self._date_ids = [rid for _, rid in dated]
+        by_amount = sorted((row["amount"], rid) for rid, row in enumerate(self.rows))
+        self._amount_keys = [k for k, _ in by_amount]
+        self._amount_ids = [rid for _, rid in by_amount]
+        self.latest = date.fromordinal(self._date_keys[-1]) if self._date_keys else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ---------------- query parsing ----------------
+
+    def parse_question(self, question, today=None):
+        """Extract {merchants, categories, date_from, date_to, min_amount, max_amount} from a question."""
+        q = (question or "").lower()
+        today = today or self.latest or date.today()
+        words = _tokens(q)
+        filters = {}
+
+        merchants = [w for w in words if w in self.merchant_vocab and w not in _STOPWORDS]
+        if merchants:
+            filters["merchants"] = sorted(set(merchants))
+
+        categories = {c for phrase, c in _CATEGORY_SYNONYMS.items() if re.search(rf"\b{phrase}\b", q)}
+        categories.update(c for c in CANONICAL_CATEGORIES if c.lower() in q)
+        if categories:
+            filters["categories"] = sorted(categories)
+
+        # time window
+        m = _DATE_RE.search(q)
+        # digits already read as an amount ("over 2000") aren't a year either
+        amount_spans = [m.span(g) for rx in (_BETWEEN_RE, _OVER_RE, _UNDER_RE)
+                        for m in rx.finditer(q) for g in range(1, rx.groups + 1)]
+        years = [int(y.group(1)) for y in _YEAR_RE.finditer(q)
+                 if not any(s <= y.start(1) < e for s, e in amount_spans)]
+        months = [_MONTHS[w] for w in words if w in _MONTHS and (w != "may" or _MAY_MONTH_RE.search(q))]
+        last_n = _LAST_N_RE.search(q)
+        if m:
+            d = next((x for x in (_safe_date(m.group(3), m.group(2), m.group(1)),
+                                  _safe_date(m.group(3), m.group(1), m.group(2))) if x), None)
+            if d:
+                filters["date_from"] = filters["date_to"] = d
+        elif months:
+            year = years[0] if years else (today.year if months[0] <= today.month else today.year - 1)
+            filters["date_from"] = date(year, min(months), 1)
+            filters["date_to"] = _month_end(year, max(months))
+        elif last_n:
+            unit = last_n.group(2)
+            n = min(int(last_n.group(1)), _MAX_LAST_N[unit])
+            span = {"day": timedelta(days=n), "week": timedelta(weeks=n)}.get(unit)
+            filters["date_from"] = today - span if span else _shift_month(today.replace(day=1), -n)
+            filters["date_to"] = today
+        elif "last month" in q:
+            start = _shift_month(today.replace(day=1), -1)
+            filters["date_from"], filters["date_to"] = start, _month_end(start.year, start.month)
+        elif "this month" in q:
+            filters["date_from"], filters["date_to"] = today.replace(day=1), today
+        elif "last week" in q or "this week" in q:
+            filters["date_from"], filters["date_to"] = today - timedelta(days=7), today
+        elif years:
+            filters["date_from"], filters["date_to"] = date(min(years), 1, 1), date(max(years), 12, 31)
+
+        # amount range
+        b = _BETWEEN_RE.search(q)
+        if b:
+            lo, hi = sorted((_num(b.group(1)), _num(b.group(2))))
+            filters["min_amount"], filters["max_amount"] = lo, hi
+        else:
+            o = _OVER_RE.search(q)
+            u = _UNDER_RE.search(q)
+            if o:
+                filters["min_amount"] = _num(o.group(1))
+            if u:
+                filters["max_amount"] = _num(u.group(1))
+        return filters
+
+    # ---------------- lookup ----------------
+
+    def _date_range_ids(self, date_from, date_to):
+        lo = bisect_left(self._date_keys, date_from.toordinal()) if date_from else 0
+        hi = bisect_right(self._date_keys, date_to.toordinal()) if date_to else len(self._date_keys)
+        return set(self._date_ids[lo:hi])
+
+    def _amount_range_ids(self, min_amount, max_amount):
+        lo = bisect_left(self._amount_keys, min_amount) if min_amount is not None else 0
+        hi = bisect_right(self._amount_keys, max_amount) if max_amount is not None else len(self._amount_keys)
+        return set(self._amount_ids[lo:hi])
+
+    def query(self, filters):
+        """Row ids matching all filters (merchant tokens are OR'ed together)."""
+        sets = []
+        if filters.get("merchants"):
+            sets.append(set().union(*(self.tokens.get(t, set()) for t in filters["merchants"])))
+        if filters.get("categories"):
+            sets.append(set().union(*(self.tokens.get("category:" + c, set()) for c in filters["categories"])))
+        if filters.get("date_from") or filters.get("date_to"):
+            sets.append(self._date_range_ids(filters.get("date_from"), filters.get("date_to")))
+        if filters.get("min_amount") is not None or filters.get("max_amount") is not None:
+            sets.append(self._amount_range_ids(filters.get("min_amount"), filters.get("max_amount")))
+        if not sets:
+            return set()
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search(self, question, limit=MAX_ROWS, today=None):
+        """
+        Rows relevant to a chat question. Returns None if the question names no merchant,
+        category, time window or amount (the spending summary is enough then), else
+          {"filters": {...}, "count": n, "total_spend": x, "rows": [newest first, at most `limit`]}
+        """
+        filters = self.parse_question(question, today)
+        if not filters:
+            return None
+        ids = self.query(filters)
+        matched = [self.rows[i] for i in ids]
+        matched.sort(key=lambda r: r["date"], reverse=True)
+        return {
+            "filters": {k: (v.isoformat() if isinstance(v, date) else v) for k, v in filters.items()},
+            "count": len(matched),
+            "total_spend": round(sum(r["amount"] for r in matched if r["spend"]), 2),
+            "rows": [{k: v for k, v in r.items() if k != "spend"} for r in matched[:limit]],
+        }
+
+
+def _safe_date(year, month, day):
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+_index_cache = {}  # output_dir -> (per_file_results stat, TransactionIndex)
+_index_lock = threading.Lock()
+
+
+def get_transaction_index(output_dir=OUTPUT_DIR):
+    """Index over the processed data in output_dir, rebuilt only when per_file_results.json changes."""
+    path = per_file_results_path(output_dir)
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+    with _index_lock:
+        hit = _index_cache.get(output_dir)
+        if hit and hit[0] == stamp:
+            return hit[1]
+    index = TransactionIndex(load_full_transactions(output_dir) if stamp else [])
+    with _index_lock:
+        _index_cache[output_dir] = (stamp, index)
+    return index
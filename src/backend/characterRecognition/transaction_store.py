@@ -0,0 +1,251 @@
+"""
+transaction_store.py
+
+SQLite-backed store of the processed transactions for paged queries (/api/transactions),
+so the frontend no longer has to download all_transactions.json to show a table.
+
+The database (output/transactions.sqlite) is rebuilt from per_file_results.json whenever
+that file changes, into a temp file that then replaces the old one, so readers never see a
+half-built store. Indexes cover date, category, card type, merchant and amount, each with
+the row id as tie-breaker so keyset (cursor) pagination never re-sorts the whole history.
+
+Query filters: date_from/date_to (ISO), category (list), card, merchant (prefix of the
+normalized merchant name), min_amount/max_amount, spend_only.
+Sorts: date | amount | merchant, asc or desc. Cursors are opaque strings holding the last
+row's (sort value, id).
+"""
+
+import os
+import re
+import json
+import base64
+import sqlite3
+import threading
+
+try:
+    from characterRecognition.spending import (
+        OUTPUT_DIR, canonical_category, is_opening_balance, is_spend, txn_date, load_full_transactions,
+        per_file_results_path,
+    )
+    from characterRecognition.text_to_json import money_to_float
+except Exception:
+    from spending import (
+        OUTPUT_DIR, canonical_category, is_opening_balance, is_spend, txn_date, load_full_transactions,
+        per_file_results_path,
+    )
+    from text_to_json import money_to_float
+
+STORE_FILENAME = "transactions.sqlite"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+SORT_COLUMNS = {"date": "date", "amount": "amount", "merchant": "merchant_norm"}
+
+_SCHEMA = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    merchant TEXT NOT NULL,
+    merchant_norm TEXT NOT NULL,
+    amount REAL NOT NULL,
+    balance REAL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    card TEXT NOT NULL,
+    spend INTEGER NOT NULL
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# created after the bulk insert (much faster than maintaining them row by row)
+_INDEXES = """
+CREATE INDEX ix_date ON transactions (date, id);
+CREATE INDEX ix_category_date ON transactions (category, date, id);
+CREATE INDEX ix_card_date ON transactions (card, date, id);
+CREATE INDEX ix_merchant ON transactions (merchant_norm, id);
+CREATE INDEX ix_amount ON transactions (amount, id);
+"""
+
+_NORM_RE = re.compile(r"[^a-z0-9&]+")
+
+
+def normalize_merchant_name(name):
+    return _NORM_RE.sub(" ", (name or "").lower()).strip()
+
+
+def build_store(transactions, path, source_stamp=None):
+    """Write a fresh store for transactions at path (atomically replacing any existing one)."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # the temp file is thrown away on failure, so skip journaling/fsync while building
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_SCHEMA)
+        rows = []
+        for txn in transactions:
+            if is_opening_balance(txn):
+                continue
+            d = txn_date(txn)
+            merchant = (txn.get("company-name") or "").strip()
+            balance = txn.get("balance", "")
+            rows.append((
+                d.isoformat() if d else "",
+                merchant,
+                normalize_merchant_name(merchant),
+                round(abs(money_to_float(txn.get("amount", ""))), 2),
+                round(money_to_float(balance), 2) if balance else None,
+                txn.get("type", ""),
+                canonical_category(txn.get("company-type")),
+                (txn.get("card-type") or "").lower(),
+                1 if is_spend(txn) else 0,
+            ))
+        conn.executemany(
+            "INSERT INTO transactions (date, merchant, merchant_norm, amount, balance, type, category, card, spend)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executescript(_INDEXES)
+        conn.execute("INSERT INTO meta VALUES ('source_stamp', ?)", (json.dumps(source_stamp),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(sort value, id) from a cursor string. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class TransactionStore:
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        # read-only connection per query: cheap with SQLite and safe across Flask threads
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def query(self, date_from=None, date_to=None, categories=None, card=None, merchant=None,
+              min_amount=None, max_amount=None, spend_only=False, sort="date", order="desc",
+              limit=DEFAULT_PAGE_SIZE, cursor=None, include_total=False):
+        """
+        One page of transactions. Returns {"transactions": [...], "next_cursor": str|None, "count": n}
+        (+ "total" matches when include_total). Raises ValueError for bad sort/order/cursor values.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        column = SORT_COLUMNS[sort]
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+        where, params = [], []
+        if date_from:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("date <= ?")
+            params.append(date_to)
+        if categories:
+            cats = [canonical_category(c) for c in categories]
+            where.append(f"category IN ({', '.join('?' * len(cats))})")
+            params.extend(cats)
+        if card:
+            where.append("card = ?")
+            params.append(card.lower())
+        if merchant:
+            # prefix range on the normalized name, so the merchant index is used
+            prefix = normalize_merchant_name(merchant)
+            where.append("merchant_norm >= ? AND merchant_norm < ?")
+            params.extend([prefix, prefix + "\uffff"])
+        if min_amount is not None:
+            where.append("amount >= ?")
+            params.append(float(min_amount))
+        if max_amount is not None:
+            where.append("amount <= ?")
+            params.append(float(max_amount))
+        if spend_only:
+            where.append("spend = 1")
+        filter_where, filter_params = list(where), list(params)
+
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            where.append(f"({column}, id) {'<' if order == 'desc' else '>'} (?, ?)")
+            params.extend([last_value, last_id])
+
+        direction = "DESC" if order == "desc" else "ASC"
+        sql = (f"SELECT id, date, merchant, amount, balance, type, category, card, spend, {column} "
+               f"FROM transactions {'WHERE ' + ' AND '.join(where) if where else ''} "
+               f"ORDER BY {column} {direction}, id {direction} LIMIT ?")
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+            total = None
+            if include_total:
+                total = conn.execute(
+                    f"SELECT COUNT(*) FROM transactions {'WHERE ' + ' AND '.join(filter_where) if filter_where else ''}",
+                    filter_params).fetchone()[0]
+        finally:
+            conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page = [{
+            "id": r[0], "date": r[1], "merchant": r[2], "amount": r[3], "balance": r[4],
+            "type": r[5], "category": r[6], "card": r[7], "spend": bool(r[8]),
+        } for r in rows]
+        result = {
+            "transactions": page,
+            "next_cursor": encode_cursor(rows[-1][9], rows[-1][0]) if has_more else None,
+            "count": len(page),
+        }
+        if include_total:
+            result["total"] = total
+        return result
+
+
+_store_lock = threading.Lock()
+_store_stamps = {}  # output_dir -> per_file_results stat the store was built from
+
+
+def get_transaction_store(output_dir=OUTPUT_DIR):
+    """Store for the processed data in output_dir, rebuilt only when per_file_results.json changes."""
+    source = per_file_results_path(output_dir)
+    path = os.path.join(output_dir, STORE_FILENAME)
+    try:
+        st = os.stat(source)
+        stamp = [st.st_mtime_ns, st.st_size]
+    except FileNotFoundError:
+        stamp = None
+    with _store_lock:
+        if _store_stamps.get(output_dir) != stamp or not os.path.exists(path):
+            # a store left by an earlier run is reused if it was built from the same file
+            if _read_stamp(path) != stamp:
+                build_store(load_full_transactions(output_dir) if stamp else [], path, stamp)
+            _store_stamps[output_dir] = stamp
+    return TransactionStore(path)
+
+
+def _read_stamp(path):
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source_stamp'").fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else False
+    except sqlite3.Error:
+        return False
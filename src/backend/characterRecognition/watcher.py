@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+watcher.py
+
+Watch-folder ingestion: statements dropped into credit/ and debit/ by other systems are
+picked up and processed without anyone calling /api/process.
+
+Usage:
+    WATCH_FOLDERS=1 python app.py        # watcher thread inside the API, pushes to /api/events
+    python watcher.py                    # headless daemon (no API)
+
+Behavior:
+ - Uses inotify (`inotify_simple`, a Linux requirement) for close-write / moved-in events, else
+   polls the folders every POLL_SECONDS. Hidden names (upload temp files, .normalized/) and
+   unsupported extensions are ignored.
+ - Bursts are debounced: a batch is flushed once no new event arrived for DEBOUNCE_SECONDS
+   (and, when polling, the new files' sizes stopped changing).
+ - Only new arrivals are OCR'd (process_statement_file, content-hash cached); the merge that
+   follows (run_json_text) finds every other statement in the cache, so nothing is re-OCR'd.
+ - On start, files already in the folders whose content isn't cached yet are ingested too
+   (catch-up for files dropped while the watcher wasn't running).
+ - ignore(path) -> bool skips files that are handled elsewhere (the API passes the files that
+   arrived through its upload endpoints, which are pre-processed there).
+"""
+
+import os
+import time
+import argparse
+import threading
+from contextlib import nullcontext
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except Exception:
+    INotify = None
+    inotify_flags = None
+
+try:
+    from characterRecognition.file_cache import hash_file_cached, load_cached
+    from characterRecognition.dir_scan import is_statement_name, scan_dir
+except Exception:
+    from file_cache import hash_file_cached, load_cached
+    from dir_scan import is_statement_name, scan_dir
+
+DEBOUNCE_SECONDS = float(os.environ.get("WATCH_DEBOUNCE", "2.0"))
+POLL_SECONDS = float(os.environ.get("WATCH_POLL", "2.0"))
+
+
+def _snapshot(folders):
+    """{path: (folder label, size, mtime_ns)} for the statement files directly in each folder."""
+    # a fresh scan_dir (not the mtime-cached folder_manifest): sizes of files still being written matter here
+    snap = {}
+    for label, folder in folders.items():
+        for name, (size, mtime) in scan_dir(folder).items():
+            snap[os.path.join(folder, name)] = (label, size, mtime)
+    return snap
+
+
+class FolderWatcher:
+    """
+    Calls on_batch([(folder label, path), ...]) from a background thread with each debounced
+    batch of newly arrived files. folders: {"credit": path, "debit": path}.
+    """
+
+    def __init__(self, folders, on_batch, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_SECONDS, catch_up=True,
+                 ignore=None):
+        self.folders = {label: os.path.abspath(str(path)) for label, path in folders.items()}
+        self.on_batch = on_batch
+        self.ignore = ignore
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.catch_up = catch_up
+        self.mode = "inotify" if INotify is not None else "polling"
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        self._watches = {}
+
+    def start(self):
+        if self.mode == "inotify":
+            # watches are added before start() returns, so no file dropped afterwards is missed
+            self._inotify = INotify()
+            mask = inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+            self._watches = {self._inotify.add_watch(folder, mask): (label, folder)
+                             for label, folder in self.folders.items()}
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        print(f"Watching {', '.join(self.folders.values())} ({self.mode})")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _flush(self, pending):
+        batch = [(label, path) for path, label in sorted(pending.items())
+                 if os.path.exists(path) and not (self.ignore and self.ignore(path))]
+        pending.clear()
+        if not batch:
+            return
+        try:
+            self.on_batch(batch)
+        except Exception as e:
+            print(f"Watcher: ingest of {len(batch)} files failed: {e}")
+
+    def _initial(self):
+        snap = _snapshot(self.folders)
+        pending = {}
+        if self.catch_up:
+            for path, (label, _, _) in snap.items():
+                try:
+                    if load_cached(hash_file_cached(path)) is None:
+                        pending[path] = label
+                except OSError:
+                    continue
+        return snap, pending
+
+    def _run(self):
+        try:
+            if self.mode == "inotify":
+                self._run_inotify()
+            else:
+                self._run_polling()
+        except Exception as e:
+            print(f"Watcher stopped: {e}")
+
+    def _run_inotify(self):
+        inotify, labels = self._inotify, self._watches
+        _, pending = self._initial()
+        self._flush(pending)
+        try:
+            while not self._stop.is_set():
+                # block until the first event, then keep collecting until the burst goes quiet
+                events = inotify.read(timeout=int(self.debounce * 1000))
+                for event in events:
+                    if event.wd in labels and is_statement_name(event.name):
+                        label, folder = labels[event.wd]
+                        pending[os.path.join(folder, event.name)] = label
+                if not events and pending:
+                    self._flush(pending)
+        finally:
+            inotify.close()
+
+    def _run_polling(self):
+        known, pending = self._initial()
+        self._flush(pending)
+        sizes = {}  # new path -> (size, mtime) at the last poll, to wait for writes to finish
+        quiet_since = time.monotonic()
+        while not self._stop.wait(self.poll_interval):
+            snap = _snapshot(self.folders)
+            for path, (label, size, mtime) in snap.items():
+                if known.get(path) == (label, size, mtime):
+                    continue
+                if sizes.get(path) != (size, mtime):
+                    sizes[path] = (size, mtime)
+                    pending[path] = label
+                    quiet_since = time.monotonic()
+            if pending and time.monotonic() - quiet_since >= self.debounce:
+                for path in pending:
+                    known[path] = snap.get(path)
+                    sizes.pop(path, None)
+                self._flush(pending)
+            # forget deleted files so a re-upload under the same name counts as new
+            for path in [p for p in known if p not in snap]:
+                del known[path]
+
+
+def ingest_batch(batch, pipeline_lock=None, progress_callback=None):
+    """
+    OCR the new files, then re-merge all outputs (every other statement is a cache hit).
+    Returns the run_json_text result.
+    """
+    try:
+        from characterRecognition.text_to_json import process_statement_file, run_json_text
+    except Exception:
+        from text_to_json import process_statement_file, run_json_text
+
+    started = time.monotonic()
+    for label, path in batch:
+        try:
+            _, cached = process_statement_file(path)
+            print(f"Watcher: {label}/{os.path.basename(path)} {'cached' if cached else 'processed'}")
+        except Exception as e:
+            print(f"Watcher: error processing {path}: {e}")
+    with pipeline_lock or nullcontext():
+        combined = run_json_text(progress_callback=progress_callback)
+    print(f"Watcher: ingested {len(batch)} files in {time.monotonic() - started:.1f}s")
+    return combined
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process statements dropped into the credit/ and debit/ folders.")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="Quiet period before a batch runs (s).")
+    args = parser.parse_args()
+
+    # the same folders the API saves uploads to and run_json_text reads
+    base = os.path.dirname(os.path.abspath(__file__))
+    folders = {"credit": os.path.join(base, "credit"), "debit": os.path.join(base, "debit")}
+    watcher = FolderWatcher(folders, ingest_batch, debounce=args.debounce)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
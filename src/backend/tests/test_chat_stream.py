@@ -0,0 +1,85 @@
+"""
+/api/chat/stream against the offline FakeBackend (no network, no API key).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+import json
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition import app as app_module
+from characterRecognition import llm_backend
+from characterRecognition.llm_backend import FakeBackend, set_backend
+
+
+def _events(chunks):
+    """Parse SSE frames from an iterable of response chunks into (event, data) pairs."""
+    buf = ""
+    for chunk in chunks:
+        buf += chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buf:
+            frame, buf = buf.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line)
+            yield fields.get("event"), json.loads(fields["data"])
+
+
+def _question():
+    # a fresh message every time, so the chat response cache never answers it
+    return f"how much did I spend on travel? {uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def client():
+    previous = llm_backend._backend
+    yield app_module.app.test_client()
+    set_backend(previous)
+
+
+def test_stream_events_in_order(client):
+    set_backend(FakeBackend(delay=0))
+    question = _question()
+    resp = client.post("/api/chat/stream", json={"message": question})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"].startswith("text/event-stream")
+
+    events = list(_events(resp.response))
+    names = [name for name, _ in events]
+    assert names[0] == "started"
+    assert names[-1] == "completed"
+    assert set(names[1:-1]) == {"chunk"}
+
+    reply = "".join(data["text"] for name, data in events if name == "chunk").strip()
+    assert reply == events[-1][1]["reply"]
+    assert reply == f"Local test reply to: {question}"
+
+
+def test_cancel_stops_the_stream(client):
+    set_backend(FakeBackend(delay=0.05))
+    resp = client.post("/api/chat/stream", json={"message": _question()})
+    events = _events(resp.response)
+
+    name, data = next(events)
+    assert name == "started"
+    cancel = client.post(f"/api/chat/stream/{data['streamId']}/cancel")
+    assert cancel.status_code == 200
+
+    names = [name for name, _ in events]
+    assert names[-1] == "cancelled"
+    assert "completed" not in names
+    # the stream is forgotten once it ended
+    assert client.post(f"/api/chat/stream/{data['streamId']}/cancel").status_code == 404
+
+
+def test_backend_error_becomes_error_event(client):
+    set_backend(FakeBackend(delay=0, failure_rate=1.0))
+    resp = client.post("/api/chat/stream", json={"message": _question()})
+
+    events = list(_events(resp.response))
+    assert [name for name, _ in events] == ["started", "error"]
+    assert events[-1][1]["error"]
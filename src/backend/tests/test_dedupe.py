@@ -0,0 +1,55 @@
+"""
+Merging per-file transactions (text_to_json.dedupe_transactions).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition.text_to_json import dedupe_transactions, transaction_key
+
+
+def _txn(company="TESCO STORES", amount="£4.20", date="02-03-2025", balance="", card="debit"):
+    return {"date-of-transaction": date, "company-name": company, "amount": amount,
+            "balance": balance, "card-type": card}
+
+
+def test_line_repeated_across_files_is_kept_once():
+    coffee, rent = _txn("COSTA"), _txn("LANDLORD", "£900.00")
+    merged, removed = dedupe_transactions([[coffee, rent], [dict(coffee), dict(rent)]])
+    assert merged == [coffee, rent]
+    assert removed == 2
+
+
+def test_identical_purchases_within_one_file_are_kept():
+    coffee = _txn("COSTA")
+    merged, removed = dedupe_transactions([[coffee, dict(coffee), dict(coffee)]])
+    assert len(merged) == 3
+    assert removed == 0
+
+
+def test_count_is_the_most_any_single_file_has():
+    coffee = _txn("COSTA")
+    # an overlapping statement has the same purchase once, a later one has it three times
+    merged, removed = dedupe_transactions([[coffee, dict(coffee)], [dict(coffee)], [dict(coffee)] * 3])
+    assert len(merged) == 3
+    assert removed == 3
+
+
+def test_key_ignores_formatting_differences():
+    a = _txn("Tesco Stores", "£4.20", "02-03-2025")
+    b = _txn("TESCO-STORES ", "4.2", "2-3-2025")
+    assert transaction_key(a) == transaction_key(b)
+    assert dedupe_transactions([[a], [b]]) == ([a], 1)
+
+
+def test_different_lines_are_not_merged():
+    base = _txn()
+    others = [_txn(amount="£4.21"), _txn(date="02-04-2025"), _txn(card="credit"),
+              _txn(balance="£100.00"), _txn(company="SAINSBURYS")]
+    merged, removed = dedupe_transactions([[base], others])
+    assert len(merged) == 6
+    assert removed == 0
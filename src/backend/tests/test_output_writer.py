@@ -0,0 +1,92 @@
+"""
+Atomic, change-aware output writes (output_writer.write_json / OutputBatch).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition.output_writer import OutputBatch, after_publish, write_json
+
+RECORDS = {"transactions": [{"company-name": "TESCO", "amount": 12.5}] * 40}
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def _temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_unchanged_write_leaves_files_alone(tmp_path):
+    path = str(tmp_path / "out.json")
+    write_json(path, RECORDS)
+    assert os.path.exists(path + ".gz")
+    stamps = {p: os.stat(p).st_mtime_ns for p in (path, path + ".gz")}
+
+    with OutputBatch() as batch:
+        write_json(path, RECORDS)
+    assert (batch.written, batch.unchanged) == (0, 1)
+    assert {p: os.stat(p).st_mtime_ns for p in stamps} == stamps
+    assert _temp_files(tmp_path) == []
+
+
+def test_ignore_keys_alone_are_not_a_change(tmp_path):
+    path = str(tmp_path / "out.json")
+    write_json(path, dict(RECORDS, created_at="2026-01-01"))
+    with OutputBatch() as batch:
+        write_json(path, dict(RECORDS, created_at="2026-02-01"), ignore_keys=("created_at",))
+    assert batch.unchanged == 1
+    assert _read(path)["created_at"] == "2026-01-01"
+
+    with OutputBatch() as batch:
+        write_json(path, {"transactions": [], "created_at": "2026-03-01"}, ignore_keys=("created_at",))
+    assert batch.written == 1
+    assert _read(path) == {"transactions": [], "created_at": "2026-03-01"}
+
+
+def test_batch_publishes_on_exit(tmp_path):
+    path = str(tmp_path / "out.json")
+    write_json(path, {"version": 1})
+    with OutputBatch() as batch:
+        write_json(path, {"version": 2})
+        # readers still see the old file until the block exits
+        assert _read(path) == {"version": 1}
+    assert batch.written == 1
+    assert _read(path) == {"version": 2}
+    assert _temp_files(tmp_path) == []
+
+
+def test_batch_discards_writes_on_error(tmp_path):
+    path = str(tmp_path / "out.json")
+    write_json(path, {"version": 1})
+    with pytest.raises(RuntimeError):
+        with OutputBatch():
+            write_json(path, {"version": 2})
+            write_json(str(tmp_path / "new.json"), {"version": 2})
+            raise RuntimeError("pipeline failed")
+    assert _read(path) == {"version": 1}
+    assert not os.path.exists(tmp_path / "new.json")
+    assert _temp_files(tmp_path) == []
+
+
+def test_after_publish_runs_once_files_are_visible(tmp_path):
+    path = str(tmp_path / "out.json")
+    seen = []
+    with OutputBatch():
+        write_json(path, {"version": 1})
+        after_publish(lambda: seen.append(os.path.exists(path)))
+        assert seen == []
+    assert seen == [True]
+
+    # outside a batch the callback runs immediately
+    after_publish(seen.append, "now")
+    assert seen == [True, "now"]
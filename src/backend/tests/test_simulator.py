@@ -0,0 +1,81 @@
+"""
+Savings goal what-if simulator (simulator.simulate and /api/simulate).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition import app as app_module
+from characterRecognition.simulator import simulate
+
+SPEND = {"Shopping": 400.0, "Travel": 200.0, "Recurring Debts": 900.0}
+
+
+def test_goal_cost_must_be_positive():
+    for cost in (0, -100):
+        with pytest.raises(ValueError):
+            simulate(SPEND, cost)
+
+
+def test_too_many_scenarios_is_refused():
+    # 5 levels over 3 categories = 125 plans
+    with pytest.raises(ValueError, match="125 scenarios"):
+        simulate(SPEND, 1000, max_scenarios=100)
+    assert simulate(SPEND, 1000, max_scenarios=125)["scenarios"] == 125
+
+
+def test_front_is_pareto_optimal():
+    result = simulate(SPEND, 5000, levels=[0.0, 0.1, 0.25, 0.5])
+    front = result["front"]
+    assert front
+    assert result["feasible"] == result["scenarios"] - 1  # cutting nothing never reaches the goal
+    # faster plans come first, and each later plan must buy a closer mix
+    for faster, slower in zip(front, front[1:]):
+        assert faster["months_to_goal"] <= slower["months_to_goal"]
+        assert faster["deviation"] > slower["deviation"]
+    assert result["fastest"] == front[0]
+    assert result["closest_mix"] == front[-1]
+
+
+def test_deadline_and_categories_limit_the_plans():
+    result = simulate(SPEND, 5000, categories=["Travel"], deadline_months=30)
+    assert result["categories"] == ["Travel"]
+    for plan in result["front"]:
+        assert set(plan["cuts"]) == {"Travel"}
+        assert plan["months_to_goal"] <= 30
+    assert simulate(SPEND, 5000, categories=["Travel"], deadline_months=1)["front"] == []
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("body, message", [
+    ({}, "goal_cost"),
+    ({"goal_cost": [1000]}, "goal_cost"),
+    ({"goal_cost": True}, "goal_cost"),
+    ({"goal_cost": "abc"}, "goal_cost"),
+    ({"goal_cost": -5}, "goal_cost"),
+    ({"goal_cost": 1000, "max_scenarios": 0}, "max_scenarios"),
+    ({"goal_cost": 1000, "max_scenarios": -1}, "max_scenarios"),
+    ({"goal_cost": 1000, "max_scenarios": 2.5}, "max_scenarios"),
+    ({"goal_cost": 1000, "max_scenarios": "many"}, "max_scenarios"),
+])
+def test_api_rejects_bad_input(client, body, message):
+    body.setdefault("category_spend", SPEND)
+    resp = client.post("/api/simulate", json=body)
+    assert resp.status_code == 400
+    assert message in resp.get_json()["error"]
+
+
+def test_api_simulates(client):
+    resp = client.post("/api/simulate", json={"goal_cost": "a car that costs £5,000", "category_spend": SPEND})
+    assert resp.status_code == 200
+    assert resp.get_json()["front"]
@@ -0,0 +1,86 @@
+"""
+Lease handling of the SQLite OCR task queue (task_queue.TaskQueue).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition.task_queue import TaskQueue
+
+
+@pytest.fixture
+def task_queue(tmp_path):
+    return TaskQueue(str(tmp_path / "tasks.sqlite"), lease_seconds=0.2, max_attempts=2)
+
+
+def _expire(seconds=0.3):
+    time.sleep(seconds)
+
+
+def test_claim_leases_each_task_once(task_queue):
+    task_id = task_queue.enqueue("/statements/a.pdf", "sha-a")
+    task = task_queue.claim("worker-1")
+    assert task == {"id": task_id, "path": "/statements/a.pdf", "sha256": "sha-a", "attempts": 1}
+    assert task_queue.claim("worker-2") is None
+    assert task_queue.stats()["active_workers"] == 1
+
+
+def test_same_content_is_queued_once(task_queue):
+    assert task_queue.enqueue("/a.pdf", "sha-a") == task_queue.enqueue("/copy-of-a.pdf", "sha-a")
+    assert task_queue.stats()["queued"] == 1
+
+
+def test_expired_lease_is_reclaimed(task_queue):
+    task_id = task_queue.enqueue("/a.pdf", "sha-a")
+    assert task_queue.claim("crashed-worker")["id"] == task_id
+    _expire()
+
+    task = task_queue.claim("worker-2")
+    assert task["id"] == task_id
+    assert task["attempts"] == 2
+    # the first worker lost its lease: it can neither extend nor finish the task
+    assert not task_queue.heartbeat(task_id, "crashed-worker")
+    assert not task_queue.complete(task_id, "crashed-worker")
+    assert task_queue.complete(task_id, "worker-2")
+    assert task_queue.statuses([task_id])[task_id]["status"] == "done"
+
+
+def test_heartbeat_keeps_the_lease(task_queue):
+    task_id = task_queue.enqueue("/a.pdf", "sha-a")
+    task_queue.claim("worker-1")
+    for _ in range(3):
+        time.sleep(0.1)
+        assert task_queue.heartbeat(task_id, "worker-1")
+    assert task_queue.claim("worker-2") is None
+
+
+def test_lease_expiring_too_often_fails_the_task(task_queue):
+    task_id = task_queue.enqueue("/a.pdf", "sha-a")
+    for _ in range(2):
+        assert task_queue.claim("worker")["id"] == task_id
+        _expire()
+    assert task_queue.claim("worker") is None
+    info = task_queue.statuses([task_id])[task_id]
+    assert info["status"] == "failed"
+    assert "lease expired" in info["error"]
+
+
+def test_failed_attempt_is_retried_until_max_attempts(task_queue):
+    task_id = task_queue.enqueue("/a.pdf", "sha-a")
+    task_queue.claim("worker")
+    assert task_queue.fail(task_id, "worker", "tesseract crashed")
+    assert task_queue.statuses([task_id])[task_id]["status"] == "queued"
+    task_queue.claim("worker")
+    task_queue.fail(task_id, "worker", "tesseract crashed again")
+    assert task_queue.statuses([task_id])[task_id]["status"] == "failed"
+    # re-enqueueing the same content starts over
+    assert task_queue.enqueue("/a.pdf", "sha-a") == task_id
+    assert task_queue.statuses([task_id])[task_id] == {"status": "queued", "sha256": "sha-a", "error": None,
+                                                       "attempts": 0}
@@ -0,0 +1,89 @@
+"""
+Question parsing and lookups of the chat transaction index (transaction_index.TransactionIndex).
+
+Run from src/backend:  python -m pytest -q tests
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from characterRecognition.transaction_index import TransactionIndex
+
+TODAY = date(2025, 6, 30)
+
+
+def _txn(day, company, amount, company_type="shopping", card="debit", ttype="withdrawal"):
+    return {"date-of-transaction": day, "company-name": company, "amount": amount,
+            "company-type": company_type, "card-type": card, "type": ttype}
+
+
+@pytest.fixture
+def index():
+    return TransactionIndex([
+        _txn("01-01-2025", "Opening Balance", "£1,000.00"),
+        _txn("03-04-2025", "STARBUCKS LONDON", "£4.50", "eating out"),
+        _txn("03-20-2025", "STARBUCKS LONDON", "£5.10", "eating out"),
+        _txn("04-02-2025", "TESCO STORES", "£62.30"),
+        _txn("05-11-2025", "TRAINLINE", "£2,400.00", "travel", card="credit"),
+        _txn("06-01-2025", "EMPLOYER LTD", "£2,500.00", "everything else", ttype="deposit"),
+        _txn("06-25-2025", "TESCO STORES", "£18.75"),
+    ])
+
+
+def _merchants(index, filters):
+    return sorted(index.rows[i]["merchant"] for i in index.query(filters))
+
+
+def test_opening_balance_is_not_indexed(index):
+    assert len(index) == 6
+    assert index.latest == date(2025, 6, 25)
+
+
+def test_merchant_and_month(index):
+    filters = index.parse_question("what did I spend at Starbucks in March?", today=TODAY)
+    assert filters == {"merchants": ["starbucks"], "date_from": date(2025, 3, 1), "date_to": date(2025, 3, 31)}
+    assert _merchants(index, filters) == ["STARBUCKS LONDON"] * 2
+
+
+def test_amount_is_not_read_as_a_year(index):
+    for question in ("anything over £2000?", "purchases over 2000", "spent more than 2000.50"):
+        filters = index.parse_question(question, today=TODAY)
+        assert "date_from" not in filters, question
+        assert filters["min_amount"] >= 2000
+    assert index.parse_question("travel in 2024", today=TODAY)["date_from"] == date(2024, 1, 1)
+
+
+def test_amount_ranges(index):
+    assert _merchants(index, index.parse_question("between £10 and £100", today=TODAY)) == ["TESCO STORES"] * 2
+    assert _merchants(index, index.parse_question("under £5", today=TODAY)) == ["STARBUCKS LONDON"]
+    assert _merchants(index, index.parse_question("more than £2,450", today=TODAY)) == ["EMPLOYER LTD"]
+
+
+def test_last_n_is_clamped(index):
+    filters = index.parse_question("tesco in the last 99999999 months", today=TODAY)
+    assert filters["date_to"] == TODAY
+    assert filters["date_from"].year == TODAY.year - 100
+    assert _merchants(index, filters) == ["TESCO STORES"] * 2
+
+    filters = index.parse_question("last 10 days", today=TODAY)
+    assert _merchants(index, filters) == ["TESCO STORES"]
+
+
+def test_filters_are_intersected(index):
+    filters = index.parse_question("tesco in June", today=TODAY)
+    assert _merchants(index, filters) == ["TESCO STORES"]
+    assert index.query({"merchants": ["tesco"], "categories": ["Travel"]}) == set()
+
+
+def test_search_counts_only_spend(index):
+    assert index.search("hello there") is None
+    result = index.search("what came in or went out in June?", today=TODAY)
+    assert result["count"] == 2
+    assert result["total_spend"] == 18.75  # the salary deposit is not spend
+    assert [row["date"] for row in result["rows"]] == ["2025-06-25", "2025-06-01"]
+    assert index.search("starbucks", limit=1)["count"] == 2